@@ -0,0 +1,246 @@
+"""Module used to cluster the wines over their price, rating and tastes.
+
+The imputer and scaler are fitted once and reused across the K sweep, which runs in
+parallel, switches to `MiniBatchKMeans` on large snapshots and estimates the silhouette
+on a sample stratified by cluster, with a bootstrap confidence interval:
+
+    python -m analysis.clustering data/all_wines.csv -k_min 2 -k_max 10
+
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.impute import SimpleImputer
+from sklearn.metrics import silhouette_samples
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from . import constants as c
+from .features import load_wines
+
+
+def fit_scaler(df, features=c.CLUSTER_FEATURES):
+    """Fits the median imputer and the standard scaler of the clustering features.
+
+    Args:
+        df (pd.DataFrame): Cleaned wines.
+        features (list): Clustering features.
+
+    Returns:
+        A tuple holding the fitted pipeline and the scaled (float32) features.
+
+    """
+
+    scaler = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='median')),
+        ('scaler', StandardScaler())
+    ])
+
+    X = scaler.fit_transform(df[features]).astype(np.float32)
+
+    return scaler, X
+
+
+def build_model(k, n_rows, minibatch=None, random_state=c.RANDOM_STATE):
+    """Builds the K-means model of a given number of clusters.
+
+    Args:
+        k (int): Number of clusters.
+        n_rows (int): Number of clustered wines.
+        minibatch (bool): Whether `MiniBatchKMeans` is used, or None to use it above
+            `MINIBATCH_ROWS` wines.
+        random_state (int): Seed of the model.
+
+    Returns:
+        The (unfitted) model.
+
+    """
+
+    if minibatch is None:
+        minibatch = n_rows > c.MINIBATCH_ROWS
+
+    if minibatch:
+        return MiniBatchKMeans(n_clusters=k, batch_size=c.MINIBATCH_SIZE, n_init=3, random_state=random_state)
+
+    return KMeans(n_clusters=k, n_init=10, random_state=random_state)
+
+
+def stratified_sample(labels, size, rng):
+    """Samples rows proportionally to the size of their cluster.
+
+    Args:
+        labels (np.ndarray): Cluster of every row.
+        size (int): Number of sampled rows.
+        rng (np.random.Generator): Random generator.
+
+    Returns:
+        The sampled rows, every cluster holding at least two of them (if possible).
+
+    """
+
+    if size >= len(labels):
+        return np.arange(len(labels))
+
+    clusters, counts = np.unique(labels, return_counts=True)
+    quotas = np.maximum(np.round(counts * size / len(labels)).astype(int), 2)
+
+    return np.concatenate([rng.choice(np.flatnonzero(labels == cluster), min(quota, count), replace=False)
+                           for cluster, count, quota in zip(clusters, counts, quotas)])
+
+
+def silhouette_ci(X, labels, sample_size=c.SILHOUETTE_SAMPLE, n_bootstrap=c.SILHOUETTE_BOOTSTRAP,
+                  confidence=0.95, random_state=c.RANDOM_STATE):
+    """Estimates the silhouette score on a stratified sample, with a bootstrap confidence interval.
+
+    Silhouette values are computed once over the sample (quadratic in its size only), and the
+    interval is obtained by resampling their mean.
+
+    Args:
+        X (np.ndarray): Scaled features.
+        labels (np.ndarray): Cluster of every row.
+        sample_size (int): Number of sampled rows.
+        n_bootstrap (int): Number of bootstrap resamples.
+        confidence (float): Confidence level of the interval.
+        random_state (int): Seed of the sampling.
+
+    Returns:
+        A tuple holding the estimated score and the bounds of its interval.
+
+    """
+
+    rng = np.random.default_rng(random_state)
+
+    rows = stratified_sample(labels, sample_size, rng)
+    values = silhouette_samples(X[rows], labels[rows])
+
+    means = values[rng.integers(0, len(values), size=(n_bootstrap, len(values)))].mean(axis=1)
+    low, high = np.quantile(means, [(1 - confidence) / 2, (1 + confidence) / 2])
+
+    return values.mean(), low, high
+
+
+def evaluate_k(X, k, minibatch=None, sample_size=c.SILHOUETTE_SAMPLE, n_bootstrap=c.SILHOUETTE_BOOTSTRAP):
+    """Fits and evaluates a given number of clusters.
+
+    Args:
+        X (np.ndarray): Scaled features.
+        k (int): Number of clusters.
+        minibatch (bool): Whether `MiniBatchKMeans` is used, or None to decide by size.
+        sample_size (int): Number of rows sampled to estimate the silhouette.
+        n_bootstrap (int): Number of bootstrap resamples of the silhouette.
+
+    Returns:
+        A dictionary holding the inertia, silhouette (and its interval) and timing of the fit.
+
+    """
+
+    model = build_model(k, len(X), minibatch)
+
+    start = time.perf_counter()
+    labels = model.fit_predict(X)
+    fitted = time.perf_counter()
+    silhouette, low, high = silhouette_ci(X, labels, sample_size, n_bootstrap)
+
+    return {
+        'k': k,
+        'model': type(model).__name__,
+        'inertia': model.inertia_,
+        'silhouette': silhouette,
+        'silhouette_low': low,
+        'silhouette_high': high,
+        'fit_seconds': fitted - start,
+        'silhouette_seconds': time.perf_counter() - fitted
+    }
+
+
+def sweep(X, k_range=range(2, 11), minibatch=None, sample_size=c.SILHOUETTE_SAMPLE,
+          n_bootstrap=c.SILHOUETTE_BOOTSTRAP, n_jobs=-1):
+    """Evaluates every number of clusters of a range in parallel.
+
+    Args:
+        X (np.ndarray): Scaled features.
+        k_range (iterable): Numbers of clusters.
+        minibatch (bool): Whether `MiniBatchKMeans` is used, or None to decide by size.
+        sample_size (int): Number of rows sampled to estimate the silhouette.
+        n_bootstrap (int): Number of bootstrap resamples of the silhouette.
+        n_jobs (int): Number of parallel jobs (-1 for every core).
+
+    Returns:
+        A dataframe holding one row per number of clusters.
+
+    """
+
+    results = Parallel(n_jobs=n_jobs)(delayed(evaluate_k)(X, k, minibatch, sample_size, n_bootstrap) for k in k_range)
+
+    return pd.DataFrame(results).set_index('k')
+
+
+def cluster(df, k, scaler=None, features=c.CLUSTER_FEATURES, minibatch=None):
+    """Clusters the wines, reusing an already fitted imputer and scaler if given.
+
+    Args:
+        df (pd.DataFrame): Cleaned wines.
+        k (int): Number of clusters.
+        scaler (Pipeline): Fitted imputer and scaler, fitted on `df` if None.
+        features (list): Clustering features.
+        minibatch (bool): Whether `MiniBatchKMeans` is used, or None to decide by size.
+
+    Returns:
+        A tuple holding the fitted model and the cluster of every wine.
+
+    """
+
+    if scaler is None:
+        scaler, X = fit_scaler(df, features)
+    else:
+        X = scaler.transform(df[features]).astype(np.float32)
+
+    model = build_model(k, len(X), minibatch)
+
+    return model, model.fit_predict(X)
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Sweeps the number of K-means clusters of the wines.')
+
+    parser.add_argument('input_file', help='Input .csv snapshot', type=str, nargs='?', default=c.DATA_FILE)
+
+    parser.add_argument('-k_min', help='Minimum number of clusters', type=int, default=2)
+
+    parser.add_argument('-k_max', help='Maximum number of clusters', type=int, default=10)
+
+    parser.add_argument('-minibatch', help='Whether MiniBatchKMeans is used', type=str,
+                        choices=['auto', 'yes', 'no'], default='auto')
+
+    parser.add_argument('-sample', help='Number of wines sampled to estimate the silhouette', type=int,
+                        default=c.SILHOUETTE_SAMPLE)
+
+    parser.add_argument('-n_jobs', help='Number of parallel jobs (-1 for every core)', type=int, default=-1)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    _, X = fit_scaler(load_wines(args.input_file))
+    minibatch = {'auto': None, 'yes': True, 'no': False}[args.minibatch]
+
+    results = sweep(X, range(args.k_min, args.k_max + 1), minibatch, args.sample, n_jobs=args.n_jobs)
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(results.round(4))
+
+    print(f"Optimal K (highest silhouette): {results['silhouette'].idxmax()}")
@@ -0,0 +1,66 @@
+"""Module used to defined constants that are called within the analysis package."""
+
+# Snapshot analysed by default
+DATA_FILE = 'data/all_wines.csv'
+
+# Directory holding the fitted preprocessors and transformed matrices
+CACHE_DIR = '.cache/features'
+
+# Reference year used to compute the age of the wines
+CURRENT_YEAR = 2025
+
+# Feature groups fed to the preprocessor
+NUMERIC_FEATURES = ['vintage', 'price', 'acidity', 'intensity', 'sweetness', 'tannin', 'age']
+CATEGORICAL_FEATURES = ['country', 'winery', 'flavor_rank1', 'flavor_rank2', 'flavor_rank3']
+TEXT_FEATURE = ['grapes']
+
+# Maximum number of one-hot encoded categories per column and of encoded grape varieties
+MAX_CATEGORIES = 20
+MAX_GRAPES = 50
+
+# Maximum number of ordinal encoded categories per column, within the 255 bins of the
+# histogram-based gradient boosting
+MAX_NATIVE_CATEGORIES = 255
+
+# Share of the wines held out for testing, and seed of the split
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
+
+# Number of cross-validation folds
+CV_FOLDS = 5
+
+# Number of rating bins used to stratify the split
+STRATIFY_BINS = 5
+
+# Clustering features, imputed and scaled beforehand
+CLUSTER_FEATURES = ['price', 'rating', 'acidity', 'intensity', 'sweetness', 'tannin']
+
+# Number of wines above which `MiniBatchKMeans` replaces `KMeans`, and size of its batches
+MINIBATCH_ROWS = 50000
+MINIBATCH_SIZE = 4096
+
+# Number of wines sampled to estimate the silhouette, and of bootstrap resamples of its mean
+SILHOUETTE_SAMPLE = 10000
+SILHOUETTE_BOOTSTRAP = 1000
+
+# Persisted model bundle, and its default model
+BUNDLE_FILE = 'models/rating_model.joblib'
+BUNDLE_MODEL = 'random_forest'
+
+# Number of wines scored per chunk
+SCORE_CHUNK_SIZE = 50000
+
+# Weights of the three flavor ranks within the wine embeddings
+FLAVOR_RANK_WEIGHTS = (1.0, 0.66, 0.33)
+
+# Leaf size of the nearest-neighbour trees, and number of wines per block of the exact search
+NEIGHBOURS_LEAF_SIZE = 40
+NEIGHBOURS_BLOCK_SIZE = 65536
+
+# Share of candidate wines below which filtered queries use the exact search, and growth
+# factor of the neighbours fetched from the tree until enough pass the filters
+NEIGHBOURS_BRUTE_RATIO = 0.2
+NEIGHBOURS_OVERFETCH = 4
+
+# Size (in bytes) of the chunks read when hashing a snapshot
+HASH_CHUNK_SIZE = 1024 ** 2
@@ -0,0 +1,370 @@
+"""Module used to build the rating model features, caching them on disk.
+
+The fitted preprocessor and the transformed (sparse) matrices are stored under a directory
+keyed by the hash of the snapshot and of the feature configuration, so that re-running the
+modeling stage on an unchanged snapshot skips preprocessing entirely:
+
+    python -m analysis.features data/all_wines.csv
+
+"""
+
+import argparse
+import hashlib
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.model_selection import train_test_split
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from . import constants as c
+from .grapes import GrapeEncoder
+
+# Default feature configuration, part of the cache key
+DEFAULT_CONFIG = {
+    'numeric_features': c.NUMERIC_FEATURES,
+    'categorical_features': c.CATEGORICAL_FEATURES,
+    'text_feature': c.TEXT_FEATURE,
+    'max_categories': c.MAX_CATEGORIES,
+    'max_native_categories': c.MAX_NATIVE_CATEGORIES,
+    'max_grapes': c.MAX_GRAPES,
+    'min_grape_frequency': None,
+    'grape_other': False,
+    'current_year': c.CURRENT_YEAR,
+    'test_size': c.TEST_SIZE,
+    'random_state': c.RANDOM_STATE,
+    'stratify_bins': c.STRATIFY_BINS
+}
+
+
+def load_wines(path=c.DATA_FILE):
+    """Loads a snapshot, dropping duplicates and wines without a rating.
+
+    Args:
+        path (str): Path to the .csv snapshot.
+
+    Returns:
+        The cleaned dataframe.
+
+    """
+
+    df = pd.read_csv(path).drop_duplicates()
+    df = df.dropna(subset=['rating'])
+
+    return df[df['rating'] > 0]
+
+
+def prepare_features(df, current_year=c.CURRENT_YEAR):
+    """Separates the features from the target, coercing the vintage and engineering the age.
+
+    Args:
+        df (pd.DataFrame): Cleaned wines.
+        current_year (int): Reference year of the age.
+
+    Returns:
+        A tuple holding the features and the ratings.
+
+    """
+
+    X = df.drop(['rating', 'id', 'name', 'cluster', 'first_grape'], axis=1, errors='ignore')
+    y = df['rating']
+
+    # Non-vintage wines ('N.V.') get a missing vintage, hence a missing age
+    X['vintage'] = pd.to_numeric(X['vintage'], errors='coerce')
+    X['age'] = (current_year - X['vintage']).clip(lower=0)
+
+    return X, y
+
+
+def build_preprocessor(config=None):
+    """Builds the (unfitted) preprocessor, whose output stays sparse.
+
+    Args:
+        config (dict): Feature configuration, defaults to `DEFAULT_CONFIG`.
+
+    Returns:
+        A `ColumnTransformer` with `num`, `cat` and `grapes` branches.
+
+    """
+
+    config = {**DEFAULT_CONFIG, **(config or {})}
+
+    numeric_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='median')),
+        ('scaler', StandardScaler())
+    ])
+
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='constant', fill_value='missing')),
+        ('encoder', OneHotEncoder(handle_unknown='ignore', sparse_output=True, max_categories=config['max_categories']))
+    ])
+
+    grapes_transformer = GrapeEncoder(top_k=config['max_grapes'], min_frequency=config['min_grape_frequency'],
+                                      other=config['grape_other'])
+
+    # A threshold of 1 keeps the stacked output sparse, whatever its density
+    return ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, config['numeric_features']),
+            ('cat', categorical_transformer, config['categorical_features']),
+            ('grapes', grapes_transformer, config['text_feature'])
+        ],
+        remainder='drop',
+        sparse_threshold=1.0
+    )
+
+
+def snapshot_hash(path, chunk_size=c.HASH_CHUNK_SIZE):
+    """Hashes the content of a snapshot.
+
+    Args:
+        path (str): Path to the snapshot.
+        chunk_size (int): Size (in bytes) of the read chunks.
+
+    Returns:
+        The SHA-256 hex digest.
+
+    """
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def config_hash(config):
+    """Hashes a feature configuration, along with the scikit-learn version that pickles it.
+
+    Args:
+        config (dict): Feature configuration.
+
+    Returns:
+        The SHA-256 hex digest.
+
+    """
+
+    payload = json.dumps({'config': config, 'sklearn': sklearn.__version__}, sort_keys=True)
+
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _cache_path(path, config, cache_dir, kind):
+    if cache_dir is None:
+        return None
+
+    return os.path.join(cache_dir, f'{snapshot_hash(path)[:16]}-{config_hash(config)[:16]}{kind}')
+
+
+def _save(cache_path, features):
+    tmp_path = f'{cache_path}.tmp'
+    os.makedirs(tmp_path, exist_ok=True)
+
+    # Matrices are saved one per file, sparse ones as .npz and dense ones as .npy
+    meta = {}
+    for name, value in features.items():
+        if name == 'preprocessor':
+            joblib.dump(value, os.path.join(tmp_path, 'preprocessor.joblib'))
+        elif sparse.issparse(value):
+            sparse.save_npz(os.path.join(tmp_path, f'{name}.npz'), value)
+        elif isinstance(value, np.ndarray) and value.dtype != object:
+            np.save(os.path.join(tmp_path, f'{name}.npy'), value)
+        elif name != 'cached':
+            meta[name] = value.tolist() if isinstance(value, np.ndarray) else value
+
+    with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+
+    # Publishes the entry at once, so that an interrupted run never leaves a partial entry
+    os.replace(tmp_path, cache_path)
+
+
+def _load(cache_path):
+    with open(os.path.join(cache_path, 'meta.json'), 'r', encoding='utf-8') as f:
+        features = json.load(f)
+
+    features['feature_names'] = np.array(features['feature_names'], dtype=object)
+
+    for file_name in os.listdir(cache_path):
+        name, extension = os.path.splitext(file_name)
+        if extension == '.joblib':
+            features[name] = joblib.load(os.path.join(cache_path, file_name))
+        elif extension == '.npz':
+            features[name] = sparse.load_npz(os.path.join(cache_path, file_name)).tocsr()
+        elif extension == '.npy':
+            features[name] = np.load(os.path.join(cache_path, file_name))
+
+    features['cached'] = True
+
+    return features
+
+
+def build_features(path=c.DATA_FILE, config=None, cache_dir=c.CACHE_DIR):
+    """Splits a snapshot, fits the preprocessor on its training set and transforms both sets.
+
+    Args:
+        path (str): Path to the .csv snapshot.
+        config (dict): Feature configuration, defaults to `DEFAULT_CONFIG`.
+        cache_dir (str): Directory of the cache, or None to disable it.
+
+    Returns:
+        A dictionary holding the fitted `preprocessor`, the sparse `X_train` and `X_test`
+        matrices, the `y_train` and `y_test` ratings, the `train_index` and `test_index` row
+        labels, the `feature_names` and whether it was `cached`.
+
+    """
+
+    config = {**DEFAULT_CONFIG, **(config or {})}
+
+    cache_path = _cache_path(path, config, cache_dir, '')
+    if cache_path is not None and os.path.isdir(cache_path):
+        return _load(cache_path)
+
+    X, y = prepare_features(load_wines(path), config['current_year'])
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y,
+        test_size=config['test_size'],
+        random_state=config['random_state'],
+        stratify=pd.cut(y, bins=config['stratify_bins'], labels=False)
+    )
+
+    preprocessor = build_preprocessor(config)
+
+    features = {
+        'preprocessor': preprocessor,
+        'X_train': sparse.csr_matrix(preprocessor.fit_transform(X_train)),
+        'X_test': sparse.csr_matrix(preprocessor.transform(X_test)),
+        'y_train': y_train.to_numpy(),
+        'y_test': y_test.to_numpy(),
+        'train_index': X_train.index.to_numpy(),
+        'test_index': X_test.index.to_numpy(),
+        'feature_names': preprocessor.get_feature_names_out(),
+        'cached': False
+    }
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        _save(cache_path, features)
+
+    return features
+
+
+def build_native_preprocessor(config=None):
+    """Builds the (unfitted) preprocessor of models handling missing values and categories natively.
+
+    Numeric features are passed through (missing values included), categorical features are
+    ordinal encoded and grapes are multi-hot encoded, into a dense matrix.
+
+    Args:
+        config (dict): Feature configuration, defaults to `DEFAULT_CONFIG`.
+
+    Returns:
+        A `ColumnTransformer` with `num`, `cat` and `grapes` branches.
+
+    """
+
+    config = {**DEFAULT_CONFIG, **(config or {})}
+
+    # Unknown and missing categories are encoded as NaN, i.e. missing values
+    categorical_transformer = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan,
+                                             encoded_missing_value=np.nan, max_categories=config['max_native_categories'])
+
+    grapes_transformer = GrapeEncoder(top_k=config['max_grapes'], min_frequency=config['min_grape_frequency'],
+                                      other=config['grape_other'])
+
+    return ColumnTransformer(
+        transformers=[
+            ('num', 'passthrough', config['numeric_features']),
+            ('cat', categorical_transformer, config['categorical_features']),
+            ('grapes', grapes_transformer, config['text_feature'])
+        ],
+        remainder='drop',
+        sparse_threshold=0.0
+    )
+
+
+def build_matrix(path=c.DATA_FILE, config=None, native=False, cache_dir=c.CACHE_DIR):
+    """Fits the preprocessor on a whole snapshot and transforms it, e.g. to be cross-validated.
+
+    As the preprocessor is fitted once for all folds, its statistics (medians, scales and
+    kept categories) also see the validation wines, which is a slight leak traded for a
+    single transformation of the snapshot.
+
+    Args:
+        path (str): Path to the .csv snapshot.
+        config (dict): Feature configuration, defaults to `DEFAULT_CONFIG`.
+        native (bool): Whether the dense matrix of `build_native_preprocessor` is built
+            instead of the sparse one of `build_preprocessor`.
+        cache_dir (str): Directory of the cache, or None to disable it.
+
+    Returns:
+        A dictionary holding the fitted `preprocessor`, the `X` matrix, the `y` ratings, the
+        `index` row labels, the `feature_names`, the `categorical` mask of the columns and
+        whether it was `cached`.
+
+    """
+
+    config = {**DEFAULT_CONFIG, **(config or {})}
+
+    cache_path = _cache_path(path, config, cache_dir, '-native' if native else '-full')
+    if cache_path is not None and os.path.isdir(cache_path):
+        return _load(cache_path)
+
+    X, y = prepare_features(load_wines(path), config['current_year'])
+
+    preprocessor = build_native_preprocessor(config) if native else build_preprocessor(config)
+    matrix = preprocessor.fit_transform(X)
+    feature_names = preprocessor.get_feature_names_out()
+
+    features = {
+        'preprocessor': preprocessor,
+        'X': matrix.astype(np.float32) if native else sparse.csr_matrix(matrix),
+        'y': y.to_numpy(),
+        'index': X.index.to_numpy(),
+        'feature_names': feature_names,
+        'categorical': np.array([name.startswith('cat__') for name in feature_names]) if native
+                       else np.zeros(len(feature_names), dtype=bool),
+        'cached': False
+    }
+
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        _save(cache_path, features)
+
+    return features
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Builds (or loads from the cache) the rating model features.')
+
+    parser.add_argument('input_file', help='Input .csv snapshot', type=str, nargs='?', default=c.DATA_FILE)
+
+    parser.add_argument('-cache_dir', help='Directory of the feature cache', type=str, default=c.CACHE_DIR)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    features = build_features(args.input_file, cache_dir=args.cache_dir)
+
+    print(f"{'Loaded' if features['cached'] else 'Built'} features of {args.input_file}: "
+          f"{features['X_train'].shape[0]} training and {features['X_test'].shape[0]} testing wines, "
+          f"{len(features['feature_names'])} features")
@@ -0,0 +1,159 @@
+"""Module used to encode the grape blends into a sparse multi-hot matrix."""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.utils.validation import check_is_fitted
+
+from . import constants as c
+
+
+class GrapeEncoder(TransformerMixin, BaseEstimator):
+    """Multi-hot encoder of semicolon-separated grape blends.
+
+    The vocabulary is built once at fit time, from the number of wines holding each grape.
+    Only the distinct blends are split and stripped, with vectorized string operations,
+    and every wine then gathers the CSR row of its blend. Grapes left out of the vocabulary
+    (infrequent or unseen) may be gathered into a trailing `other` column.
+
+    Grapes held by as many wines at the `top_k` cutoff are kept alphabetically, whereas
+    `CountVectorizer(max_features=...)` breaks such ties by an unstable sort, so that both
+    vocabularies may differ at the cutoff (they match without one).
+
+    """
+
+    def __init__(self, top_k=c.MAX_GRAPES, min_frequency=None, other=False,
+                 missing_value='Unknown', lowercase=True, separator=';'):
+        """Initializition method.
+
+        Args:
+            top_k (int): Maximum number of grapes of the vocabulary, every grape if None.
+            min_frequency (int, float): Minimum number (or share, if a float) of wines holding
+                a grape of the vocabulary.
+            other (bool): Whether grapes outside of the vocabulary are encoded in an `other` column.
+            missing_value (str): Grape assigned to wines with a missing blend, or None to leave
+                them without any grape.
+            lowercase (bool): Whether grapes are lowercased.
+            separator (str): Separator of the grapes within a blend.
+
+        """
+
+        self.top_k = top_k
+        self.min_frequency = min_frequency
+        self.other = other
+        self.missing_value = missing_value
+        self.lowercase = lowercase
+        self.separator = separator
+
+    def _split(self, X):
+        """Factorizes the blends and splits the distinct ones into `(blend, grape)` pairs.
+
+        Blends repeat a lot across wines, so that only the distinct ones are split.
+
+        Args:
+            X (array-like): Single column of blends.
+
+        Returns:
+            A tuple holding the blend code of every row (-1 if missing), the number of distinct
+            blends, and the blend codes and grapes of the pairs.
+
+        """
+
+        blends = pd.Series(np.asarray(X, dtype=object).reshape(-1))
+
+        if self.missing_value is not None:
+            blends = blends.where(blends.notna() & (blends != ''), self.missing_value)
+
+        codes, uniques = pd.factorize(blends)
+
+        grapes = pd.Series(uniques, dtype='string').str.split(self.separator).explode().str.strip()
+        if self.lowercase:
+            grapes = grapes.str.lower()
+
+        # Exploded index is the code of the blend, as the distinct blends hold a range index
+        grapes = grapes[grapes.notna() & (grapes != '')]
+        pairs = pd.DataFrame({'blend': grapes.index.to_numpy(), 'grape': grapes.to_numpy(dtype=object)}).drop_duplicates()
+
+        return codes, len(uniques), pairs['blend'].to_numpy(), pairs['grape'].to_numpy(dtype=object)
+
+    def fit(self, X, y=None):
+        """Builds the grape vocabulary.
+
+        Args:
+            X (array-like): Single column of blends.
+            y: Ignored.
+
+        Returns:
+            The fitted encoder.
+
+        """
+
+        codes, n_blends, blends, grapes = self._split(X)
+
+        # Number of wines holding each grape, summed over the distinct blends
+        wines_per_blend = np.bincount(codes[codes >= 0], minlength=n_blends)
+        counts = pd.Series(wines_per_blend[blends]).groupby(grapes).sum()
+
+        if self.min_frequency is not None:
+            threshold = self.min_frequency * len(codes) if isinstance(self.min_frequency, float) else self.min_frequency
+            counts = counts[counts >= threshold]
+
+        # Most frequent grapes first, ties being broken alphabetically
+        counts = counts.rename_axis('grape').reset_index(name='count')
+        counts = counts.sort_values(['count', 'grape'], ascending=[False, True], kind='stable')
+        if self.top_k is not None:
+            counts = counts.head(self.top_k)
+
+        self.vocabulary_ = np.sort(counts['grape'].to_numpy(dtype=object))
+        self.n_features_in_ = 1
+
+        return self
+
+    def transform(self, X):
+        """Encodes the blends.
+
+        Args:
+            X (array-like): Single column of blends.
+
+        Returns:
+            A binary CSR matrix, one column per grape of the vocabulary (plus `other`).
+
+        """
+
+        check_is_fitted(self, 'vocabulary_')
+
+        codes, n_blends, blends, grapes = self._split(X)
+        columns = pd.Categorical(grapes, categories=self.vocabulary_).codes.astype(np.int64)
+        n_columns = len(self.vocabulary_) + int(self.other)
+
+        if self.other:
+            columns[columns < 0] = len(self.vocabulary_)
+        else:
+            blends, columns = blends[columns >= 0], columns[columns >= 0]
+
+        # Encodes the distinct blends, plus an empty trailing row for the missing ones
+        encoded = sparse.csr_matrix((np.ones(len(columns), dtype=np.float64), (blends, columns)),
+                                    shape=(n_blends + 1, n_columns))
+
+        # Several unknown grapes of a blend share the `other` column, hence the binarization
+        encoded.data[:] = 1.0
+
+        return encoded[np.where(codes >= 0, codes, n_blends)]
+
+    def get_feature_names_out(self, input_features=None):
+        """Gets the output feature names.
+
+        Args:
+            input_features: Ignored.
+
+        Returns:
+            An array holding the grapes of the vocabulary (plus `other`).
+
+        """
+
+        check_is_fitted(self, 'vocabulary_')
+
+        names = list(self.vocabulary_) + (['other'] if self.other else [])
+
+        return np.asarray(names, dtype=object)
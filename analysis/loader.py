@@ -0,0 +1,209 @@
+"""Module used to load snapshots with an explicit, compact schema.
+
+Strings are loaded as categories (or Arrow-backed strings for the mostly unique names),
+tastes and ratings as float32 and vintages as nullable Int16 years, parsed once. A binary
+sidecar is written next to every snapshot and reused as long as the snapshot is unchanged:
+
+    python -m analysis.loader data/25-11-2025.csv data/26-11-2025.csv
+
+"""
+
+import argparse
+import json
+import os
+import pickle
+import time
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+from . import constants as c
+
+# Bump whenever the schema changes, so that outdated sidecars are rebuilt
+SCHEMA_VERSION = 1
+
+# Categorical columns, whose values repeat a lot across wines
+CATEGORICAL_COLUMNS = ['country', 'winery', 'grapes', 'flavor_rank1', 'flavor_rank2', 'flavor_rank3']
+
+# Explicit dtypes of the CSV columns (`vintage` being parsed afterwards)
+DTYPES = {
+    'id': 'int64',
+    'name': 'string[pyarrow]' if pyarrow is not None else 'object',
+    'vintage': 'category',
+    'rating': 'float32',
+    'price': 'float64',
+    'acidity': 'float32',
+    'intensity': 'float32',
+    'sweetness': 'float32',
+    'tannin': 'float32',
+    **{column: 'category' for column in CATEGORICAL_COLUMNS}
+}
+
+
+def read_snapshot(path):
+    """Reads a .csv snapshot with the explicit schema.
+
+    Args:
+        path (str): Path to the .csv snapshot.
+
+    Returns:
+        The typed dataframe.
+
+    """
+
+    df = pd.read_csv(path, dtype=DTYPES)
+
+    # Vintages are read as categories, so that only the distinct years are parsed ('N.V.'
+    # and missing ones becoming <NA>)
+    years = pd.to_numeric(df['vintage'].cat.categories.astype(str), errors='coerce')
+    df['vintage'] = pd.Series(df['vintage'].cat.codes, index=df.index).map(
+        dict(enumerate(years))).astype('Int16')
+
+    return df
+
+
+def sidecar_path(path):
+    """Gets the path of the sidecar of a snapshot.
+
+    Args:
+        path (str): Path to the .csv snapshot.
+
+    Returns:
+        The path of the .parquet sidecar, or of the .pkl one when `pyarrow` is missing.
+
+    """
+
+    return f"{path}.{'parquet' if pyarrow is not None else 'pkl'}"
+
+
+def _signature(path):
+    stat = os.stat(path)
+
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'schema': SCHEMA_VERSION}
+
+
+def load_snapshot(path, use_sidecar=True):
+    """Loads a snapshot, from its sidecar if the snapshot is unchanged.
+
+    The sidecar is validated by the size and modification time of the snapshot, stored in a
+    .json file written once the sidecar is complete.
+
+    Args:
+        path (str): Path to the .csv snapshot.
+        use_sidecar (bool): Whether the sidecar is read and written.
+
+    Returns:
+        The typed dataframe.
+
+    """
+
+    if not use_sidecar:
+        return read_snapshot(path)
+
+    sidecar = sidecar_path(path)
+    signature = _signature(path)
+
+    try:
+        with open(f'{sidecar}.json', 'r', encoding='utf-8') as f:
+            if json.load(f) == signature:
+                return pd.read_parquet(sidecar) if pyarrow is not None else pd.read_pickle(sidecar)
+    except (OSError, ValueError):
+        pass
+
+    df = read_snapshot(path)
+
+    if pyarrow is not None:
+        df.to_parquet(sidecar, index=False)
+    else:
+        df.to_pickle(sidecar, protocol=pickle.HIGHEST_PROTOCOL)
+
+    with open(f'{sidecar}.json', 'w', encoding='utf-8') as f:
+        json.dump(signature, f)
+
+    return df
+
+
+def load_snapshots(paths, use_sidecar=True):
+    """Loads and concatenates several dated snapshots, labelled by a `snapshot` column.
+
+    Args:
+        paths (list): Paths to the .csv snapshots.
+        use_sidecar (bool): Whether the sidecars are read and written.
+
+    Returns:
+        The typed dataframe, whose categorical columns share the union of their categories.
+
+    """
+
+    frames = [load_snapshot(path, use_sidecar) for path in paths]
+    labels = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+
+    # Concatenating categories that differ would fall back to objects, hence the union
+    categoricals = {column: union_categoricals([frame[column] for frame in frames]) for column in CATEGORICAL_COLUMNS}
+
+    df = pd.concat([frame.drop(columns=CATEGORICAL_COLUMNS) for frame in frames], ignore_index=True)
+    for column, values in categoricals.items():
+        df[column] = values
+
+    df['snapshot'] = pd.Categorical.from_codes(
+        [i for i, frame in enumerate(frames) for _ in range(len(frame))], categories=labels)
+
+    return df[list(frames[0].columns) + ['snapshot']]
+
+
+def compare_footprint(path):
+    """Compares the memory footprint and load time of the default, typed and sidecar loads.
+
+    Args:
+        path (str): Path to the .csv snapshot.
+
+    Returns:
+        A dataframe holding the deep memory usage (in MiB) and load time (in seconds) of
+        every load.
+
+    """
+
+    rows = []
+
+    for name, load in (('read_csv (default dtypes)', lambda: pd.read_csv(path)),
+                       ('read_snapshot (typed)', lambda: read_snapshot(path)),
+                       ('load_snapshot (sidecar)', lambda: load_snapshot(path))):
+        # Warms the sidecar up, so that its load is timed on a hit
+        if name.startswith('load_snapshot'):
+            load()
+
+        start = time.perf_counter()
+        df = load()
+        elapsed = time.perf_counter() - start
+
+        rows.append({'load': name, 'memory_mib': df.memory_usage(deep=True).sum() / 1024 ** 2, 'seconds': elapsed})
+
+    return pd.DataFrame(rows).set_index('load')
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Compares the footprint of the typed snapshot loads.')
+
+    parser.add_argument('input_files', help='Input .csv snapshots', type=str, nargs='*', default=[c.DATA_FILE])
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    for input_file in args.input_files:
+        print(f'{input_file}:')
+        print(compare_footprint(input_file).round(4))
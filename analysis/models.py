@@ -0,0 +1,244 @@
+"""Module used to compare the rating models under cross-validation.
+
+Every (model, fold) pair is fitted in parallel over a single cached transformed matrix,
+and the mean (and standard deviation) of the metrics and timings are reported per model:
+
+    python -m analysis.models data/all_wines.csv -folds 5 -models random_forest hist_gradient_boosting
+
+Parameter grids are swept by passing a .json file mapping model names to lists of
+parameters (or to a dictionary of candidate values, expanded as a `ParameterGrid`), every
+configuration being fitted on every fold:
+
+    python -m analysis.models data/all_wines.csv -grid grid.json
+
+with e.g. `{"random_forest": [{"max_depth": 10}, {"max_depth": 20}]}` in `grid.json`.
+
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import GradientBoostingRegressor, HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+
+from . import constants as c
+from .features import build_matrix
+
+
+def linear_regression(categorical):
+    """Builds the notebook linear regression."""
+
+    return LinearRegression()
+
+
+def random_forest(categorical):
+    """Builds the notebook random forest."""
+
+    # A single thread per forest, as the (model, fold) pairs already run in parallel
+    return RandomForestRegressor(n_estimators=100, max_depth=20, min_samples_split=10, min_samples_leaf=5,
+                                 random_state=c.RANDOM_STATE, n_jobs=1)
+
+
+def gradient_boosting(categorical):
+    """Builds the notebook gradient boosting."""
+
+    return GradientBoostingRegressor(n_estimators=100, learning_rate=0.1, max_depth=5, min_samples_split=10,
+                                     min_samples_leaf=5, subsample=0.8, random_state=c.RANDOM_STATE)
+
+
+def hist_gradient_boosting(categorical):
+    """Builds a histogram-based gradient boosting, splitting natively on the categorical columns."""
+
+    return HistGradientBoostingRegressor(max_iter=300, learning_rate=0.1, min_samples_leaf=20,
+                                         categorical_features=categorical, random_state=c.RANDOM_STATE)
+
+
+# Available models, mapped to their factory (receiving the categorical mask of the columns)
+# and whether they are fitted on the dense native matrix instead of the sparse one-hot one
+MODELS = {
+    'linear_regression': (linear_regression, False),
+    'random_forest': (random_forest, False),
+    'gradient_boosting': (gradient_boosting, False),
+    'hist_gradient_boosting': (hist_gradient_boosting, True)
+}
+
+
+def expand_grid(models=None, grid=None):
+    """Expands the parameter grids of the models into the configurations to evaluate.
+
+    Args:
+        models (list): Names of the models, those of `grid` (or every one of `MODELS`) if None.
+        grid (dict): Parameter grid per model name, either a list of parameter dictionaries
+            or a dictionary of candidate values, models without a grid keeping their defaults.
+
+    Returns:
+        A list of (label, name, parameters) tuples, the label naming the model and its
+        parameters.
+
+    """
+
+    grid = grid or {}
+    models = models or list(grid) or list(MODELS)
+
+    unknown = [name for name in {*models, *grid} if name not in MODELS]
+    if unknown:
+        raise ValueError(f'Unknown models: {", ".join(sorted(unknown))}')
+
+    configurations = []
+    for name in models:
+        candidates = grid.get(name) or [{}]
+
+        # Dictionaries of candidate values are expanded into their cartesian product
+        if isinstance(candidates, dict):
+            candidates = list(ParameterGrid(candidates))
+
+        for params in candidates:
+            label = name
+            if params:
+                label += '(' + ', '.join(f'{key}={value!r}' for key, value in sorted(params.items())) + ')'
+
+            configurations.append((label, name, params))
+
+    return configurations
+
+
+def load_grid(path):
+    """Loads the parameter grids of the models from a .json file.
+
+    Args:
+        path (str): Path to the .json file, mapping model names to their grid.
+
+    Returns:
+        The parameter grid per model name.
+
+    """
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def evaluate_fold(label, name, params, fold, X, y, categorical, train_index, test_index):
+    """Fits and evaluates a model on a single fold.
+
+    Args:
+        label (str): Label of the configuration, naming the model and its parameters.
+        name (str): Name of the model, within `MODELS`.
+        params (dict): Parameters overriding the model defaults.
+        fold (int): Index of the fold.
+        X (array-like): Transformed features of every wine.
+        y (np.ndarray): Ratings of every wine.
+        categorical (np.ndarray): Mask of the categorical columns.
+        train_index (np.ndarray): Rows of the training wines.
+        test_index (np.ndarray): Rows of the validation wines.
+
+    Returns:
+        A dictionary holding the metrics and timings of the fold.
+
+    """
+
+    model = MODELS[name][0](categorical).set_params(**params)
+
+    start = time.perf_counter()
+    model.fit(X[train_index], y[train_index])
+    fitted = time.perf_counter()
+    y_pred = model.predict(X[test_index])
+    predicted = time.perf_counter()
+
+    return {
+        'model': label,
+        'fold': fold,
+        'rmse': np.sqrt(mean_squared_error(y[test_index], y_pred)),
+        'mae': mean_absolute_error(y[test_index], y_pred),
+        'r2': r2_score(y[test_index], y_pred),
+        'fit_seconds': fitted - start,
+        'predict_seconds': predicted - fitted
+    }
+
+
+def cross_validate(path=c.DATA_FILE, models=None, n_folds=c.CV_FOLDS, n_jobs=-1, cache_dir=c.CACHE_DIR, grid=None):
+    """Cross-validates a grid of models, every (configuration, fold) pair being fitted in parallel.
+
+    Args:
+        path (str): Path to the .csv snapshot.
+        models (list): Names of the models, those of `grid` (or every one of `MODELS`) if None.
+        n_folds (int): Number of folds, stratified by rating bins.
+        n_jobs (int): Number of parallel jobs (-1 for every core).
+        cache_dir (str): Directory of the feature cache, or None to disable it.
+        grid (dict): Parameter grid per model name (see `expand_grid`).
+
+    Returns:
+        A tuple holding the per-fold results and the per-configuration comparison table.
+
+    """
+
+    configurations = expand_grid(models, grid)
+
+    # Builds (or loads) each transformed matrix once, shared by every fold and configuration
+    matrices = {native: build_matrix(path, native=native, cache_dir=cache_dir)
+                for native in {MODELS[name][1] for _, name, _ in configurations}}
+
+    y = next(iter(matrices.values()))['y']
+    folds = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=c.RANDOM_STATE)
+    splits = list(folds.split(np.zeros(len(y)), pd.cut(y, bins=c.STRATIFY_BINS, labels=False)))
+
+    # Large arrays are memory-mapped by joblib, rather than copied to every worker
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_fold)(label, name, params, fold, matrices[MODELS[name][1]]['X'], y,
+                               matrices[MODELS[name][1]]['categorical'], train_index, test_index)
+        for label, name, params in configurations
+        for fold, (train_index, test_index) in enumerate(splits)
+    )
+
+    results = pd.DataFrame(results)
+    table = results.drop(columns='fold').groupby('model', sort=False).agg(['mean', 'std'])
+    table.columns = [f'{metric}_{stat}' for metric, stat in table.columns]
+
+    return results, table.sort_values('rmse_mean')
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Compares the rating models under cross-validation.')
+
+    parser.add_argument('input_file', help='Input .csv snapshot', type=str, nargs='?', default=c.DATA_FILE)
+
+    parser.add_argument('-models', help='Names of the compared models (defaults to those of the grid, or every model)',
+                        type=str, nargs='+', choices=list(MODELS), default=None)
+
+    parser.add_argument('-grid', help='Optional .json file mapping model names to their parameter grid', type=str,
+                        default=None)
+
+    parser.add_argument('-folds', help='Number of cross-validation folds', type=int, default=c.CV_FOLDS)
+
+    parser.add_argument('-n_jobs', help='Number of parallel jobs (-1 for every core)', type=int, default=-1)
+
+    parser.add_argument('-cache_dir', help='Directory of the feature cache', type=str, default=c.CACHE_DIR)
+
+    parser.add_argument('-output', help='Optional .csv file receiving the comparison table', type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    grid = load_grid(args.grid) if args.grid else None
+    results, table = cross_validate(args.input_file, args.models, args.folds, args.n_jobs, args.cache_dir, grid)
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(table.round(4))
+
+    if args.output:
+        table.to_csv(args.output)
@@ -0,0 +1,378 @@
+"""Module used to find similar wines through a nearest-neighbour index.
+
+Every wine is embedded into a compact float32 vector made of its scaled taste structure,
+its rank-weighted flavors and its normalized grape blend. Top-k queries go through a
+BallTree/KD-tree, or through an exact blocked search over the wines left by selective
+filters (price, rating, country):
+
+    python -m analysis.neighbours data/26-11-2025.csv 2194772 -k 5 -cheaper
+
+"""
+
+import argparse
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import BallTree, KDTree
+
+from scrapper.utils.keys import pack_key
+
+from . import constants as c
+from .grapes import GrapeEncoder
+
+# Columns of the taste structure
+TASTE_COLUMNS = ['acidity', 'intensity', 'sweetness', 'tannin']
+
+# Columns of the flavor ranks, from the most to the least prominent
+FLAVOR_COLUMNS = ['flavor_rank1', 'flavor_rank2', 'flavor_rank3']
+
+# Columns returned along the neighbours
+RESULT_COLUMNS = ['id', 'vintage', 'name', 'country', 'price', 'rating']
+
+TREES = {'ball_tree': BallTree, 'kd_tree': KDTree}
+
+
+class WineIndex:
+    """Nearest-neighbour index over the taste, flavor and grape embeddings of the wines."""
+
+    def __init__(self, algorithm='ball_tree', leaf_size=c.NEIGHBOURS_LEAF_SIZE, taste_weight=1.0,
+                 flavor_weights=c.FLAVOR_RANK_WEIGHTS, grape_weight=1.0, max_grapes=c.MAX_GRAPES):
+        """Initializition method.
+
+        Args:
+            algorithm (str): `ball_tree`, `kd_tree` or `brute` (exact blocked search only).
+            leaf_size (int): Leaf size of the tree.
+            taste_weight (float): Weight of the taste structure.
+            flavor_weights (tuple): Weights of the three flavor ranks.
+            grape_weight (float): Weight of the grape blend.
+            max_grapes (int): Number of grapes of the vocabulary.
+
+        """
+
+        if algorithm not in (*TREES, 'brute'):
+            raise ValueError(f'Unknown algorithm: {algorithm}')
+
+        self.algorithm = algorithm
+        self.leaf_size = leaf_size
+        self.taste_weight = taste_weight
+        self.flavor_weights = flavor_weights
+        self.grape_weight = grape_weight
+        self.max_grapes = max_grapes
+
+        self.tree = None
+
+    def _fit_embedding(self, df):
+        """Fits the scaling of the tastes and the flavor and grape vocabularies.
+
+        Args:
+            df (pd.DataFrame): Wines.
+
+        """
+
+        tastes = df[TASTE_COLUMNS].astype(np.float32)
+        self.taste_median_ = tastes.median().to_numpy(dtype=np.float32)
+        self.taste_std_ = tastes.std().fillna(1.0).replace(0.0, 1.0).to_numpy(dtype=np.float32)
+
+        flavors = pd.unique(df[FLAVOR_COLUMNS].to_numpy().ravel())
+        self.flavors_ = np.sort(np.array([flavor for flavor in flavors if isinstance(flavor, str) and flavor], dtype=object))
+
+        self.grapes_ = GrapeEncoder(top_k=self.max_grapes, missing_value=None).fit(df[['grapes']])
+
+    def embed(self, df):
+        """Embeds wines with the fitted scaling and vocabularies.
+
+        Args:
+            df (pd.DataFrame): Wines.
+
+        Returns:
+            The float32 embeddings, one row per wine.
+
+        """
+
+        tastes = df[TASTE_COLUMNS].to_numpy(dtype=np.float32, na_value=np.nan)
+        tastes = np.where(np.isnan(tastes), self.taste_median_, tastes)
+        tastes = (tastes - self.taste_median_) / self.taste_std_ * self.taste_weight
+
+        # Every flavor gets the weight of its rank, a wine holding each flavor at most once
+        flavors = np.zeros((len(df), len(self.flavors_)), dtype=np.float32)
+        for column, weight in zip(FLAVOR_COLUMNS, self.flavor_weights):
+            codes = pd.Categorical(df[column], categories=self.flavors_).codes
+            rows = np.flatnonzero(codes >= 0)
+            flavors[rows, codes[rows]] = np.maximum(flavors[rows, codes[rows]], weight)
+
+        # Blends are normalized, so that single grapes and large blends weigh the same
+        grapes = self.grapes_.transform(df[['grapes']]).toarray().astype(np.float32)
+        norms = np.linalg.norm(grapes, axis=1, keepdims=True)
+        grapes = np.divide(grapes, norms, out=grapes, where=norms > 0) * self.grape_weight
+
+        return np.hstack([tastes, flavors, grapes]).astype(np.float32)
+
+    def _set_wines(self, df, embeddings):
+        """Stores the wines and their embeddings, then (re)builds the tree.
+
+        Args:
+            df (pd.DataFrame): Wines.
+            embeddings (np.ndarray): Embeddings of the wines.
+
+        """
+
+        self.wines_ = df[[column for column in RESULT_COLUMNS if column in df.columns]].reset_index(drop=True)
+        self.keys_ = np.array([pack_key(wine_id, vintage) for wine_id, vintage in
+                               zip(self.wines_['id'], self.wines_['vintage'])], dtype=np.uint64)
+        self.rows_ = {key: row for row, key in enumerate(self.keys_.tolist())}
+
+        self.embeddings_ = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.norms_ = np.einsum('ij,ij->i', self.embeddings_, self.embeddings_)
+        self.prices_ = pd.to_numeric(self.wines_['price'], errors='coerce').to_numpy(dtype=np.float32)
+        self.ratings_ = pd.to_numeric(self.wines_['rating'], errors='coerce').to_numpy(dtype=np.float32)
+        self.countries_ = self.wines_['country'].astype('category')
+
+        self.tree = None
+        if self.algorithm in TREES and len(self.embeddings_):
+            self.tree = TREES[self.algorithm](self.embeddings_, leaf_size=self.leaf_size)
+
+    def fit(self, df):
+        """Fits the embedding and indexes the wines.
+
+        Args:
+            df (pd.DataFrame): Wines, duplicates of a `(id, vintage)` being dropped.
+
+        Returns:
+            The fitted index.
+
+        """
+
+        df = df.drop_duplicates(subset=['id', 'vintage'])
+
+        self._fit_embedding(df)
+        self._set_wines(df, self.embed(df))
+
+        return self
+
+    def update(self, df):
+        """Incrementally rebuilds the index from a newer snapshot.
+
+        The embedding stays fitted on the first snapshot. Only new wines are embedded, the
+        embeddings of the kept ones are reused (with refreshed prices, ratings and countries),
+        wines missing from the snapshot are dropped and the tree is rebuilt.
+
+        Args:
+            df (pd.DataFrame): Wines of the newer snapshot.
+
+        Returns:
+            A dictionary counting the `added`, `kept` and `removed` wines.
+
+        """
+
+        df = df.drop_duplicates(subset=['id', 'vintage']).reset_index(drop=True)
+
+        keys = [pack_key(wine_id, vintage) for wine_id, vintage in zip(df['id'], df['vintage'])]
+        old_rows = np.array([self.rows_.get(key, -1) for key in keys], dtype=np.int64)
+        new = old_rows < 0
+
+        embeddings = np.empty((len(df), self.embeddings_.shape[1]), dtype=np.float32)
+        embeddings[~new] = self.embeddings_[old_rows[~new]]
+        if new.any():
+            embeddings[new] = self.embed(df[new])
+
+        stats = {'added': int(new.sum()), 'kept': int((~new).sum()), 'removed': len(self.keys_) - int((~new).sum())}
+
+        self._set_wines(df, embeddings)
+
+        return stats
+
+    def _mask(self, max_price=None, min_price=None, min_rating=None, country=None):
+        mask = np.ones(len(self.keys_), dtype=bool)
+
+        if max_price is not None:
+            mask &= self.prices_ <= max_price
+        if min_price is not None:
+            mask &= self.prices_ >= min_price
+        if min_rating is not None:
+            mask &= self.ratings_ >= min_rating
+        if country is not None:
+            countries = [country] if isinstance(country, str) else list(country)
+            mask &= self.countries_.isin(countries).to_numpy()
+
+        return mask
+
+    def _blocked_search(self, vector, rows, k):
+        """Exactly searches the nearest wines among given rows, a block at a time.
+
+        Args:
+            vector (np.ndarray): Query embedding.
+            rows (np.ndarray): Candidate rows.
+            k (int): Number of neighbours.
+
+        Returns:
+            A tuple holding the distances and rows of the neighbours, closest first.
+
+        """
+
+        best_distances = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        vector_norm = float(vector @ vector)
+
+        for start in range(0, len(rows), c.NEIGHBOURS_BLOCK_SIZE):
+            block = rows[start:start + c.NEIGHBOURS_BLOCK_SIZE]
+
+            # Squared distances, expanded so that a block costs a single matrix-vector product
+            distances = self.norms_[block] - 2 * (self.embeddings_[block] @ vector) + vector_norm
+
+            best_distances = np.concatenate([best_distances, distances])
+            best_rows = np.concatenate([best_rows, block])
+            if len(best_rows) > k:
+                top = np.argpartition(best_distances, k)[:k]
+                best_distances, best_rows = best_distances[top], best_rows[top]
+
+        order = np.argsort(best_distances, kind='stable')
+
+        return np.sqrt(np.maximum(best_distances[order], 0)), best_rows[order]
+
+    def _tree_search(self, vector, mask, k):
+        """Searches the nearest wines through the tree, over-fetching until enough pass the filters.
+
+        Args:
+            vector (np.ndarray): Query embedding.
+            mask (np.ndarray): Rows passing the filters.
+            k (int): Number of neighbours.
+
+        Returns:
+            A tuple holding the distances and rows of the neighbours, closest first.
+
+        """
+
+        n_fetched = min(len(mask), k * c.NEIGHBOURS_OVERFETCH)
+
+        while True:
+            distances, rows = self.tree.query(vector[None, :], k=n_fetched)
+            distances, rows = distances[0], rows[0]
+            kept = mask[rows]
+
+            if kept.sum() >= k or n_fetched == len(mask):
+                return distances[kept][:k], rows[kept][:k]
+
+            n_fetched = min(len(mask), n_fetched * c.NEIGHBOURS_OVERFETCH)
+
+    def query(self, wine=None, vector=None, k=10, cheaper=False, max_price=None, min_price=None,
+              min_rating=None, country=None):
+        """Finds the wines most similar to a given one (or embedding).
+
+        Args:
+            wine (int, tuple): Indexed wine, as its identifier (first vintage found) or a
+                `(id, vintage)` tuple.
+            vector (np.ndarray): Query embedding, used if no wine is given.
+            k (int): Number of neighbours.
+            cheaper (bool): Whether only wines cheaper than the given one are kept.
+            max_price (float): Maximum price.
+            min_price (float): Minimum price.
+            min_rating (float): Minimum rating.
+            country (str, list): Country (or countries) of origin.
+
+        Returns:
+            A dataframe of the neighbours, closest first, with their `distance`.
+
+        """
+
+        mask = self._mask(max_price, min_price, min_rating, country)
+
+        if wine is not None:
+            row = self._row(wine)
+            vector = self.embeddings_[row]
+            mask[row] = False
+
+            if cheaper:
+                mask &= self.prices_ < self.prices_[row]
+
+        vector = np.asarray(vector, dtype=np.float32)
+        n_candidates = int(mask.sum())
+
+        if not n_candidates:
+            distances, rows = np.empty(0), np.empty(0, dtype=np.int64)
+        elif self.tree is None or n_candidates <= len(mask) * c.NEIGHBOURS_BRUTE_RATIO:
+            # Selective filters leave few candidates, which are cheaper to scan exactly
+            distances, rows = self._blocked_search(vector, np.flatnonzero(mask), k)
+        else:
+            distances, rows = self._tree_search(vector, mask, k)
+
+        neighbours = self.wines_.iloc[rows].reset_index(drop=True)
+        neighbours['distance'] = distances
+
+        return neighbours
+
+    def _row(self, wine):
+        if isinstance(wine, tuple):
+            row = self.rows_.get(pack_key(*wine))
+        else:
+            rows = np.flatnonzero(self.wines_['id'].to_numpy() == int(wine))
+            row = rows[0] if len(rows) else None
+
+        if row is None:
+            raise KeyError(f'Wine {wine} is not indexed')
+
+        return row
+
+    def save(self, path):
+        """Persists the index.
+
+        Args:
+            path (str): Path to the output .joblib file.
+
+        """
+
+        joblib.dump(self, path)
+
+    @staticmethod
+    def load(path):
+        """Loads a persisted index.
+
+        Args:
+            path (str): Path to the .joblib file.
+
+        Returns:
+            The index.
+
+        """
+
+        return joblib.load(path)
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Finds the wines most similar to a given one.')
+
+    parser.add_argument('input_file', help='Input .csv snapshot', type=str)
+
+    parser.add_argument('wine_id', help='Identifier of the wine', type=int)
+
+    parser.add_argument('-k', help='Number of similar wines', type=int, default=10)
+
+    parser.add_argument('-cheaper', help='Only keeps cheaper wines', action='store_true')
+
+    parser.add_argument('-max_price', help='Maximum price', type=float, default=None)
+
+    parser.add_argument('-min_rating', help='Minimum rating', type=float, default=None)
+
+    parser.add_argument('-country', help='Country of origin', type=str, default=None)
+
+    parser.add_argument('-algorithm', help='Search algorithm', type=str, choices=[*TREES, 'brute'], default='ball_tree')
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    index = WineIndex(args.algorithm).fit(pd.read_csv(args.input_file))
+    neighbours = index.query(args.wine_id, k=args.k, cheaper=args.cheaper, max_price=args.max_price,
+                             min_rating=args.min_rating, country=args.country)
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(neighbours)
@@ -0,0 +1,309 @@
+"""Module used to persist a rating model and to score snapshots in chunks.
+
+A model bundle (fitted preprocessor and estimator) is trained once on a snapshot, then
+newly scraped snapshots (.csv, .parquet, .columns or JSON pages) are streamed in
+fixed-size chunks, whose predicted and actual ratings are appended to the output:
+
+    python -m analysis.scoring train data/all_wines.csv -model random_forest
+    python -m analysis.scoring score data/26-11-2025.csv predictions.csv -processes 4
+
+"""
+
+import argparse
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.pipeline import Pipeline
+
+from scrapper.utils.columnar import SCHEMA, load_columnar, pq
+from scrapper.utils.file import iter_json_array, iter_json_records
+
+from . import constants as c
+from .features import (DEFAULT_CONFIG, build_native_preprocessor, build_preprocessor, load_wines,
+                       prepare_features, snapshot_hash)
+from .models import MODELS
+
+# Columns written along the predictions
+ID_COLUMNS = ['id', 'vintage', 'name']
+
+
+def train_bundle(path=c.DATA_FILE, model=c.BUNDLE_MODEL, output=c.BUNDLE_FILE, config=None):
+    """Trains a model on a whole snapshot and persists it with its preprocessor.
+
+    Args:
+        path (str): Path to the .csv snapshot.
+        model (str): Name of the model, within `MODELS`.
+        output (str): Path to the output .joblib bundle.
+        config (dict): Feature configuration, defaults to `DEFAULT_CONFIG`.
+
+    Returns:
+        The persisted bundle.
+
+    """
+
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    factory, native = MODELS[model]
+
+    X, y = prepare_features(load_wines(path), config['current_year'])
+
+    preprocessor = build_native_preprocessor(config) if native else build_preprocessor(config)
+    X_transformed = preprocessor.fit_transform(X)
+    categorical = np.array([name.startswith('cat__') for name in preprocessor.get_feature_names_out()]) if native else None
+
+    # Unlike cross-validation, a single model is fitted, hence using every core
+    estimator = factory(categorical)
+    if 'n_jobs' in estimator.get_params():
+        estimator.set_params(n_jobs=-1)
+    estimator.fit(X_transformed, y)
+
+    bundle = {
+        'pipeline': Pipeline(steps=[('preprocessor', preprocessor), ('model', estimator)]),
+        'model': model,
+        'config': config,
+        'snapshot': os.path.basename(path),
+        'snapshot_hash': snapshot_hash(path),
+        'sklearn': sklearn.__version__
+    }
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    joblib.dump(bundle, output)
+
+    return bundle
+
+
+def load_bundle(path=c.BUNDLE_FILE):
+    """Loads a persisted bundle.
+
+    Args:
+        path (str): Path to the .joblib bundle.
+
+    Returns:
+        The bundle.
+
+    """
+
+    bundle = joblib.load(path)
+
+    if bundle['sklearn'] != sklearn.__version__:
+        print(f"Warning: {path} was trained with scikit-learn {bundle['sklearn']}, not {sklearn.__version__}")
+
+    return bundle
+
+
+def _iter_record_chunks(records, chunk_size):
+    records = iter(records)
+    while chunk := list(islice(records, chunk_size)):
+        yield pd.DataFrame.from_records(chunk)
+
+
+def _iter_columnar_chunks(path, chunk_size):
+    if not os.path.isdir(path):
+        if pq is None:
+            raise ImportError('Reading Parquet snapshots requires `pyarrow`')
+
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+        return
+
+    # Memory-mapped columns are decoded a chunk at a time (names are skipped, as they are
+    # only readable as a whole)
+    data = load_columnar(path, columns=[column for column, kind in SCHEMA.items() if kind != 'string'])
+    n_rows = len(data['id'])
+
+    for start in range(0, n_rows, chunk_size):
+        rows = slice(start, start + chunk_size)
+        chunk = {}
+
+        for column, values in data.items():
+            if SCHEMA[column] == 'dictionary':
+                codes = np.asarray(values[0][rows])
+                categories = np.asarray(values[1] + [None], dtype=object)
+                chunk[column] = categories[codes]
+            elif column == 'vintage':
+                chunk[column] = np.where(values[1][rows], np.nan, values[0][rows])
+            else:
+                chunk[column] = np.asarray(values[rows])
+
+        yield pd.DataFrame(chunk)
+
+
+def iter_chunks(path, chunk_size=c.SCORE_CHUNK_SIZE):
+    """Streams a snapshot in fixed-size chunks.
+
+    Args:
+        path (str): Path to a .csv, .parquet or .columns snapshot, to a merged .json file,
+            or to the name of indexed JSON page files (and segment logs).
+        chunk_size (int): Number of wines per chunk.
+
+    Returns:
+        A generator over the chunks, as dataframes.
+
+    """
+
+    if path.endswith('.csv'):
+        yield from pd.read_csv(path, chunksize=chunk_size)
+    elif path.endswith('.parquet') or os.path.isdir(path):
+        yield from _iter_columnar_chunks(path, chunk_size)
+    elif os.path.isfile(path):
+        yield from _iter_record_chunks(iter_json_array(path, 'wines'), chunk_size)
+    else:
+        yield from _iter_record_chunks(iter_json_records(path), chunk_size)
+
+
+def score_chunk(bundle, chunk):
+    """Predicts the ratings of a chunk of wines.
+
+    Args:
+        bundle (dict): Model bundle.
+        chunk (pd.DataFrame): Chunk of raw wines.
+
+    Returns:
+        A dataframe holding the identifiers, actual and predicted ratings of the wines.
+
+    """
+
+    config = bundle['config']
+    text_columns = config['categorical_features'] + config['text_feature']
+
+    # Chunks may lack (or hold fully missing) columns, which are still expected as strings
+    chunk = chunk.reindex(columns=list(dict.fromkeys(list(chunk.columns) + ID_COLUMNS + ['rating'] +
+                                                     config['numeric_features'] + text_columns)))
+    chunk[text_columns] = chunk[text_columns].astype(object).where(chunk[text_columns].notna(), np.nan)
+
+    X, y = prepare_features(chunk, config['current_year'])
+    actual = pd.to_numeric(y, errors='coerce')
+
+    # Vintages are written as nullable years, whatever the dtype inferred for the chunk
+    scores = chunk[ID_COLUMNS].copy()
+    scores['vintage'] = X['vintage'].round().astype('Int16')
+    scores['actual'] = actual.where(actual > 0)
+    scores['predicted'] = bundle['pipeline'].predict(X)
+    scores['error'] = scores['predicted'] - scores['actual']
+
+    return scores
+
+
+_bundle = None
+
+
+def _init_worker(bundle_path):
+    global _bundle
+    _bundle = load_bundle(bundle_path)
+
+
+def _score_in_worker(chunk):
+    return score_chunk(_bundle, chunk)
+
+
+def score(bundle_path, input_path, output_file, chunk_size=c.SCORE_CHUNK_SIZE, processes=1):
+    """Scores a snapshot chunk by chunk, appending the predictions to a .csv file.
+
+    At most two chunks per process are in flight, so that memory stays flat whatever the
+    size of the snapshot, and chunks are written in their input order.
+
+    Args:
+        bundle_path (str): Path to the .joblib bundle.
+        input_path (str): Snapshot to be scored (see `iter_chunks`).
+        output_file (str): Output .csv file.
+        chunk_size (int): Number of wines per chunk.
+        processes (int): Number of scoring processes, 1 to score within the current one.
+
+    Returns:
+        A dictionary holding the number of scored and rated wines, and the RMSE and MAE
+        over the rated ones.
+
+    """
+
+    summary = {'wines': 0, 'rated': 0, 'rmse': None, 'mae': None}
+    squared_errors = absolute_errors = 0.0
+
+    def _write(scores, f):
+        nonlocal squared_errors, absolute_errors
+
+        scores.to_csv(f, header=summary['wines'] == 0, index=False)
+
+        errors = scores['error'].dropna()
+        summary['wines'] += len(scores)
+        summary['rated'] += len(errors)
+        squared_errors += float((errors ** 2).sum())
+        absolute_errors += float(errors.abs().sum())
+
+    tmp_file = f'{output_file}.tmp'
+    with open(tmp_file, 'w', newline='', encoding='utf-8') as f:
+        chunks = iter_chunks(input_path, chunk_size)
+
+        if processes <= 1:
+            bundle = load_bundle(bundle_path)
+            for chunk in chunks:
+                _write(score_chunk(bundle, chunk), f)
+        else:
+            with ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(bundle_path,)) as executor:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(executor.submit(_score_in_worker, chunk))
+                    if len(pending) >= 2 * processes:
+                        _write(pending.popleft().result(), f)
+
+                while pending:
+                    _write(pending.popleft().result(), f)
+
+    os.replace(tmp_file, output_file)
+
+    if summary['rated']:
+        summary['rmse'] = (squared_errors / summary['rated']) ** 0.5
+        summary['mae'] = absolute_errors / summary['rated']
+
+    return summary
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Trains a persisted rating model and scores snapshots with it.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train = subparsers.add_parser('train', help='Trains and persists a model bundle')
+
+    train.add_argument('input_file', help='Input .csv snapshot', type=str, nargs='?', default=c.DATA_FILE)
+
+    train.add_argument('-model', help='Name of the model', type=str, choices=list(MODELS), default=c.BUNDLE_MODEL)
+
+    train.add_argument('-bundle', help='Output .joblib bundle', type=str, default=c.BUNDLE_FILE)
+
+    predict = subparsers.add_parser('score', help='Scores a snapshot with a model bundle')
+
+    predict.add_argument('input_path', help='Input .csv, .parquet, .columns or .json snapshot', type=str)
+
+    predict.add_argument('output_file', help='Output .csv predictions', type=str)
+
+    predict.add_argument('-bundle', help='Input .joblib bundle', type=str, default=c.BUNDLE_FILE)
+
+    predict.add_argument('-chunk_size', help='Number of wines per chunk', type=int, default=c.SCORE_CHUNK_SIZE)
+
+    predict.add_argument('-processes', help='Number of scoring processes', type=int, default=1)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    if args.command == 'train':
+        bundle = train_bundle(args.input_file, args.model, args.bundle)
+        print(f"Saved {bundle['model']} trained on {bundle['snapshot']} to {args.bundle}")
+    else:
+        summary = score(args.bundle, args.input_path, args.output_file, args.chunk_size, args.processes)
+        print(f"Scored {summary['wines']} wines into {args.output_file}")
+        if summary['rated']:
+            print(f"RMSE: {summary['rmse']:.4f}, MAE: {summary['mae']:.4f} over {summary['rated']} rated wines")
@@ -0,0 +1,206 @@
+"""Micro-benchmark of the spec-driven wine extractor against the legacy per-match parsing.
+
+Records the explore matches and tastes payloads of a synthetic catalog (as served by
+`MockVivino`) into a .jsonl file (under `.cache/` by default), then times their decoding
+and extraction with both paths and checks that they yield the same entries:
+
+    python -m benchmarks.extractor -wines 100000
+
+"""
+
+import argparse
+import gc
+import json
+import os
+import time
+
+from benchmarks.mock_vivino import MockVivino, generate_catalog
+from scrapper.utils import extract
+from scrapper.utils.extract import Extractor
+
+# Directory of the recorded payloads
+CACHE_DIR = os.path.join('.cache', 'extractor')
+
+
+def record_payloads(path, n_wines, seed):
+    """Records the explore match and tastes payloads of a synthetic catalog.
+
+    Args:
+        path (str): Output .jsonl file, holding one `[match, tastes]` pair per line.
+        n_wines (int): Number of wines.
+        seed (int): Seed of the catalog.
+
+    """
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for wine in generate_catalog(n_wines, seed):
+            f.write(json.dumps([MockVivino.match(wine), MockVivino.tastes(wine)], ensure_ascii=False) + '\n')
+
+
+def legacy_extract(match, tastes):
+    """Builds a wine entry as `scrap_wine_data.py` used to, the baseline of the benchmark."""
+
+    try:
+        wine = match['vintage']['wine']
+        vintage = match['vintage']
+
+        # Safely extract grapes
+        grapes_list = []
+        if wine.get('style') and isinstance(wine.get('style'), dict):
+            style_grapes = wine.get('style', {}).get('grapes', [])
+            if style_grapes and isinstance(style_grapes, list):
+                grapes_list = [grape.get('name', '') for grape in style_grapes if isinstance(grape, dict) and grape.get('name')]
+
+        wine_entry = {
+            'id': wine['id'],
+            'name': vintage.get('name'),
+            'vintage': vintage.get('year'),
+            'country': wine['region']['country']['name'] if wine.get('region', {}).get('country') else None,
+            'winery': wine['winery']['name'] if wine.get('winery') else None,
+            'grapes': ';'.join(grapes_list),
+            'rating': vintage['statistics'].get('ratings_average'),
+            'reviews_count': vintage['statistics'].get('ratings_count'),
+            'price': match.get('price', {}).get('amount') if match.get('price') else None
+        }
+    except Exception as e:
+        print(f"Error processing match: {e}")
+        return None
+
+    try:
+        tastes_block = tastes.get('tastes', {}) if isinstance(tastes, dict) else {}
+        structure = tastes_block.get('structure', {}) if isinstance(tastes_block, dict) else {}
+
+        wine_entry['acidity'] = structure.get('acidity') if structure else None
+        wine_entry['intensity'] = structure.get('intensity') if structure else None
+        wine_entry['sweetness'] = structure.get('sweetness') if structure else None
+        wine_entry['tannin'] = structure.get('tannin') if structure else None
+
+        taste_flavors = tastes_block.get('flavor', []) if isinstance(tastes_block, dict) else []
+        if taste_flavors and isinstance(taste_flavors, list):
+            sorted_flavors = sorted(
+                taste_flavors,
+                key=lambda x: x.get('stats', {}).get('mentions_count', 0) if isinstance(x, dict) else 0,
+                reverse=True
+            )[:3]
+        else:
+            sorted_flavors = []
+
+        for idx, flavor in enumerate(sorted_flavors, start=1):
+            wine_entry[f'flavor_rank{idx}'] = flavor.get('group') if isinstance(flavor, dict) else None
+        for idx in range(len(sorted_flavors) + 1, 4):
+            wine_entry[f'flavor_rank{idx}'] = None
+    except Exception as e:
+        print(f"Error processing taste: {e}")
+        for field in ['acidity', 'intensity', 'sweetness', 'tannin', 'flavor_rank1', 'flavor_rank2', 'flavor_rank3']:
+            wine_entry[field] = None
+
+    return wine_entry
+
+
+def time_path(name, decode, extractor, lines, repeats):
+    """Times the decoding and extraction of the recorded payloads.
+
+    Args:
+        name (str): Name of the path.
+        decode (callable): JSON decoder.
+        extractor (callable): Extractor, receiving the match and tastes payloads.
+        lines (list): Recorded payloads, as encoded lines.
+        repeats (int): Number of timed runs, the best one being reported.
+
+    Returns:
+        A tuple holding the report and the extracted entries.
+
+    """
+
+    decode_seconds = extract_seconds = float('inf')
+
+    for _ in range(repeats):
+        # The collector is paused while timing (as `timeit` does), its passes over the
+        # decoded payloads otherwise dominating the variance
+        payloads = entries = None
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            payloads = [decode(line) for line in lines]
+            decoded = time.perf_counter()
+            entries = [extractor(match, tastes) for match, tastes in payloads]
+            extracted = time.perf_counter()
+        finally:
+            gc.enable()
+
+        decode_seconds = min(decode_seconds, decoded - start)
+        extract_seconds = min(extract_seconds, extracted - decoded)
+
+    return {
+        'path': name,
+        'wines': len(lines),
+        'decode_seconds': round(decode_seconds, 4),
+        'extract_seconds': round(extract_seconds, 4),
+        'wines_per_sec': round(len(lines) / (decode_seconds + extract_seconds), 1)
+    }, entries
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Benchmarks the spec-driven wine extractor against the legacy parsing.')
+
+    parser.add_argument('-wines', help='Number of recorded wines', type=int, default=50000)
+
+    parser.add_argument('-seed', help='Seed of the synthetic catalog', type=int, default=0)
+
+    parser.add_argument('-payloads', help='Recorded .jsonl payloads, written first if missing (defaults to one per catalog under .cache/)',
+                        type=str, default=None)
+
+    parser.add_argument('-repeats', help='Number of timed runs per path', type=int, default=3)
+
+    parser.add_argument('-output', help='Optional .json file receiving the reports', type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    payloads = args.payloads or os.path.join(CACHE_DIR, f'payloads-{args.wines}-{args.seed}.jsonl')
+    if not os.path.exists(payloads):
+        record_payloads(payloads, args.wines, args.seed)
+
+    with open(payloads, 'rb') as f:
+        lines = f.read().splitlines()
+
+    baseline, expected = time_path('legacy (json)', json.loads, legacy_extract, lines, args.repeats)
+    reports = [baseline]
+
+    extractor = Extractor()
+    report, entries = time_path('spec (json)', json.loads, extractor, lines, args.repeats)
+    reports.append(report)
+
+    if extract.orjson is not None:
+        report, entries = time_path('spec (orjson)', extract.loads, extractor, lines, args.repeats)
+        reports.append(report)
+
+    for report in reports[1:]:
+        report['speedup'] = round(baseline['wines_per_sec'] and report['wines_per_sec'] / baseline['wines_per_sec'], 2)
+
+    columns = ['path', 'wines', 'decode_seconds', 'extract_seconds', 'wines_per_sec']
+    print(' | '.join(f'{column:>17}' for column in columns))
+    for report in reports:
+        print(' | '.join(f'{report[column]!s:>17}' for column in columns))
+
+    # Missing counts accumulate over every timed run, hence divided by their number
+    runs = args.repeats * (len(reports) - 1)
+    missing = {field: count // runs for field, count in extractor.take_missing().items()}
+    print(f"Same entries: {entries == expected}, speedup: {reports[-1]['speedup']}x, missing per field: {missing}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
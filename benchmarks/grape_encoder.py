@@ -0,0 +1,138 @@
+"""Benchmark of the grape encoder against the notebook CountVectorizer path.
+
+Resamples the grape blends of the snapshots to a given number of wines, then times the fit
+and transform of both encoders. Their top-k vocabularies may differ when grapes tie at the
+cutoff (`CountVectorizer` breaks ties by an unstable sort, `GrapeEncoder` alphabetically),
+so parity of the vocabulary and matrix is checked without any cutoff:
+
+    python -m benchmarks.grape_encoder -rows 500000 data/25-11-2025.csv data/26-11-2025.csv
+
+"""
+
+import argparse
+import glob
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import FunctionTransformer
+
+from analysis import constants as c
+from analysis.grapes import GrapeEncoder
+
+
+def split_semicolon(text):
+    """Splits grape varieties by semicolon, as in the notebook."""
+
+    if pd.isna(text) or text == '':
+        return []
+
+    return [x.strip() for x in str(text).split(';')]
+
+
+def count_vectorizer_path(max_grapes=c.MAX_GRAPES):
+    """Builds the notebook grapes branch.
+
+    Args:
+        max_grapes (int): Maximum number of encoded grape varieties.
+
+    Returns:
+        The (unfitted) pipeline.
+
+    """
+
+    return Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='constant', fill_value='Unknown')),
+        ('flatten', FunctionTransformer(lambda x: np.reshape(x, -1), feature_names_out='one-to-one')),
+        ('vectorizer', CountVectorizer(tokenizer=split_semicolon, token_pattern=None, binary=True,
+                                       max_features=max_grapes))
+    ])
+
+
+def time_encoder(name, encoder, X):
+    """Times the fit and transform of an encoder.
+
+    Args:
+        name (str): Name of the encoder.
+        encoder (TransformerMixin): Encoder to be timed.
+        X (pd.DataFrame): Single column of blends.
+
+    Returns:
+        A tuple holding the report and the transformed matrix.
+
+    """
+
+    start = time.perf_counter()
+    encoder.fit(X)
+    fitted = time.perf_counter()
+    matrix = encoder.transform(X)
+    transformed = time.perf_counter()
+
+    return {
+        'encoder': name,
+        'rows': len(X),
+        'fit_seconds': round(fitted - start, 3),
+        'transform_seconds': round(transformed - fitted, 3),
+        'rows_per_sec': round(len(X) / (transformed - fitted), 1),
+        'features': matrix.shape[1],
+        'nnz': int(matrix.nnz)
+    }, matrix
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Benchmarks the grape encoder against the CountVectorizer path.')
+
+    parser.add_argument('input_files', help='Input .csv snapshots', type=str, nargs='*', default=sorted(glob.glob('data/*.csv')))
+
+    parser.add_argument('-rows', help='Number of resampled wines', type=int, default=200000)
+
+    parser.add_argument('-seed', help='Seed of the resampling', type=int, default=0)
+
+    parser.add_argument('-output', help='Optional .json file receiving the reports', type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    grapes = pd.concat([pd.read_csv(path, usecols=['grapes']) for path in args.input_files], ignore_index=True)
+    X = grapes.sample(args.rows, replace=True, random_state=args.seed).reset_index(drop=True)
+
+    baseline, expected = time_encoder('count_vectorizer', count_vectorizer_path(), X)
+    encoder = GrapeEncoder()
+    report, matrix = time_encoder('grape_encoder', encoder, X)
+
+    # Checks parity over every grape, as ties at the top-k cutoff may be broken differently.
+    # Both vocabularies are sorted, hence matching columns whenever they hold the same grapes
+    vectorizer = count_vectorizer_path(max_grapes=None).fit(X)
+    full_encoder = GrapeEncoder(top_k=None).fit(X)
+    same_vocabulary = list(vectorizer.get_feature_names_out()) == list(full_encoder.get_feature_names_out())
+    report['same_vocabulary'] = same_vocabulary
+    report['same_matrix'] = same_vocabulary and (vectorizer.transform(X) != full_encoder.transform(X)).nnz == 0
+    report['speedup'] = round((baseline['fit_seconds'] + baseline['transform_seconds']) /
+                              (report['fit_seconds'] + report['transform_seconds']), 2)
+
+    reports = [baseline, report]
+
+    columns = ['encoder', 'rows', 'fit_seconds', 'transform_seconds', 'rows_per_sec', 'features', 'nnz']
+    print(' | '.join(f'{column:>17}' for column in columns))
+    for row in reports:
+        print(' | '.join(f'{row[column]!s:>17}' for column in columns))
+    print(f"Same vocabulary (no cutoff): {report['same_vocabulary']}, same matrix: {report['same_matrix']}, "
+          f"speedup: {report['speedup']}x")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
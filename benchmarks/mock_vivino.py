@@ -0,0 +1,292 @@
+"""Local stand-in of the Vivino API endpoints consumed by the scrapers.
+
+Serves `explore/explore`, `wines/{id}/reviews` and `wines/{id}/tastes` from a synthetic,
+seeded catalog shaped as the payloads parsed by the scrapers, with configurable latency,
+error rate and 429 injection. Scrapers are pointed to it through `VIVINO_BASE_URL`:
+
+    python -m benchmarks.mock_vivino -port 8000 -latency 0.05
+    VIVINO_BASE_URL=http://127.0.0.1:8000/api/ python scrapper/scrap_wine_data.py out.json
+
+"""
+
+import argparse
+import bisect
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+COUNTRIES = ['France', 'Italie', 'Espagne', 'Portugal', 'Allemagne', 'États-Unis']
+GRAPES = ['Merlot', 'Cabernet Sauvignon', 'Syrah', 'Grenache', 'Pinot Noir', 'Cabernet Franc',
+          'Mourvèdre', 'Malbec', 'Carignan', 'Cinsault', 'Gamay', 'Tannat', 'Sangiovese']
+FLAVOR_GROUPS = ['black_fruit', 'red_fruit', 'oak', 'earth', 'spices', 'non_oak',
+                 'dried_fruit', 'microbio', 'floral', 'vegetal', 'citrus_fruit', 'tree_fruit']
+
+
+def generate_catalog(n_wines, seed=0):
+    """Generates a synthetic catalog of wines.
+
+    Args:
+        n_wines (int): Number of wines of the catalog.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        A list of wines sorted by price.
+
+    """
+
+    rng = random.Random(seed)
+    wines = []
+
+    for i in range(n_wines):
+        wine_id = 1000000 + i
+        year = rng.choice([None] + list(range(1990, 2025)))
+        winery = f'Domaine {rng.randrange(n_wines // 4 + 1)}'
+        wines.append({
+            'id': wine_id,
+            'year': year if year is not None else 'N.V.',
+            'name': f'{winery} Cuvée {i} {year or "N.V."}',
+            'country': rng.choice(COUNTRIES),
+            'winery': winery,
+            'grapes': rng.sample(GRAPES, rng.randint(0, 3)),
+            'rating': round(rng.uniform(3.0, 4.8), 1),
+            'ratings_count': rng.randint(0, 5000),
+            # Prices are heavily skewed, as they are on the real API
+            'price': round(min(rng.lognormvariate(3, 0.9), 49999), 2),
+            'structure': {key: rng.uniform(1, 5) for key in ('acidity', 'intensity', 'sweetness', 'tannin')},
+            'flavors': {group: rng.randint(0, 200) for group in rng.sample(FLAVOR_GROUPS, rng.randint(0, 8))},
+            'n_reviews': rng.randint(0, 60),
+        })
+
+    wines.sort(key=lambda wine: wine['price'])
+
+    return wines
+
+
+class MockVivino:
+    """Serves a synthetic catalog through the Vivino API endpoints."""
+
+    def __init__(self, catalog, latency=0.0, error_rate=0.0, rate_429=0.0, retry_after=0, seed=0):
+        """Initializition method.
+
+        Args:
+            catalog (list): Wines sorted by price.
+            latency (float): Delay (in seconds) added to every response.
+            error_rate (float): Probability of answering with a 500 error.
+            rate_429 (float): Probability of answering with a 429 error.
+            retry_after (int): Value of the `Retry-After` header of 429 responses.
+            seed (int): Seed of the fault injection.
+
+        """
+
+        self.catalog = catalog
+        self.prices = [wine['price'] for wine in catalog]
+        self.by_id = {wine['id']: wine for wine in catalog}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.server = None
+
+    def explore(self, params):
+        """Answers an `explore/explore` request, filtered by price range and paginated."""
+
+        min_price = float(params.get('price_range_min', 0))
+        max_price = float(params.get('price_range_max', 1e9))
+        page = int(params.get('page', 1))
+        per_page = int(params.get('per_page', 25))
+
+        lo = bisect.bisect_left(self.prices, min_price)
+        hi = bisect.bisect_right(self.prices, max_price)
+        start = lo + (page - 1) * per_page
+
+        return {'explore_vintage': {
+            'records_matched': hi - lo,
+            'matches': [self.match(wine) for wine in self.catalog[start:min(start + per_page, hi)]]
+        }}
+
+    @staticmethod
+    def match(wine):
+        """Builds the explore match of a wine."""
+
+        return {
+            'vintage': {
+                'name': wine['name'],
+                'year': wine['year'],
+                'statistics': {'ratings_average': wine['rating'], 'ratings_count': wine['ratings_count']},
+                'wine': {
+                    'id': wine['id'],
+                    'name': wine['name'],
+                    'region': {'country': {'name': wine['country']}},
+                    'winery': {'name': wine['winery']},
+                    'style': {'grapes': [{'name': grape} for grape in wine['grapes']]} if wine['grapes'] else None,
+                },
+            },
+            'price': {'amount': wine['price']},
+        }
+
+    @staticmethod
+    def reviews(wine, params):
+        """Answers a paginated `wines/{id}/reviews` request."""
+
+        page = int(params.get('page', 1))
+        per_page = int(params.get('per_page', 3))
+        start = (page - 1) * per_page
+
+        return {'reviews': [{
+            'id': wine['id'] * 1000 + i,
+            'rating': 3 + (i % 3) * 0.5,
+            'note': f'Review {i} of wine {wine["id"]}: ' + ', '.join(wine['flavors']),
+            'language': 'fr',
+            'created_at': '2025-11-25T00:00:00.000Z',
+        } for i in range(start, min(start + per_page, wine['n_reviews']))]}
+
+    @staticmethod
+    def tastes(wine):
+        """Answers a `wines/{id}/tastes` request."""
+
+        return {'tastes': {
+            'structure': dict(wine['structure']),
+            'flavor': [{'group': group, 'stats': {'count': count, 'mentions_count': count}}
+                       for group, count in wine['flavors'].items()],
+        }}
+
+    def handle(self, path, params):
+        """Answers a request.
+
+        Args:
+            path (str): Path of the request, relative to the API root.
+            params (dict): Query parameters.
+
+        Returns:
+            A tuple holding the status, headers and JSON body.
+
+        """
+
+        match = re.fullmatch(r'wines/(\d+)/(reviews|tastes)', path)
+        if match:
+            endpoint = f'wines/{{id}}/{match.group(2)}'
+        elif path == 'explore/explore' and 'page' not in params:
+            endpoint = 'explore/explore (count)'
+        else:
+            endpoint = path
+
+        with self.lock:
+            self.counters[endpoint] += 1
+            draw = self.rng.random()
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if draw < self.rate_429:
+            with self.lock:
+                self.counters['429'] += 1
+            return 429, {'Retry-After': str(self.retry_after)}, {'error': 'rate limited'}
+
+        if draw < self.rate_429 + self.error_rate:
+            with self.lock:
+                self.counters['500'] += 1
+            return 500, {}, {'error': 'internal error'}
+
+        if path == 'explore/explore':
+            return 200, {}, self.explore(params)
+
+        if match and int(match.group(1)) in self.by_id:
+            wine = self.by_id[int(match.group(1))]
+            return 200, {}, self.reviews(wine, params) if match.group(2) == 'reviews' else self.tastes(wine)
+
+        return 404, {}, {'error': 'not found'}
+
+    def start(self, host='127.0.0.1', port=0):
+        """Starts serving in a background thread.
+
+        Args:
+            host (str): Host to bind.
+            port (int): Port to bind, where 0 picks a free one.
+
+        Returns:
+            The base URL of the mocked API.
+
+        """
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                status, headers, body = mock.handle(url.path.removeprefix('/api/').rstrip('?'), params)
+                payload = json.dumps(body).encode('utf-8')
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        return f'http://{host}:{self.server.server_address[1]}/api/'
+
+    def stop(self):
+        """Stops serving."""
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Serves a local stand-in of the Vivino API.')
+
+    parser.add_argument('-port', help='Port to bind', type=int, default=8000)
+
+    parser.add_argument('-wines', help='Number of wines of the catalog', type=int, default=5000)
+
+    parser.add_argument('-latency', help='Delay (in seconds) added to every response', type=float, default=0.0)
+
+    parser.add_argument('-error_rate', help='Probability of a 500 error', type=float, default=0.0)
+
+    parser.add_argument('-rate_429', help='Probability of a 429 error', type=float, default=0.0)
+
+    parser.add_argument('-retry_after', help='Retry-After header (in seconds) of 429 errors', type=int, default=0)
+
+    parser.add_argument('-seed', help='Seed of the catalog and fault injection', type=int, default=0)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    mock = MockVivino(generate_catalog(args.wines, args.seed), args.latency, args.error_rate, args.rate_429,
+                      args.retry_after, args.seed)
+    print(f'Serving {args.wines} wines at {mock.start(port=args.port)}')
+
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        mock.stop()
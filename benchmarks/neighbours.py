@@ -0,0 +1,173 @@
+"""Latency benchmark of the similar-wine index.
+
+Resamples the snapshots to a given number of wines (jittering their tastes and prices),
+then reports the build and incremental update times of every algorithm, and the query
+latencies of unfiltered and filtered top-k queries against a brute-force pandas scan:
+
+    python -m benchmarks.neighbours -rows 200000 -queries 200
+
+"""
+
+import argparse
+import glob
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis.neighbours import TASTE_COLUMNS, WineIndex
+
+# Filters of the timed queries
+QUERIES = {
+    'unfiltered': {},
+    'cheaper': {'cheaper': True},
+    'country_rating': {'country': 'Italie', 'min_rating': 4.2}
+}
+
+
+def resample(paths, n_rows, seed):
+    """Resamples the snapshots into a synthetic catalog.
+
+    Args:
+        paths (list): Paths to the .csv snapshots.
+        n_rows (int): Number of wines.
+        seed (int): Seed of the resampling.
+
+    Returns:
+        A dataframe of unique wines.
+
+    """
+
+    rng = np.random.default_rng(seed)
+
+    df = pd.concat([pd.read_csv(path) for path in paths], ignore_index=True)
+    df = df.sample(n_rows, replace=True, random_state=seed).reset_index(drop=True)
+
+    df['id'] = np.arange(n_rows) + 10 ** 8
+    df[TASTE_COLUMNS] += rng.normal(0, 0.1, (n_rows, len(TASTE_COLUMNS)))
+    df['price'] *= rng.lognormal(0, 0.1, n_rows)
+
+    return df
+
+
+def pandas_scan(embeddings, df, row, k, cheaper=False, country=None, min_rating=None):
+    """Brute-force pandas scan, the baseline of the queries.
+
+    Args:
+        embeddings (pd.DataFrame): Embeddings of the wines.
+        df (pd.DataFrame): Wines.
+        row (int): Row of the queried wine.
+        k (int): Number of neighbours.
+        cheaper (bool): Whether only cheaper wines are kept.
+        country (str): Country of origin.
+        min_rating (float): Minimum rating.
+
+    Returns:
+        The rows of the neighbours.
+
+    """
+
+    mask = df.index != row
+    if cheaper:
+        mask &= df['price'] < df['price'].iloc[row]
+    if country is not None:
+        mask &= df['country'] == country
+    if min_rating is not None:
+        mask &= df['rating'] >= min_rating
+
+    distances = ((embeddings[mask] - embeddings.iloc[row]) ** 2).sum(axis=1)
+
+    return distances.nsmallest(k).index
+
+
+def time_queries(query, rows):
+    """Times a query over several wines.
+
+    Args:
+        query (callable): Query, receiving a row.
+        rows (np.ndarray): Queried rows.
+
+    Returns:
+        A dictionary holding the p50, p95 and mean latencies (in milliseconds).
+
+    """
+
+    latencies = []
+    for row in rows:
+        start = time.perf_counter()
+        query(row)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    return {'p50_ms': round(float(np.percentile(latencies, 50)), 3),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 3),
+            'mean_ms': round(float(np.mean(latencies)), 3)}
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Benchmarks the latency of the similar-wine index.')
+
+    parser.add_argument('input_files', help='Input .csv snapshots', type=str, nargs='*', default=sorted(glob.glob('data/*.csv')))
+
+    parser.add_argument('-rows', help='Number of resampled wines', type=int, default=100000)
+
+    parser.add_argument('-queries', help='Number of timed queries', type=int, default=100)
+
+    parser.add_argument('-k', help='Number of neighbours', type=int, default=10)
+
+    parser.add_argument('-seed', help='Seed of the resampling', type=int, default=0)
+
+    parser.add_argument('-output', help='Optional .json file receiving the reports', type=str, default=None)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+
+    df = resample(args.input_files, args.rows, args.seed)
+    rows = np.random.default_rng(args.seed).choice(len(df), args.queries, replace=False)
+
+    # A newer snapshot, where 5% of the wines are replaced
+    n_replaced = len(df) // 20
+    newer = pd.concat([df.iloc[n_replaced:], resample(args.input_files, n_replaced, args.seed + 1)], ignore_index=True)
+    newer.loc[len(df) - n_replaced:, 'id'] += 10 ** 8
+
+    reports = []
+
+    for algorithm in ('ball_tree', 'kd_tree', 'brute'):
+        start = time.perf_counter()
+        index = WineIndex(algorithm).fit(df)
+        built = time.perf_counter() - start
+
+        for name, filters in QUERIES.items():
+            report = {'index': algorithm, 'query': name, 'build_seconds': round(built, 3)}
+            report.update(time_queries(lambda row: index.query((int(index.wines_['id'][row]), index.wines_['vintage'][row]),
+                                                               k=args.k, **filters), rows))
+            reports.append(report)
+
+        start = time.perf_counter()
+        stats = index.update(newer)
+        print(f"{algorithm}: updated in {time.perf_counter() - start:.3f}s ({stats})")
+
+    embeddings = pd.DataFrame(index.embed(df))
+    for name, filters in QUERIES.items():
+        report = {'index': 'pandas_scan', 'query': name, 'build_seconds': None}
+        report.update(time_queries(lambda row: pandas_scan(embeddings, df, row, args.k, **filters), rows))
+        reports.append(report)
+
+    columns = ['index', 'query', 'build_seconds', 'p50_ms', 'p95_ms', 'mean_ms']
+    print(' | '.join(f'{column:>14}' for column in columns))
+    for report in reports:
+        print(' | '.join(f'{report[column]!s:>14}' for column in columns))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
@@ -0,0 +1,182 @@
+"""End-to-end throughput benchmark of the scrapers against the local Vivino stand-in.
+
+Runs `scrap_wine_list.py` and `scrap_wine_data.py` against `MockVivino` and reports
+pages/sec, wines/sec, requests per wine and peak RSS of every run:
+
+    python -m benchmarks.scraper_throughput -wines 5000 -latency 0.02 -rate_429 0.01
+
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.mock_vivino import MockVivino, generate_catalog
+from scrapper.utils.file import iter_json_records
+
+SCRAPPER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scrapper')
+
+
+def run_script(script, args, base_url, cwd):
+    """Runs a scraping script and measures its wall time and peak RSS.
+
+    Args:
+        script (str): Name of the script within the `scrapper` directory.
+        args (list): Command-line arguments of the script.
+        base_url (str): Base URL of the mocked API.
+        cwd (str): Working directory of the run.
+
+    Returns:
+        A tuple holding the wall time (in seconds), the peak RSS (in MiB) and the exit status.
+
+    """
+
+    env = dict(os.environ, VIVINO_BASE_URL=base_url, PYTHONUNBUFFERED='1')
+
+    start = time.perf_counter()
+    with open(os.path.join(cwd, f'{script}.log'), 'w') as log:
+        process = subprocess.Popen([sys.executable, os.path.join(SCRAPPER_DIR, script)] + args,
+                                   cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+        # Waits through `wait4`, which reports the resource usage of this very child
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+
+    elapsed = time.perf_counter() - start
+
+    # `ru_maxrss` is given in kibibytes on Linux and in bytes on macOS
+    peak_rss = usage.ru_maxrss / (1024 ** 2 if sys.platform == 'darwin' else 1024)
+
+    return elapsed, peak_rss, process.returncode
+
+
+def summarize(name, elapsed, peak_rss, status, counters, pages, wines):
+    """Builds the report of a run.
+
+    Args:
+        name (str): Name of the run.
+        elapsed (float): Wall time (in seconds).
+        peak_rss (float): Peak RSS (in MiB).
+        status (int): Exit status of the run.
+        counters (Counter): Requests served by the mock during the run.
+        pages (int): Number of scraped explore pages.
+        wines (int): Number of scraped wines.
+
+    Returns:
+        A dictionary holding the run metrics.
+
+    """
+
+    requests = sum(count for endpoint, count in counters.items() if endpoint not in ('429', '500'))
+
+    return {
+        'run': name,
+        'status': status,
+        'seconds': round(elapsed, 3),
+        'pages': pages,
+        'wines': wines,
+        'requests': requests,
+        'pages_per_sec': round(pages / elapsed, 2) if elapsed else 0.0,
+        'wines_per_sec': round(wines / elapsed, 2) if elapsed else 0.0,
+        'requests_per_wine': round(requests / wines, 3) if wines else 0.0,
+        'http_429': counters['429'],
+        'http_500': counters['500'],
+        'peak_rss_mib': round(peak_rss, 1),
+        'endpoints': dict(counters)
+    }
+
+
+def benchmark(mock, base_url, workdir, data_args):
+    """Benchmarks both scraping scripts.
+
+    Args:
+        mock (MockVivino): Running mock, whose counters are reset before every run.
+        base_url (str): Base URL of the mocked API.
+        workdir (str): Working directory of the runs.
+        data_args (list): Extra command-line arguments of `scrap_wine_data.py`.
+
+    Returns:
+        The list of run reports.
+
+    """
+
+    reports = []
+
+    # Scraps the wine URLs
+    mock.counters.clear()
+    elapsed, peak_rss, status = run_script('scrap_wine_list.py', ['urls.txt'], base_url, workdir)
+    with open(os.path.join(workdir, 'urls.txt'), 'r') as f:
+        wines = sum(1 for _ in f)
+    counters = mock.counters.copy()
+    reports.append(summarize('scrap_wine_list', elapsed, peak_rss, status, counters,
+                             counters['explore/explore'], wines))
+
+    # Scraps the wine data
+    mock.counters.clear()
+    elapsed, peak_rss, status = run_script('scrap_wine_data.py', ['wines.json'] + data_args, base_url, workdir)
+    output_file = os.path.join(workdir, 'wines.json')
+    with contextlib.redirect_stdout(io.StringIO()):
+        wines = sum(1 for _ in iter_json_records(output_file))
+    counters = mock.counters.copy()
+    reports.append(summarize('scrap_wine_data', elapsed, peak_rss, status, counters,
+                             counters['explore/explore'], wines))
+
+    return reports
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Benchmarks the scrapers against a local stand-in of the Vivino API.')
+
+    parser.add_argument('-wines', help='Number of wines of the mocked catalog', type=int, default=3000)
+
+    parser.add_argument('-latency', help='Delay (in seconds) added to every response', type=float, default=0.01)
+
+    parser.add_argument('-error_rate', help='Probability of a 500 error', type=float, default=0.0)
+
+    parser.add_argument('-rate_429', help='Probability of a 429 error', type=float, default=0.0)
+
+    parser.add_argument('-seed', help='Seed of the catalog and fault injection', type=int, default=0)
+
+    parser.add_argument('-output', help='Optional .json file receiving the reports', type=str, default=None)
+
+    parser.add_argument('data_args', help='Extra arguments of scrap_wine_data.py (after --)', nargs=argparse.REMAINDER)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_arguments()
+    data_args = [arg for arg in args.data_args if arg != '--']
+
+    mock = MockVivino(generate_catalog(args.wines, args.seed), args.latency, args.error_rate,
+                      args.rate_429, seed=args.seed)
+    base_url = mock.start()
+
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            reports = benchmark(mock, base_url, workdir, data_args)
+    finally:
+        mock.stop()
+
+    columns = ['run', 'status', 'seconds', 'pages', 'wines', 'requests', 'pages_per_sec',
+               'wines_per_sec', 'requests_per_wine', 'http_429', 'http_500', 'peak_rss_mib']
+    print(' | '.join(f'{column:>17}' for column in columns))
+    for report in reports:
+        print(' | '.join(f'{report[column]!s:>17}' for column in columns))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, indent=2)
@@ -0,0 +1,43 @@
+import argparse
+
+import utils.constants as c
+from utils.diff import diff_series
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Compares consecutive wine snapshots and logs their changes.')
+
+    parser.add_argument('snapshots', help='Input .csv or .json snapshots, from the oldest to the newest', type=str, nargs='+')
+
+    parser.add_argument('-changelog', help='Cumulative .jsonl change log', type=str, default='changes.jsonl')
+
+    parser.add_argument('-price_tolerance', help='Price change below which a wine is not repriced', type=float, default=c.PRICE_TOLERANCE)
+
+    parser.add_argument('-rating_tolerance', help='Rating change below which a wine is not re-rated', type=float, default=c.RATING_TOLERANCE)
+
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    # Gathers the input arguments
+    args = get_arguments()
+
+    if len(args.snapshots) < 2:
+        raise SystemExit('At least two snapshots are needed.')
+
+    # Streams every pair of consecutive snapshots into the change log
+    summaries = diff_series(args.snapshots, args.changelog, price_tolerance=args.price_tolerance,
+                            rating_tolerance=args.rating_tolerance)
+
+    for summary in summaries:
+        print(f"{summary['from']} -> {summary['to']}: {summary['new']} new, {summary['removed']} removed, "
+              f"{summary['repriced']} repriced, {summary['rerated']} re-rated")
+
+    print(f'Changes appended to {args.changelog}')
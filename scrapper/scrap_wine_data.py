@@ -2,9 +2,22 @@ import argparse
 import json
 import os
 import glob
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 
 import utils.constants as c
+from utils.cache import ResponseCache
+from utils.extract import Extractor, loads, match_id
+from utils.metrics import Metrics, profiling
+from utils.planner import PricePlanner
 from utils.requester import Requester
+from utils.reviews import ReviewHarvester, ReviewShards
+from utils.segment import SegmentLog
+from utils.store import WineStore
+from utils.workqueue import WorkQueue, default_worker_id
 
 
 def get_arguments():
@@ -21,17 +34,91 @@ def get_arguments():
 
     parser.add_argument('-start_page', help='Starting page identifier', type=int, default=1)
 
+    parser.add_argument('-storage', help='Stores pages as one JSON file each or into an append-only segment log',
+                        choices=['files', 'segments'], default='files')
+
+    parser.add_argument('-store', help='Optional SQLite wine store every page is also written into', type=str, default=None)
+
+    parser.add_argument('-cache_dir', help='Directory of the optional on-disk response cache', type=str, default=None)
+
+    parser.add_argument('-plan_file', help='Persisted price-range plan (defaults to `output_file`.plan.json)', type=str, default=None)
+
+    parser.add_argument('-seed_plan', help='Plan of a previous run whose price ranges are reused', type=str, default=None)
+
+    parser.add_argument('-replan', help='Rebuilds the price-range plan even if one exists', action='store_true')
+
+    parser.add_argument('-workers', help='Number of concurrent tastes (and reviews) requests', type=int, default=c.ENRICH_WORKERS)
+
+    parser.add_argument('-reviews_dir', help='Optional directory of the compressed shards the reviews of every wine are harvested into',
+                        type=str, default=None)
+
+    parser.add_argument('-reviews_max_pages', help='Maximum number of harvested review pages per wine', type=int, default=c.REVIEWS_MAX_PAGES)
+
+    parser.add_argument('-mode', help='Scrapes every range alone, fills a shared work queue or works off it',
+                        choices=['single', 'coordinator', 'worker'], default='single')
+
+    parser.add_argument('-queue', help='Shared work queue database (defaults to `output_file`.queue.sqlite)', type=str, default=None)
+
+    parser.add_argument('-worker_id', help='Identifier of the worker (defaults to host-pid-random)', type=str, default=None)
+
+    parser.add_argument('-spawn', help='Number of local workers spawned by the coordinator', type=int, default=0)
+
+    parser.add_argument('-metrics_file', help='Metrics output file (Prometheus text if it ends with .prom, JSON otherwise)', type=str, default=None)
+
+    parser.add_argument('-metrics_port', help='Port serving Prometheus metrics at /metrics', type=int, default=None)
+
+    parser.add_argument('-metrics_host', help='Interface serving the metrics (e.g. 0.0.0.0 to expose them)', type=str, default='127.0.0.1')
+
+    parser.add_argument('-profile', help='Captures cProfile and tracemalloc profiles of the run', action='store_true')
+
+    parser.add_argument('-debug_dumps', help='Dumps the first tastes payload to debug_wine_tastes.json', action='store_true')
+
     return parser.parse_args()
 
 
+def fetch_wine_tastes(r, wine_id):
+    """Fetches the tastes payload of a single wine.
+
+    Args:
+        r (Requester): Wrapper used to perform the requests.
+        wine_id (int): Identifier of the wine.
+
+    Returns:
+        The tastes payload, where a failed request is returned as an empty dictionary.
+
+    """
+
+    try:
+        res_taste = r.get(f'wines/{wine_id}/tastes')
+        tastes = loads(res_taste.content) if res_taste and res_taste.status_code == 200 else {}
+    except Exception:
+        tastes = {}
+
+    return tastes
+
+
 if __name__ == '__main__':
     # Gathers the input arguments and its variables
     args = get_arguments()
     output_file = args.output_file
     start_page = args.start_page
 
-    # Auto-resume logic: find the last scraped page
-    if start_page == 1:
+    # Workers write into their own segment log, as several of them may append concurrently
+    worker_id = args.worker_id or default_worker_id()
+    segments_dir = f'{output_file}.segments' if args.mode == 'single' else f'{output_file}.segments-{worker_id}'
+
+    # Opens the segment log, whose manifest holds the last committed page
+    log = SegmentLog(segments_dir) if args.storage == 'segments' and args.mode != 'coordinator' else None
+
+    # Auto-resume logic: find the last scraped page (workers resume from the queue instead)
+    auto_resumed = False
+    if args.mode == 'single' and start_page == 1 and log is not None:
+        if log.last_page > 0:
+            start_page = log.last_page + 1
+            auto_resumed = True
+            print(f"Found existing data up to page {log.last_page}. Auto-resuming from page {start_page}.")
+
+    elif args.mode == 'single' and start_page == 1:
         dirname = os.path.dirname(output_file) or '.'
         basename = os.path.basename(output_file)
         
@@ -55,10 +142,31 @@ if __name__ == '__main__':
         
         if max_page > 0:
             start_page = max_page + 1
+            auto_resumed = True
             print(f"Found existing data up to page {max_page}. Auto-resuming from page {start_page}.")
 
+    # Opens the optional wine store, where the snapshot is labeled after the output file
+    store = WineStore(args.store) if args.store and args.mode != 'coordinator' else None
+    snapshot = os.path.splitext(os.path.basename(output_file))[0]
+
+    # Instantiates the optional response cache
+    cache = ResponseCache(args.cache_dir) if args.cache_dir else None
+
+    # Instantiates the metrics registry, optionally served over HTTP
+    metrics = Metrics()
+    if args.metrics_port:
+        metrics.serve(args.metrics_port, args.metrics_host)
+    last_export = time.time()
+
+    def export_metrics(force=False):
+        global last_export
+
+        if args.metrics_file and (force or time.time() - last_export >= c.METRICS_INTERVAL):
+            metrics.write(args.metrics_file)
+            last_export = time.time()
+
     # Instantiates a wrapper over the `requests` package
-    r = Requester(c.BASE_URL)
+    r = Requester(c.BASE_URL, cache=cache, metrics=metrics)
 
     # Defines the base payload
     base_payload = {
@@ -66,77 +174,61 @@ if __name__ == '__main__':
         "wine_type_ids[]": 1,
     }
 
-    # Global variables for the recursive process
-    global_page_counter = 1
+    # Compiles the extractor of the wine entries
+    extractor = Extractor()
+
+    # Global variables for the scraping process
     seen_wines = set()
     dumped_taste = False
-    dumped_reviews = False
 
-    def fetch_wines_recursive(min_price, max_price):
-        global global_page_counter, dumped_taste, dumped_reviews
-        
+    def scrape_leaf(leaf):
+        global dumped_taste
+
+        min_price, max_price = leaf['min'], leaf['max']
+
         # Create a copy of payload for this specific range
         current_payload = base_payload.copy()
         current_payload['price_range_min'] = min_price
         current_payload['price_range_max'] = max_price
-        
-        print(f"Checking price range: {min_price} - {max_price}")
 
-        try:
-            # Get the number of matches for this range
-            res = r.get('explore/explore?', params=current_payload)
-            if res is None or res.status_code != 200:
-                print(f"Error fetching count for range {min_price}-{max_price}")
-                return
-
-            n_matches = res.json()['explore_vintage']['records_matched']
-            print(f"Found {n_matches} matches for price range {min_price}-{max_price}")
-
-            # If too many matches, split the range (unless range is too small)
-            if n_matches >= 2000 and (max_price - min_price) > 0.02:
-                mid_price = (min_price + max_price) / 2
-                fetch_wines_recursive(min_price, mid_price)
-                fetch_wines_recursive(mid_price, max_price)
-                return
-
-            # Calculate number of pages for this range
-            num_pages = max(1, int(n_matches / c.RECORDS_PER_PAGE)) + 1
-            
-            # Optimization: Skip pages if we haven't reached start_page yet
-            if global_page_counter + num_pages < start_page:
-                print(f"Skipping {num_pages} pages (current: {global_page_counter}, target: {start_page})")
-                global_page_counter += num_pages
-                return
+        print(f"Scraping price range: {min_price} - {max_price} ({leaf['matches']} matches)")
+
+        # Number of pages that could not be fetched or saved, leaving the leaf to be scraped again
+        failed_pages = 0
 
+        try:
             # Iterate through pages for this range
             consecutive_duplicates = 0
             previous_matches = []
 
-            for i in range(1, num_pages + 1):
-                # Check if we should process this page based on global counter
-                if global_page_counter < start_page:
-                    global_page_counter += 1
+            for i in range(1, leaf['pages'] + 1):
+                # Check if we should process this page based on its global identifier
+                global_page = leaf['first_page'] + i - 1
+                if global_page < start_page:
                     continue
 
                 current_payload['page'] = i
-                print(f'Global Page: {global_page_counter} (Local Page: {i}, Price: {min_price}-{max_price})')
+                print(f'Global Page: {global_page} (Local Page: {i}, Price: {min_price}-{max_price})')
 
                 try:
-                    res = r.get('explore/explore', params=current_payload)
+                    with metrics.timer('explore_page'):
+                        res = r.get('explore/explore', params=current_payload)
                     
-                    if res is None or res.status_code != 200:
-                        print(f"Error: Request failed")
-                        continue
+                        if res is None or res.status_code != 200:
+                            print(f"Error: Request failed")
+                            failed_pages += 1
+                            continue
                     
-                    response_data = res.json()
-                    matches = response_data['explore_vintage'].get('matches', [])
+                        response_data = loads(res.content)
+                        matches = response_data['explore_vintage'].get('matches', [])
                     
                     if not matches:
                         print(f"No matches found")
                         break
 
                     # Duplicate detection
-                    current_ids = [m['vintage']['wine']['id'] for m in matches if 'vintage' in m and 'wine' in m['vintage']]
+                    ids = [match_id(match) for match in matches]
+                    current_ids = [wine_id for wine_id in ids if wine_id is not None]
                     
                     # Check if all wines in this page have been seen before
                     duplicates_count = 0
@@ -158,121 +250,246 @@ if __name__ == '__main__':
                     
                     consecutive_duplicates = 0
 
+                    # Fans out the tastes requests, results come back in page order
+                    details = executor.map(lambda wine_id: fetch_wine_tastes(r, wine_id) if wine_id is not None else {}, ids)
+
                     # Process wines
                     data = {'wines': []}
-                    for match in matches:
-                        try:
-                            wine = match['vintage']['wine']
-                            vintage = match['vintage']
-                            
-                            # ...existing code...
-                            # Safely extract grapes
-                            grapes_list = []
-                            if wine.get('style') and isinstance(wine.get('style'), dict):
-                                style_grapes = wine.get('style', {}).get('grapes', [])
-                                if style_grapes and isinstance(style_grapes, list):
-                                    grapes_list = [grape.get('name', '') for grape in style_grapes if isinstance(grape, dict) and grape.get('name')]
-                            
-                            wine_entry = {
-                                'id' : wine['id'],
-                                'name': vintage.get('name'),
-                                'vintage': vintage.get('year'),
-                                'country': wine['region']['country']['name'] if wine.get('region', {}).get('country') else None,
-                                'winery': wine['winery']['name'] if wine.get('winery') else None,
-                                'grapes': ';'.join(grapes_list),
-                                'rating': vintage['statistics'].get('ratings_average'),
-                                'reviews_count': vintage['statistics'].get('ratings_count'),
-                                'price': match.get('price', {}).get('amount') if match.get('price') else None
-                            }
-
-                            # Fetch reviews for specific vintage
-                            try:
-                                res_reviews = r.get(f'wines/{wine["id"]}/reviews')
-                                
-                                if not dumped_reviews and res_reviews and res_reviews.status_code == 200:
-                                    with open('debug_wine_reviews.json', 'w', encoding='utf-8') as f:
-                                        json.dump(res_reviews.json(), f, indent=2, ensure_ascii=False)
-                                    dumped_reviews = True
-                                
-                                if res_reviews and res_reviews.status_code == 200:
-                                    reviews_data = res_reviews.json()
-                                    # Store the number of reviews returned (usually capped at a page size, e.g. 3 or 10)
-                                    # This confirms existence of text reviews for this vintage
-                                    wine_entry['reviews_count'] = len(reviews_data.get('reviews', []))
-                                else:
-                                    wine_entry['reviews_count'] = 0
-                            except Exception as e:
-                                print(f"Error fetching reviews: {e}")
-                                wine_entry['reviews_count'] = 0
-
-                            # Fetch tastes
-                            try:
-                                res_taste = r.get(f'wines/{wine["id"]}/tastes')
-                                if not dumped_taste:
-                                    with open('debug_wine_tastes.json', 'w', encoding='utf-8') as f:
-                                        json.dump(res_taste.json(), f, indent=2, ensure_ascii=False)
-                                    dumped_taste = True
-                                
-                                tastes = res_taste.json() if res_taste and res_taste.status_code == 200 else {}
-                            except Exception:
-                                tastes = {}
-
-                            # Process tastes
-                            try:
-                                tastes_block = tastes.get('tastes', {}) if isinstance(tastes, dict) else {}
-                                structure = tastes_block.get('structure', {}) if isinstance(tastes_block, dict) else {}
-
-                                wine_entry['acidity'] = structure.get('acidity') if structure else None
-                                wine_entry['intensity'] = structure.get('intensity') if structure else None
-                                wine_entry['sweetness'] = structure.get('sweetness') if structure else None
-                                wine_entry['tannin'] = structure.get('tannin') if structure else None
-                                
-                                taste_flavors = tastes_block.get('flavor', []) if isinstance(tastes_block, dict) else []
-                                if taste_flavors and isinstance(taste_flavors, list):
-                                    sorted_flavors = sorted(
-                                        taste_flavors, 
-                                        key=lambda x: x.get('stats', {}).get('mentions_count', 0) if isinstance(x, dict) else 0, 
-                                        reverse=True
-                                    )[:3]
-                                else:
-                                    sorted_flavors = []
-                                
-                                for idx, flavor in enumerate(sorted_flavors, start=1):
-                                    wine_entry[f'flavor_rank{idx}'] = flavor.get('group') if isinstance(flavor, dict) else None
-                                for idx in range(len(sorted_flavors) + 1, 4):
-                                    wine_entry[f'flavor_rank{idx}'] = None
-                                    
-                            except Exception as e:
-                                print(f"Error processing taste: {e}")
-                                # Fill None for taste fields
-                                for field in ['acidity', 'intensity', 'sweetness', 'tannin', 'flavor_rank1', 'flavor_rank2', 'flavor_rank3']:
-                                    wine_entry[field] = None
-
-                            data['wines'].append(wine_entry)
-
-                        except Exception as e:
-                            print(f"Error processing match: {e}")
+                    enrich_start = time.perf_counter()
+                    for match, tastes in zip(matches, details):
+                        if args.debug_dumps and not dumped_taste and tastes:
+                            with open('debug_wine_tastes.json', 'w', encoding='utf-8') as f:
+                                json.dump(tastes, f, ensure_ascii=False)
+                            dumped_taste = True
+
+                        # Builds the entry out of both payloads, matches without a wine being dropped
+                        wine_entry = extractor(match, tastes)
+                        if wine_entry is None:
                             continue
 
-                    # Save file using global counter
+                        data['wines'].append(wine_entry)
+
+                    # Reports the values missing from the payloads, per field
+                    for field, count in extractor.take_missing().items():
+                        metrics.inc('missing_fields_total', field, count)
+
+                    metrics.observe('phase_seconds', 'enrich', time.perf_counter() - enrich_start)
+
+                    # Save page using global page identifier
                     try:
-                        filename = f'{global_page_counter}_{output_file}'
-                        with open(filename, 'w', encoding='utf-8') as f:
-                            json.dump(data, f, indent=2, ensure_ascii=False)
-                        print(f"Saved {filename}")
+                        if log is not None:
+                            with metrics.timer('write'):
+                                segment, offset, _ = log.append(global_page, data)
+                            print(f"Saved page {global_page} into {segment} at offset {offset}")
+                        else:
+                            filename = f'{global_page}_{output_file}'
+                            with metrics.timer('json_dump'):
+                                payload = json.dumps(data, indent=2, ensure_ascii=False)
+                            with metrics.timer('write'):
+                                with open(filename, 'w', encoding='utf-8') as f:
+                                    f.write(payload)
+                            print(f"Saved {filename}")
                     except Exception as e:
                         print(f"Error saving file: {e}")
+                        failed_pages += 1
+
+                    # Harvests the reviews of the page into the shards
+                    if harvester is not None:
+                        try:
+                            with metrics.timer('reviews'):
+                                harvested = harvester.harvest(wine['id'] for wine in data['wines'])
+                            metrics.inc('reviews_total', value=harvested['reviews'])
+                            print(f"Harvested {harvested['reviews']} reviews of {harvested['wines']} wines "
+                                  f"({harvested['skipped']} skipped, {harvested['failed']} failed)")
+                        except Exception as e:
+                            print(f"Error harvesting reviews: {e}")
+
+                    if store is not None:
+                        try:
+                            with metrics.timer('store'):
+                                store.add_wines(snapshot, data['wines'])
+                        except Exception as e:
+                            print(f"Error storing page: {e}")
+
+                    # Reports the throughput of the run
+                    metrics.progress(pages=1, wines=len(data['wines']))
+                    throughput = metrics.throughput()
+                    eta = throughput['eta_seconds']
+                    print(f"Progress: {throughput['pages']}/{throughput['total_pages']} pages, "
+                          f"{throughput['pages_per_sec']:.2f} pages/s, {throughput['wines_per_sec']:.2f} wines/s, "
+                          f"ETA {'?' if eta is None else f'{eta:.0f}s'}")
+                    export_metrics()
 
                 except Exception as e:
                     print(f"Error on page {i}: {e}")
-                
-                # Increment global counter after processing the page
-                global_page_counter += 1
+                    failed_pages += 1
 
         except Exception as e:
-            print(f"Error in recursive fetch: {e}")
+            print(f"Error scraping price range {min_price}-{max_price}: {e}")
+            return False
+
+        if failed_pages:
+            print(f"{failed_pages} pages of price range {min_price}-{max_price} failed, leaving it pending")
+            return False
+
+        return True
+
+    # Bounded pool used to enrich every page with its tastes
+    executor = ThreadPoolExecutor(max_workers=max(1, args.workers))
+
+    # Opens the optional review shards, where workers harvest into their own directory
+    harvester = None
+    if args.reviews_dir and args.mode != 'coordinator':
+        reviews_dir = args.reviews_dir if args.mode == 'single' else f'{args.reviews_dir}-{worker_id}'
+        harvester = ReviewHarvester(r, ReviewShards(reviews_dir), args.workers, max_pages=args.reviews_max_pages)
+
+    def close_harvester():
+        if harvester is not None:
+            harvester.close()
+            harvester.shards.close()
+            print(f"Review shards: {harvester.shards.stats()}")
+
+    def close_cache():
+        if cache is not None:
+            print(f"Cache statistics: {cache.stats()}")
+            cache.close()
+
+    def work_off_queue(queue):
+        # Claims and scrapes leaves until every one of them has been committed
+        print(f"Worker {worker_id} polling {queue_file}")
+        while True:
+            leaf = queue.claim(worker_id)
+
+            if leaf is None:
+                counts = queue.counts()
+                if not counts['pending'] and not counts['leased']:
+                    break
+
+                # Waits for the leases held by other workers to be committed or to expire
+                time.sleep(c.QUEUE_POLL)
+                continue
+
+            with queue.lease(leaf, worker_id) as lease:
+                success = scrape_leaf(leaf)
+
+            if lease.lost:
+                print(f"Lease of price range {leaf['min']}-{leaf['max']} was lost, leaving it to its new owner")
+            elif success:
+                queue.complete(leaf['id'], worker_id)
+            else:
+                queue.release(leaf['id'], worker_id)
+
+    queue_file = args.queue or f'{output_file}.queue.sqlite'
+
+    # Workers do not plan, they only scrape the leaves claimed from the queue
+    if args.mode == 'worker':
+        queue = WorkQueue(queue_file)
+        try:
+            work_off_queue(queue)
+        finally:
+            executor.shutdown()
+            close_harvester()
+            queue.close()
+
+            if log is not None:
+                log.close()
+
+            if store is not None:
+                store.close()
+
+            export_metrics(force=True)
+            metrics.close()
+            close_cache()
+
+        sys.exit(0)
+
+    # Plans the price ranges from 0 to 50000 (should cover all wines), unless a plan can be reused
+    planner = PricePlanner(r, base_payload, args.plan_file or f'{output_file}.plan.json')
+    if args.replan or not planner.load():
+        print("Planning price segmentation...")
+        seed = None
+        if args.seed_plan:
+            with open(args.seed_plan, 'r', encoding='utf-8') as f:
+                seed = json.load(f).get('leaves')
+        planner.build(0, 50000, seed=seed)
+
+    # A loaded plan tracks the scraped leaves itself, so that leaves left pending (e.g. by failed
+    # pages) are scraped again as a whole, rather than skipped up to the last saved page
+    elif auto_resumed and args.mode == 'single':
+        start_page = 1
+        print(f"Resuming the pending price ranges of {planner.plan_file} instead")
+
+    print(f"Planned {len(planner.leaves)} price ranges over {sum(leaf['pages'] for leaf in planner.leaves)} pages")
+
+    # The coordinator fills the queue, then optionally spawns local workers and waits for them
+    if args.mode == 'coordinator':
+        executor.shutdown()
+
+        queue = WorkQueue(queue_file)
+        if queue.enqueue(planner.leaves):
+            print(f"Enqueued {len(planner.leaves)} price ranges into {queue_file}")
+
+        worker_args = [sys.executable, os.path.abspath(__file__), output_file, '-mode', 'worker', '-queue', queue_file,
+                       '-storage', args.storage, '-workers', str(args.workers)]
+        if args.cache_dir:
+            worker_args += ['-cache_dir', args.cache_dir]
+        if args.reviews_dir:
+            worker_args += ['-reviews_dir', args.reviews_dir, '-reviews_max_pages', str(args.reviews_max_pages)]
+        if args.store:
+            worker_args += ['-store', args.store]
+        if args.debug_dumps:
+            worker_args += ['-debug_dumps']
+
+        def spawn(i):
+            # Every worker exports its metrics into its own file (a single port cannot be shared)
+            metrics_args = []
+            if args.metrics_file:
+                root, ext = os.path.splitext(args.metrics_file)
+                metrics_args = ['-metrics_file', f'{root}-{i}{ext}']
+
+            return subprocess.Popen(worker_args + metrics_args + ['-worker_id', f'{default_worker_id()}-{i}'])
+
+        try:
+            processes = [spawn(i) for i in range(args.spawn)]
+            for process in processes:
+                process.wait()
+
+            print(f"Queue status: {queue.counts()}")
+        finally:
+            queue.close()
+            close_cache()
+
+        sys.exit(0)
+
+    # Estimates the remaining pages, used by the ETA, where pages before `start_page` are skipped
+    metrics.total_pages = sum(leaf['pages'] - max(0, start_page - leaf['first_page']) for leaf in planner.pending(start_page))
 
-    # Start the recursive scraping from 0 to 50000 (should cover all wines)
+    # Walks the pending leaves of the plan
     print("Starting scraping with price segmentation...")
-    fetch_wines_recursive(0, 50000)
+    try:
+        with profiling(output_file) if args.profile else nullcontext():
+            for leaf in planner.pending(start_page):
+                # Marks the leaf as scraped once all of its pages succeeded, so that resumes skip it
+                if scrape_leaf(leaf):
+                    planner.mark_done(leaf)
+    finally:
+        executor.shutdown()
+        close_harvester()
+
+        # Reports the values missing from the payloads over the whole run
+        with metrics.lock:
+            missing = {label: int(count) for (name, label), count in metrics.counters.items() if name == 'missing_fields_total'}
+        if missing:
+            print(f"Missing fields: {missing}")
+
+        export_metrics(force=True)
+        metrics.close()
+
+        if log is not None:
+            log.close()
+
+        if store is not None:
+            store.close()
+
+        close_cache()
 
@@ -1,6 +1,11 @@
 import argparse
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import utils.constants as c
+from utils.bloom import BloomFilter
 from utils.requester import Requester
 
 
@@ -16,16 +21,109 @@ def get_arguments():
 
     parser.add_argument('output_file', help='Output .txt file', type=str)
 
-    parser.add_argument('-start_page', help='Starting page identifier', type=int, default=1)
+    parser.add_argument('-start_page', help='Starting page identifier (defaults to resuming from the checkpoint)', type=int, default=None)
+
+    parser.add_argument('-prefetch', help='Number of explore pages kept in flight (at least 1)', type=int, default=c.LIST_PREFETCH)
+
+    parser.add_argument('-dedup', help='Tracks the written wine ids in a set or in a compact bloom filter',
+                        choices=['set', 'bloom'], default='set')
+
+    parser.add_argument('-bloom_capacity', help='Expected number of wines of the bloom filter', type=int, default=c.BLOOM_CAPACITY)
 
     return parser.parse_args()
 
 
+def fetch_page(r, payload, page):
+    """Fetches an explore page and parses its wine identifiers.
+
+    Args:
+        r (Requester): Wrapper used to perform the requests.
+        payload (dict): Filters of the search.
+        page (int): Page identifier.
+
+    Returns:
+        The identifiers of the wines of the page.
+
+    """
+
+    res = r.get('explore/explore', params={**payload, 'page': page})
+
+    return [match['vintage']['wine']['id'] for match in res.json()['explore_vintage']['matches']]
+
+
+def load_checkpoint(checkpoint_file):
+    """Loads the checkpoint of the last fully written page.
+
+    Args:
+        checkpoint_file (str): Path to the checkpoint.
+
+    Returns:
+        A dictionary holding the last written `page` and the output size (`bytes`) after it,
+        or None if there is no checkpoint.
+
+    """
+
+    if not os.path.exists(checkpoint_file):
+        return None
+
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_checkpoint(checkpoint_file, page, n_bytes):
+    """Atomically saves the checkpoint of the last fully written page.
+
+    Args:
+        checkpoint_file (str): Path to the checkpoint.
+        page (int): Last written page.
+        n_bytes (int): Size of the output file after the page.
+
+    """
+
+    tmp_file = f'{checkpoint_file}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'page': page, 'bytes': n_bytes}, f)
+
+    os.replace(tmp_file, checkpoint_file)
+
+
 if __name__ == '__main__':
     # Gathers the input arguments and its variables
     args = get_arguments()
     output_file = args.output_file
+    checkpoint_file = f'{output_file}.checkpoint'
+
+    # Resumes after the last fully written page, dropping whatever was written past it
+    checkpoint = load_checkpoint(checkpoint_file)
     start_page = args.start_page
+    if start_page is None:
+        start_page = 1
+        if checkpoint is not None and os.path.exists(output_file):
+            start_page = checkpoint['page'] + 1
+            with open(output_file, 'r+b') as f:
+                f.truncate(checkpoint['bytes'])
+            print(f"Resuming from page {start_page} (checkpoint of {checkpoint_file})")
+
+    # Tracks the already written wine ids, re-seeded from the output file
+    seen_ids = BloomFilter(args.bloom_capacity) if args.dedup == 'bloom' else set()
+    if os.path.exists(output_file):
+        n_bytes = 0
+        with open(output_file, 'rb') as f:
+            for line in f:
+                # A torn last line (e.g. cut by a crash) is dropped, as its id may be truncated
+                if not line.endswith(b'\n'):
+                    break
+                n_bytes += len(line)
+
+                # Blank or malformed lines are skipped
+                try:
+                    seen_ids.add(int(line.strip().rsplit(b'/', 1)[-1]))
+                except ValueError:
+                    continue
+
+        if n_bytes < os.path.getsize(output_file):
+            with open(output_file, 'r+b') as f:
+                f.truncate(n_bytes)
 
     # Instantiates a wrapper over the `requests` package
     r = Requester(c.BASE_URL)
@@ -57,20 +155,50 @@ if __name__ == '__main__':
 
     print(f'Number of matches: {n_matches}')
 
-    # Iterates through the amount of possible pages
-    for i in range(start_page, max(1, int(n_matches / c.RECORDS_PER_PAGE)) + 1):
-        # Adds the page to the payload
-        payload['page'] = i
-
-        print(f'Scraping data from page: {payload["page"]}')
-
-        # Performs the request and scraps the URLs
-        res = r.get('explore/explore', params=payload)
-        matches = res.json()['explore_vintage']['matches']
-
-        # Opens the output file with append
-        with open(output_file, 'a') as f:
-            # Iterates over every match
-            for match in matches:
-                # Dumps the URL to file
-                f.write(f'{c.BASE_URL}w/{match["vintage"]["wine"]["id"]}\n')
+    pages = range(start_page, max(1, int(n_matches / c.RECORDS_PER_PAGE)) + 1)
+    n_written = n_duplicates = 0
+
+    # Keeps `prefetch` pages in flight, while a single buffered writer consumes them in order
+    prefetch = max(1, args.prefetch)
+    with ThreadPoolExecutor(prefetch) as executor, \
+            open(output_file, 'a', buffering=c.LIST_WRITE_BUFFER) as f:
+        in_flight = deque()
+        written_page = None
+
+        def write_page(page, wine_ids):
+            print(f'Scraping data from page: {page}')
+
+            # Dumps the URLs of the wines that have not been written yet
+            n_new = 0
+            for wine_id in wine_ids:
+                if wine_id not in seen_ids:
+                    seen_ids.add(wine_id)
+                    f.write(f'{c.BASE_URL}w/{wine_id}\n')
+                    n_new += 1
+
+            return n_new, len(wine_ids) - n_new
+
+        def commit(page):
+            f.flush()
+            os.fsync(f.fileno())
+            save_checkpoint(checkpoint_file, page, f.tell())
+
+        try:
+            for page in pages:
+                in_flight.append((page, executor.submit(fetch_page, r, payload, page)))
+
+                # Consumes the oldest page once the pipeline is full (or every page submitted)
+                while in_flight and (len(in_flight) == prefetch or page == pages[-1]):
+                    written, future = in_flight.popleft()
+                    n_new, n_dup = write_page(written, future.result())
+                    n_written, n_duplicates, written_page = n_written + n_new, n_duplicates + n_dup, written
+
+                    if written_page % c.LIST_CHECKPOINT_PAGES == 0:
+                        commit(written_page)
+
+        finally:
+            # Only fully written pages are checkpointed, a failed page being fetched again on resume
+            if written_page is not None:
+                commit(written_page)
+
+    print(f'Wrote {n_written} URLs ({n_duplicates} duplicates skipped)')
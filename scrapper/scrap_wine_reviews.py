@@ -0,0 +1,76 @@
+import argparse
+import csv
+import os
+
+import utils.constants as c
+from utils.file import iter_json_array, iter_json_records
+from utils.requester import Requester
+from utils.reviews import ReviewHarvester, ReviewShards
+
+
+def get_arguments():
+    """Gets arguments from the command line.
+
+    Returns:
+        A parser with the input arguments.
+
+    """
+
+    parser = argparse.ArgumentParser(usage='Harvests the reviews of the wines of a snapshot from Vivino.')
+
+    parser.add_argument('input_file', help='Input .csv or merged .json snapshot, or name of indexed JSON files', type=str)
+
+    parser.add_argument('reviews_dir', help='Directory of the compressed review shards', type=str)
+
+    parser.add_argument('-workers', help='Number of wines whose reviews are fetched concurrently', type=int, default=c.ENRICH_WORKERS)
+
+    parser.add_argument('-per_page', help='Number of reviews per page', type=int, default=c.REVIEWS_PER_PAGE)
+
+    parser.add_argument('-max_pages', help='Maximum number of harvested review pages per wine', type=int, default=c.REVIEWS_MAX_PAGES)
+
+    return parser.parse_args()
+
+
+def iter_wine_ids(path):
+    """Streams the wine identifiers of a snapshot.
+
+    Args:
+        path (str): Path to a .csv or merged .json snapshot, or name of indexed JSON files.
+
+    Returns:
+        A generator over the identifiers.
+
+    """
+
+    if path.endswith('.csv'):
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield int(row['id'])
+    elif os.path.isfile(path):
+        for wine in iter_json_array(path, 'wines'):
+            yield wine['id']
+    else:
+        for wine in iter_json_records(path):
+            yield wine['id']
+
+
+if __name__ == '__main__':
+    # Gathers the input arguments
+    args = get_arguments()
+
+    # Instantiates a wrapper over the `requests` package
+    r = Requester(c.BASE_URL)
+
+    # Wines already harvested into the shards are skipped, hence resuming an interrupted run
+    shards = ReviewShards(args.reviews_dir)
+    harvester = ReviewHarvester(r, shards, args.workers, args.per_page, args.max_pages)
+
+    try:
+        summary = harvester.harvest(iter_wine_ids(args.input_file))
+    finally:
+        harvester.close()
+        shards.close()
+
+    print(f"Harvested {summary['reviews']} reviews of {summary['wines']} wines "
+          f"({summary['skipped']} skipped, {summary['failed']} failed)")
+    print(f"Review shards: {shards.stats()}")
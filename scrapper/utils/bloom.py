@@ -0,0 +1,68 @@
+"""Module used to keep track of already seen items within a compact bloom filter."""
+
+import hashlib
+import math
+
+
+class BloomFilter:
+    """Bloom filter over a bit array, whose hashes are derived from a single BLAKE2 digest.
+
+    Membership tests never miss an added item, but may wrongly report an unseen one with
+    (at most) the configured false positive rate, once `capacity` items have been added.
+
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        """Initializition method.
+
+        Args:
+            capacity (int): Expected number of items.
+            error_rate (float): Target false positive rate at capacity.
+
+        """
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+        # Optimal number of bits and of hash functions
+        self.n_bits = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.n_hashes = max(1, int(round(self.n_bits / capacity * math.log(2))))
+
+        self.bits = bytearray((self.n_bits + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _positions(self, item):
+        # Double hashing: the i-th position is h1 + i * h2
+        digest = hashlib.blake2b(str(item).encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def add(self, item):
+        """Adds an item to the filter.
+
+        Args:
+            item (object): Item, hashed through its string representation.
+
+        Returns:
+            Whether the item had (probably) not been seen before.
+
+        """
+
+        new = False
+        for position in self._positions(item):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                new = True
+
+        self.count += new
+
+        return new
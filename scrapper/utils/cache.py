@@ -0,0 +1,198 @@
+"""Module used to provide a persistent, size-bounded cache of API responses."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from fnmatch import fnmatch
+
+from . import constants as c
+
+
+class ResponseCache:
+    """Stores compressed response bodies on disk, keyed by endpoint and parameters.
+
+    Entries expire according to per-endpoint TTLs and the least recently used ones
+    are evicted whenever the total stored size exceeds the size cap.
+
+    """
+
+    def __init__(self, cache_dir, ttls=None, max_bytes=c.CACHE_MAX_BYTES):
+        """Initializition method.
+
+        Args:
+            cache_dir (str): Directory holding the cache database.
+            ttls (dict): Glob patterns over endpoints mapped to their time-to-live (in seconds),
+                where endpoints that match no pattern are never cached.
+            max_bytes (int): Maximum size (in bytes) of the compressed bodies.
+
+        """
+
+        # Defines the expiration and eviction policies
+        self.ttls = c.CACHE_TTLS if ttls is None else ttls
+        self.max_bytes = max_bytes
+
+        # Defines the hit/miss statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Opens the database, which is shared between the requesting threads
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(os.path.join(cache_dir, 'cache.sqlite'), check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('''CREATE TABLE IF NOT EXISTS responses (
+                               key TEXT PRIMARY KEY,
+                               endpoint TEXT,
+                               created REAL,
+                               accessed REAL,
+                               size INTEGER,
+                               body BLOB)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+        self.db.commit()
+
+        # Keeps track of the stored size to avoid summing it on every insertion
+        self.size = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def ttl(self, endpoint):
+        """Gets the time-to-live of an endpoint.
+
+        Args:
+            endpoint (str): Endpoint to be consumed.
+
+        Returns:
+            The time-to-live (in seconds) or None if the endpoint should not be cached.
+
+        """
+
+        for pattern, ttl in self.ttls.items():
+            if fnmatch(endpoint, pattern):
+                return ttl
+
+        return None
+
+    @staticmethod
+    def key(endpoint, params=None):
+        """Builds the key of a request.
+
+        Args:
+            endpoint (str): Endpoint to be consumed.
+            params (dict): Query parameters of the request.
+
+        Returns:
+            A hexadecimal digest identifying the request.
+
+        """
+
+        # Sorts the parameters so that their order does not matter
+        payload = json.dumps([endpoint, sorted((params or {}).items())], default=str)
+
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+    def get(self, endpoint, params=None):
+        """Gets a cached body.
+
+        Args:
+            endpoint (str): Endpoint to be consumed.
+            params (dict): Query parameters of the request.
+
+        Returns:
+            The decompressed body or None if it is missing or expired.
+
+        """
+
+        ttl = self.ttl(endpoint)
+        if ttl is None:
+            return None
+
+        key = self.key(endpoint, params)
+        now = time.time()
+
+        with self.lock:
+            row = self.db.execute('SELECT created, body FROM responses WHERE key = ?', (key,)).fetchone()
+
+            if row is None or now - row[0] > ttl:
+                self.misses += 1
+                return None
+
+            # Refreshes the access time used by the LRU eviction
+            self.db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+            self.db.commit()
+            self.hits += 1
+
+        return zlib.decompress(row[1])
+
+    def set(self, endpoint, params, body):
+        """Stores a body.
+
+        Args:
+            endpoint (str): Endpoint that has been consumed.
+            params (dict): Query parameters of the request.
+            body (bytes): Raw body of the response.
+
+        """
+
+        if self.ttl(endpoint) is None:
+            return
+
+        key = self.key(endpoint, params)
+        compressed = zlib.compress(body, c.CACHE_COMPRESSION_LEVEL)
+        now = time.time()
+
+        with self.lock:
+            row = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self.size -= row[0]
+
+            self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                            (key, endpoint, now, now, len(compressed), compressed))
+            self.size += len(compressed)
+
+            # Evicts the least recently used entries past the size cap
+            while self.size > self.max_bytes:
+                rows = self.db.execute('SELECT key, size FROM responses ORDER BY accessed LIMIT 64').fetchall()
+                if not rows:
+                    break
+
+                for evicted_key, size in rows:
+                    self.db.execute('DELETE FROM responses WHERE key = ?', (evicted_key,))
+                    self.size -= size
+                    self.evictions += 1
+
+                    if self.size <= self.max_bytes:
+                        break
+
+            self.db.commit()
+
+    def stats(self):
+        """Gets the cache statistics.
+
+        Returns:
+            A dictionary holding the hits, misses, hit ratio, evictions, entries and stored bytes.
+
+        """
+
+        # Reads the stored size back, as other processes (e.g. workers) may share the cache
+        with self.lock:
+            entries, self.size = self.db.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+
+        lookups = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': self.size
+        }
+
+    def close(self):
+        """Closes the underlying database."""
+
+        with self.lock:
+            self.db.close()
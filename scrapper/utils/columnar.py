@@ -0,0 +1,266 @@
+"""Module used to export and load typed, columnar wine snapshots."""
+
+import json
+import os
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from .file import iter_json_array, iter_unique_records
+
+# Storage kind of every exported column
+SCHEMA = {
+    'id': 'int64',
+    'name': 'string',
+    'vintage': 'int16',
+    'country': 'dictionary',
+    'winery': 'dictionary',
+    'grapes': 'dictionary',
+    'rating': 'float32',
+    'price': 'float64',
+    'acidity': 'float32',
+    'intensity': 'float32',
+    'sweetness': 'float32',
+    'tannin': 'float32',
+    'flavor_rank1': 'dictionary',
+    'flavor_rank2': 'dictionary',
+    'flavor_rank3': 'dictionary'
+}
+
+
+def _build_columns(wines):
+    """Builds the typed columns of a stream of wines.
+
+    Args:
+        wines (iterable): Stream of wines.
+
+    Returns:
+        A dictionary mapping every column to a tuple holding its values and its
+        categories (dictionary columns) or null mask (`vintage`).
+
+    """
+
+    values = {column: [] for column in SCHEMA}
+    categories = {column: {} for column, kind in SCHEMA.items() if kind == 'dictionary'}
+    vintage_mask = []
+
+    for wine in wines:
+        for column, kind in SCHEMA.items():
+            value = wine.get(column)
+
+            if kind == 'dictionary':
+                # Encodes the value as its index within the categories, -1 meaning missing
+                if value in (None, ''):
+                    values[column].append(-1)
+                else:
+                    values[column].append(categories[column].setdefault(value, len(categories[column])))
+
+            elif column == 'vintage':
+                # Non-vintage wines ('N.V.') and missing years are masked out
+                try:
+                    values[column].append(int(value))
+                    vintage_mask.append(False)
+                except (TypeError, ValueError):
+                    values[column].append(0)
+                    vintage_mask.append(True)
+
+            elif kind == 'string':
+                values[column].append(value or '')
+
+            else:
+                values[column].append(np.nan if value in (None, '') and kind.startswith('float') else value)
+
+    columns = {}
+    for column, kind in SCHEMA.items():
+        if kind == 'dictionary':
+            columns[column] = (np.asarray(values[column], dtype=np.int32), list(categories[column]))
+        elif column == 'vintage':
+            columns[column] = (np.asarray(values[column], dtype=np.int16), np.asarray(vintage_mask, dtype=bool))
+        elif kind == 'string':
+            columns[column] = (values[column], None)
+        else:
+            columns[column] = (np.asarray(values[column], dtype=kind), None)
+
+    return columns
+
+
+def _write_npy(columns, path):
+    """Writes the columns as a directory of NumPy arrays, which can be memory-mapped.
+
+    Args:
+        columns (dict): Typed columns.
+        path (str): Output directory.
+
+    """
+
+    os.makedirs(path, exist_ok=True)
+
+    n_rows = 0
+    for column, (data, extra) in columns.items():
+        kind = SCHEMA[column]
+
+        if kind == 'string':
+            # Stores the UTF-8 bytes of every string along with their offsets
+            encoded = [value.encode('utf-8') for value in data]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            np.save(os.path.join(path, f'{column}.offsets.npy'), offsets)
+            with open(os.path.join(path, f'{column}.bytes'), 'wb') as f:
+                f.write(b''.join(encoded))
+            n_rows = len(encoded)
+            continue
+
+        np.save(os.path.join(path, f'{column}.npy'), data)
+
+        if kind == 'dictionary':
+            with open(os.path.join(path, f'{column}.dict.json'), 'w', encoding='utf-8') as f:
+                json.dump(extra, f, ensure_ascii=False)
+        elif extra is not None:
+            np.save(os.path.join(path, f'{column}.mask.npy'), extra)
+
+    with open(os.path.join(path, 'schema.json'), 'w', encoding='utf-8') as f:
+        json.dump({'rows': n_rows, 'columns': SCHEMA}, f)
+
+
+def _write_parquet(columns, path):
+    """Writes the columns as a Parquet file.
+
+    Args:
+        columns (dict): Typed columns.
+        path (str): Output file.
+
+    """
+
+    arrays = {}
+    for column, (data, extra) in columns.items():
+        kind = SCHEMA[column]
+
+        if kind == 'dictionary':
+            # Missing values are masked, their placeholder index pointing to a valid category
+            arrays[column] = pa.DictionaryArray.from_arrays(
+                pa.array(np.where(data < 0, 0, data), mask=data < 0), pa.array(extra, type=pa.string()))
+        elif column == 'vintage':
+            arrays[column] = pa.array(data, mask=extra)
+        elif kind == 'string':
+            arrays[column] = pa.array(data, type=pa.string())
+        else:
+            arrays[column] = pa.array(data, from_pandas=True)
+
+    pq.write_table(pa.table(arrays), path)
+
+
+def json_to_columnar(json_file, output_path=None, format='auto'):
+    """Converts a JSON file with wine data to a typed columnar snapshot.
+
+    Args:
+        json_file (str): Path to the input JSON file.
+        output_path (str): Path to the output snapshot. If None, uses json_file name with
+            a .parquet or .columns extension.
+        format (str): Either `parquet`, `npy` or `auto` (Parquet if `pyarrow` is installed).
+
+    Returns:
+        The path to the written snapshot.
+
+    """
+
+    if format == 'auto':
+        format = 'parquet' if pq is not None else 'npy'
+
+    if format == 'parquet' and pq is None:
+        raise ImportError('Writing Parquet snapshots requires `pyarrow`')
+
+    # If no output path provided, generate one from the JSON filename
+    if output_path is None:
+        output_path = json_file.replace('.json', '.parquet' if format == 'parquet' else '.columns')
+
+    # Streams the unique wines into their typed columns
+    columns = _build_columns(iter_unique_records(iter_json_array(json_file, 'wines')))
+
+    if format == 'parquet':
+        _write_parquet(columns, output_path)
+    else:
+        _write_npy(columns, output_path)
+
+    print(f"Successfully converted {json_file} to {output_path}")
+    print(f"Total rows: {len(columns['id'][0])}")
+
+    return output_path
+
+
+def load_columnar(path, columns=None, as_frame=False):
+    """Loads a columnar snapshot, only reading the requested columns.
+
+    NumPy snapshots are memory-mapped, while Parquet ones are read through a memory map.
+
+    Args:
+        path (str): Path to the snapshot (a .parquet file or a .columns directory).
+        columns (list): Columns to be loaded, every column if None.
+        as_frame (bool): Whether to return a `pandas.DataFrame`.
+
+    Returns:
+        A dictionary mapping every loaded column to its values, or a `pandas.DataFrame` with
+        categorical and nullable integer dtypes. For NumPy snapshots, dictionary columns are
+        `(codes, categories)` tuples, `vintage` is a `(years, null mask)` tuple and strings are
+        lists, while Parquet columns are decoded into plain arrays.
+
+    """
+
+    columns = list(SCHEMA) if columns is None else columns
+
+    if not os.path.isdir(path):
+        if pq is None:
+            raise ImportError('Reading Parquet snapshots requires `pyarrow`')
+
+        table = pq.read_table(path, columns=columns, memory_map=True)
+
+        if as_frame:
+            import pandas as pd
+
+            return table.to_pandas(types_mapper={pa.int16(): pd.Int16Dtype()}.get)
+
+        # Dictionary columns are decoded through their dictionary, so that nulls are kept
+        return {column: (table.column(column).cast(pa.string()) if SCHEMA[column] == 'dictionary' else
+                         table.column(column)).to_numpy(zero_copy_only=False) for column in columns}
+
+    data = {}
+    for column in columns:
+        kind = SCHEMA[column]
+
+        if kind == 'string':
+            offsets = np.load(os.path.join(path, f'{column}.offsets.npy'), mmap_mode='r')
+            raw = np.memmap(os.path.join(path, f'{column}.bytes'), dtype=np.uint8, mode='r') if offsets[-1] else b''
+            data[column] = [bytes(raw[start:end]).decode('utf-8') for start, end in zip(offsets[:-1], offsets[1:])]
+            continue
+
+        values = np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')
+
+        if kind == 'dictionary':
+            with open(os.path.join(path, f'{column}.dict.json'), 'r', encoding='utf-8') as f:
+                data[column] = (values, json.load(f))
+        elif column == 'vintage':
+            data[column] = (values, np.load(os.path.join(path, f'{column}.mask.npy'), mmap_mode='r'))
+        else:
+            data[column] = values
+
+    if not as_frame:
+        return data
+
+    import pandas as pd
+
+    frame = {}
+    for column, values in data.items():
+        kind = SCHEMA[column]
+
+        if kind == 'dictionary':
+            frame[column] = pd.Categorical.from_codes(values[0], categories=values[1])
+        elif column == 'vintage':
+            frame[column] = pd.arrays.IntegerArray(np.asarray(values[0]), np.asarray(values[1]))
+        else:
+            frame[column] = values
+
+    return pd.DataFrame(frame)
@@ -1,7 +1,127 @@
 """Module used to defined constants that are called within the package."""
 
-# Base URL
-BASE_URL = 'https://www.vivino.com/api/'
+import os
+
+# Base URL, which may be overridden (e.g. to target a local stand-in of the API)
+BASE_URL = os.environ.get('VIVINO_BASE_URL', 'https://www.vivino.com/api/')
 
 # Number of records per page
 RECORDS_PER_PAGE = 25
+
+# Number of concurrent workers used to enrich a page with reviews and tastes
+ENRICH_WORKERS = 8
+
+# Maximum number of kept-alive connections per host
+POOL_SIZE = 16
+
+# Connect and read timeouts (in seconds)
+TIMEOUT = (5, 30)
+
+# Maximum number of retries of a single request
+MAX_RETRIES = 5
+
+# Base and maximum delays (in seconds) of the exponential backoff
+BACKOFF_FACTOR = 0.5
+MAX_BACKOFF = 60
+
+# Response statuses that are retried
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Time-to-live (in seconds) of cached responses, by endpoint pattern
+CACHE_TTLS = {
+    'wines/*/tastes': 30 * 24 * 3600,
+    'wines/*/reviews': 7 * 24 * 3600,
+    'explore/explore*': 3600,
+}
+
+# Maximum size (in bytes) of the compressed cached bodies
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Compression level of the cached bodies
+CACHE_COMPRESSION_LEVEL = 6
+
+# Maximum number of matches within a price range before it gets split
+MAX_MATCHES = 2000
+
+# Minimum width of a price range
+MIN_PRICE_WIDTH = 0.02
+
+# Number of cumulative count probes used to estimate the price quantiles of a range
+QUANTILE_PROBES = 8
+
+# Targeted fill ratio of a planned price range, relative to `MAX_MATCHES`
+PLAN_FILL_RATIO = 0.8
+
+# Size (in bytes) past which a new segment of the page log is started
+SEGMENT_MAX_BYTES = 64 * 1024 ** 2
+
+# Number of characters read at once when streaming JSON files
+READ_CHUNK_SIZE = 1024 ** 2
+
+# Exported fields of a wine
+WINE_FIELDS = [
+    'id', 'name', 'vintage', 'country', 'winery', 'grapes',
+    'rating', 'price', 'acidity', 'intensity', 'sweetness', 'tannin',
+    'flavor_rank1', 'flavor_rank2', 'flavor_rank3'
+]
+
+# Number of records used to infer the schema of flattened records
+SCHEMA_SAMPLES = 1000
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# Number of frames kept by tracemalloc and of entries written by the profiling mode
+TRACEMALLOC_FRAMES = 10
+PROFILE_TOP = 50
+
+# Minimum delay (in seconds) between two exports of the metrics file
+METRICS_INTERVAL = 10
+
+# Duration (in seconds) of a work queue lease, renewed at a third of it
+LEASE_SECONDS = 120
+
+# Delay (in seconds) between two polls of a work queue whose leaves are all leased
+QUEUE_POLL = 5
+
+# Timeout (in seconds) waiting for the work queue database lock
+QUEUE_TIMEOUT = 60
+
+# Number of claims of a work queue leaf before a failing one is given up
+QUEUE_MAX_ATTEMPTS = 5
+
+# Number of wines inserted per transaction into the wine store
+STORE_BATCH_SIZE = 5000
+
+# Timeout (in seconds) waiting for the wine store database lock
+STORE_TIMEOUT = 60
+
+# Date format of the snapshot labels (e.g. `25-11-2025`)
+SNAPSHOT_DATE_FORMAT = '%d-%m-%Y'
+
+# Absolute changes below which a wine is not reported as repriced or re-rated
+PRICE_TOLERANCE = 0.005
+RATING_TOLERANCE = 0.005
+
+# Number of explore pages kept in flight while listing the wine URLs
+LIST_PREFETCH = 8
+
+# Size (in bytes) of the buffer of the wine URLs writer
+LIST_WRITE_BUFFER = 1024 ** 2
+
+# Number of listed pages between two checkpoints of the wine URLs
+LIST_CHECKPOINT_PAGES = 20
+
+# Expected number of wines of the bloom filter deduplicating the wine URLs
+BLOOM_CAPACITY = 10 ** 7
+
+# Length of the flavor lists above which their top groups are taken with a heap rather than a sort
+FLAVOR_HEAP_SIZE = 32
+
+# Number of reviews requested per page, and maximum number of pages harvested per wine
+REVIEWS_PER_PAGE = 50
+REVIEWS_MAX_PAGES = 20
+
+# Size (in bytes) past which a new review shard is started, and gzip level of its members
+REVIEW_SHARD_BYTES = 64 * 1024 ** 2
+REVIEW_COMPRESSION = 6
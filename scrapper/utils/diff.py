@@ -0,0 +1,281 @@
+"""Module used to compare wine snapshots and keep a cumulative change log."""
+
+import csv
+import json
+import os
+from array import array
+
+from . import constants as c
+from .file import iter_json_array
+from .keys import pack_key, unpack_key
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+def snapshot_label(path):
+    """Gets the label of a snapshot out of its path.
+
+    Args:
+        path (str): Path to the snapshot (e.g. `data/25-11-2025.csv`).
+
+    Returns:
+        The label (e.g. `25-11-2025`).
+
+    """
+
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def iter_snapshot(path):
+    """Streams the `(key, price, rating)` triplets of a CSV or merged JSON snapshot.
+
+    Args:
+        path (str): Path to the snapshot.
+
+    Returns:
+        A generator over the packed `(id, vintage)` keys with their price and rating.
+
+    """
+
+    if path.endswith('.json'):
+        wines = iter_json_array(path, 'wines')
+        for wine in wines:
+            yield pack_key(wine.get('id'), wine.get('vintage')), _to_float(wine.get('price')), _to_float(wine.get('rating'))
+        return
+
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            yield pack_key(row['id'], row['vintage']), _to_float(row['price']), _to_float(row['rating'])
+
+
+class SnapshotIndex:
+    """Hashed index of a snapshot, mapping packed keys to rows of compact price/rating arrays."""
+
+    def __init__(self, label):
+        """Initializition method.
+
+        Args:
+            label (str): Label of the snapshot.
+
+        """
+
+        self.label = label
+        self.rows = {}
+        self.keys = array('Q')
+        self.prices = array('d')
+        self.ratings = array('d')
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, price, rating):
+        """Adds a wine, unless it is already indexed.
+
+        Args:
+            key (int): Packed `(id, vintage)` key.
+            price (float): Price of the wine.
+            rating (float): Rating of the wine.
+
+        Returns:
+            Whether the wine has been added.
+
+        """
+
+        if key in self.rows:
+            return False
+
+        self.rows[key] = len(self.keys)
+        self.keys.append(key)
+        self.prices.append(price)
+        self.ratings.append(rating)
+
+        return True
+
+
+def _changed(old, new, tolerance):
+    # Missing values (NaN) only count as a change when exactly one side is missing
+    if old != old or new != new:
+        return (old != old) != (new != new)
+
+    return abs(new - old) > tolerance
+
+
+def diff_snapshots(old_index, new_path, price_tolerance=c.PRICE_TOLERANCE, rating_tolerance=c.RATING_TOLERANCE):
+    """Streams the changes between an indexed snapshot and a newer one.
+
+    The newer snapshot is read once and indexed along the way, so that it can be compared
+    against the next one without being read again.
+
+    Args:
+        old_index (SnapshotIndex): Index of the older snapshot.
+        new_path (str): Path to the newer snapshot.
+        price_tolerance (float): Absolute price change below which a wine is not repriced.
+        rating_tolerance (float): Absolute rating change below which a wine is not re-rated.
+
+    Returns:
+        A generator over the change events, which returns the index of the newer snapshot.
+
+    """
+
+    new_index = SnapshotIndex(snapshot_label(new_path))
+    seen = bytearray(len(old_index))
+
+    def _event(kind, key, old_row=None, price=None, rating=None):
+        wine_id, vintage = unpack_key(key)
+        event = {'type': kind, 'from': old_index.label, 'to': new_index.label, 'id': wine_id, 'vintage': vintage}
+
+        old_price = old_index.prices[old_row] if old_row is not None else None
+        old_rating = old_index.ratings[old_row] if old_row is not None else None
+
+        for name, old, new in (('price', old_price, price), ('rating', old_rating, rating)):
+            old = None if old is None or old != old else old
+            new = None if new is None or new != new else new
+            event[f'old_{name}'] = old
+            event[f'new_{name}'] = new
+            event[f'{name}_delta'] = round(new - old, 4) if old is not None and new is not None else None
+
+        if event['price_delta'] is not None and event['old_price']:
+            event['price_delta_pct'] = round(100 * event['price_delta'] / event['old_price'], 2)
+
+        return event
+
+    for key, price, rating in iter_snapshot(new_path):
+        # Skips the duplicates of the newer snapshot
+        if not new_index.add(key, price, rating):
+            continue
+
+        row = old_index.rows.get(key)
+        if row is None:
+            yield _event('new', key, price=price, rating=rating)
+            continue
+
+        seen[row] = 1
+
+        if _changed(old_index.prices[row], price, price_tolerance):
+            yield _event('repriced', key, row, price, rating)
+
+        if _changed(old_index.ratings[row], rating, rating_tolerance):
+            yield _event('rerated', key, row, price, rating)
+
+    # Wines of the older snapshot that have not been seen were removed
+    for row, key in enumerate(old_index.keys):
+        if not seen[row]:
+            yield _event('removed', key, row)
+
+    return new_index
+
+
+def index_snapshot(path):
+    """Indexes a snapshot.
+
+    Args:
+        path (str): Path to the snapshot.
+
+    Returns:
+        The snapshot index.
+
+    """
+
+    index = SnapshotIndex(snapshot_label(path))
+    for key, price, rating in iter_snapshot(path):
+        index.add(key, price, rating)
+
+    return index
+
+
+def logged_pairs(changelog, truncate=False):
+    """Lists the snapshot pairs already recorded into a change log.
+
+    A pair is only recorded once its summary line is written, so the events past the last
+    summary (e.g. of a pair interrupted by a crash) belong to no recorded pair.
+
+    Args:
+        changelog (str): Path to the change log.
+        truncate (bool): Whether the events past the last summary are discarded, so that
+            their pair is diffed again without being duplicated.
+
+    Returns:
+        A set of `(from, to)` labels.
+
+    """
+
+    pairs = set()
+    if not os.path.exists(changelog):
+        return pairs
+
+    committed = 0
+    with open(changelog, 'rb') as f:
+        offset = 0
+        for line in f:
+            offset += len(line)
+            if line.startswith(b'{"type": "summary"') and line.endswith(b'\n'):
+                event = json.loads(line)
+                pairs.add((event['from'], event['to']))
+                committed = offset
+
+    if truncate and committed < os.path.getsize(changelog):
+        with open(changelog, 'r+b') as f:
+            f.truncate(committed)
+
+    return pairs
+
+
+def diff_series(paths, changelog=None, **kwargs):
+    """Compares every consecutive pair of a series of snapshots.
+
+    Every snapshot is read once, at most two indexes being held in memory at a time. Changes
+    are appended to an optional JSON lines change log, each pair ending with a summary line,
+    and pairs already recorded into it are skipped (their snapshots are still indexed). The
+    events of a pair left without a summary are discarded before diffing it again.
+
+    Args:
+        paths (list): Paths to the snapshots, from the oldest to the newest.
+        changelog (str): Path to the cumulative change log.
+        **kwargs: Tolerances forwarded to `diff_snapshots`.
+
+    Returns:
+        A list of per-pair summaries counting every type of change.
+
+    """
+
+    done = logged_pairs(changelog, truncate=True) if changelog else set()
+    summaries = []
+
+    index = index_snapshot(paths[0])
+
+    for path in paths[1:]:
+        summary = {'type': 'summary', 'from': index.label, 'to': snapshot_label(path),
+                   'new': 0, 'removed': 0, 'repriced': 0, 'rerated': 0}
+        skip = (summary['from'], summary['to']) in done
+
+        log = open(changelog, 'a', encoding='utf-8') if changelog and not skip else None
+        try:
+            events = diff_snapshots(index, path, **kwargs)
+            while True:
+                try:
+                    event = next(events)
+                except StopIteration as stop:
+                    index = stop.value
+                    break
+
+                summary[event['type']] += 1
+                if log is not None:
+                    log.write(json.dumps(event, ensure_ascii=False) + '\n')
+
+            # The summary commits the pair, hence is durably written before the next one
+            if log is not None:
+                log.write(json.dumps(summary, ensure_ascii=False) + '\n')
+                log.flush()
+                os.fsync(log.fileno())
+        finally:
+            if log is not None:
+                log.close()
+
+        summaries.append(summary)
+
+    return summaries
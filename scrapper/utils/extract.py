@@ -0,0 +1,248 @@
+"""Module used to extract wine entries out of the explore and tastes payloads.
+
+Wine entries are described by a declarative spec, mapping every field to a path within
+one of the payloads, which the extractor compiles once into a plain function. Paths that
+cannot be resolved do not raise, but fall back to the field default and are counted as
+missing, per field.
+
+"""
+
+import heapq
+import json
+from collections import Counter, namedtuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from . import constants as c
+
+# Errors raised while resolving a path (or transforming its value) out of a malformed payload
+EXTRACT_ERRORS = (KeyError, IndexError, TypeError, AttributeError)
+
+# Field of a wine entry, resolved by `path` within the `payload` (either `match` or `tastes`),
+# where `name` may be a tuple of fields filled by the transform
+Field = namedtuple('Field', ['name', 'payload', 'path', 'transform', 'default'], defaults=[None, None])
+
+
+def loads(data):
+    """Decodes a JSON document, with `orjson` whenever it is installed.
+
+    Args:
+        data (bytes, str): JSON document.
+
+    Returns:
+        The decoded object.
+
+    """
+
+    if orjson is not None:
+        return orjson.loads(data)
+
+    return json.loads(data)
+
+
+def join_names(items):
+    """Joins the names of a list of objects (e.g. grapes) with semicolons.
+
+    Args:
+        items (list): Objects holding a `name`.
+
+    Returns:
+        The joined names, skipping the empty ones.
+
+    """
+
+    return ';'.join([item['name'] for item in items if item.get('name')])
+
+
+def _mentions(flavor):
+    try:
+        return flavor['stats']['mentions_count'] or 0
+    except EXTRACT_ERRORS:
+        return 0
+
+
+def top_flavor_groups(flavors, n=3):
+    """Gets the most mentioned flavor groups.
+
+    Args:
+        flavors (list): Flavors of the tastes payload.
+        n (int): Number of groups.
+
+    Returns:
+        A tuple of `n` groups, by decreasing number of mentions (ties keeping their payload
+        order), padded with None.
+
+    """
+
+    # A heap only pays off over long lists, short ones being sorted as a whole (which
+    # yields the same, stable order)
+    if len(flavors) > c.FLAVOR_HEAP_SIZE:
+        top = heapq.nlargest(n, flavors, key=_mentions)
+    else:
+        top = sorted(flavors, key=_mentions, reverse=True)[:n]
+
+    return tuple([flavor.get('group') for flavor in top]) + (None,) * (n - len(top))
+
+
+# Fields of a wine entry, in their output order
+WINE_SPEC = (
+    Field('id', 'match', ('vintage', 'wine', 'id')),
+    Field('name', 'match', ('vintage', 'name')),
+    Field('vintage', 'match', ('vintage', 'year')),
+    Field('country', 'match', ('vintage', 'wine', 'region', 'country', 'name')),
+    Field('winery', 'match', ('vintage', 'wine', 'winery', 'name')),
+    Field('grapes', 'match', ('vintage', 'wine', 'style', 'grapes'), join_names, ''),
+    Field('rating', 'match', ('vintage', 'statistics', 'ratings_average')),
+    Field('reviews_count', 'match', ('vintage', 'statistics', 'ratings_count')),
+    Field('price', 'match', ('price', 'amount')),
+    Field('acidity', 'tastes', ('tastes', 'structure', 'acidity')),
+    Field('intensity', 'tastes', ('tastes', 'structure', 'intensity')),
+    Field('sweetness', 'tastes', ('tastes', 'structure', 'sweetness')),
+    Field('tannin', 'tastes', ('tastes', 'structure', 'tannin')),
+    Field(('flavor_rank1', 'flavor_rank2', 'flavor_rank3'), 'tastes', ('tastes', 'flavor'), top_flavor_groups,
+          (None, None, None))
+)
+
+
+def match_id(match):
+    """Gets the wine identifier of an explore match.
+
+    Args:
+        match (dict): Explore match.
+
+    Returns:
+        The identifier, or None if the match does not hold any.
+
+    """
+
+    try:
+        return match['vintage']['wine']['id']
+    except EXTRACT_ERRORS:
+        return None
+
+
+def _compile(spec):
+    """Compiles a spec into the source of a straight-line extraction function.
+
+    Path prefixes shared by several fields are resolved once into local nodes, and every
+    field is then resolved from its deepest node within its own `try` block, so that the
+    generated function walks the payloads as a hand-written parser would.
+
+    Args:
+        spec (tuple): Fields of the entries, whose first one is their identifier.
+
+    Returns:
+        A tuple holding the source of the `extract(match, tastes, missing)` function, its
+        namespace (transforms and defaults) and the names of the output fields.
+
+    """
+
+    fields = [name for field in spec for name in (field.name if isinstance(field.name, tuple) else (field.name,))]
+    positions = {name: i for i, name in enumerate(fields)}
+    namespace = {'EXTRACT_ERRORS': EXTRACT_ERRORS}
+
+    shared = Counter((field.payload,) + tuple(field.path[:i]) for field in spec for i in range(1, len(field.path)))
+    nodes = {}
+
+    def reference(payload, path):
+        for i in range(len(path), 0, -1):
+            if (payload,) + tuple(path[:i]) in nodes:
+                return nodes[(payload,) + tuple(path[:i])] + ''.join(f'[{key!r}]' for key in path[i:])
+        return payload + ''.join(f'[{key!r}]' for key in path)
+
+    lines = ['def extract(match, tastes, missing):']
+    outputs = []
+
+    for k, field in enumerate(spec):
+        if field.payload not in ('match', 'tastes'):
+            raise ValueError(f'Unknown payload `{field.payload}` of field `{field.name}`')
+
+        # Resolves the prefixes shared with the next fields, at their first use
+        for i in range(1, len(field.path)):
+            prefix = (field.payload,) + tuple(field.path[:i])
+            if shared[prefix] > 1 and prefix not in nodes:
+                node = f'node{len(nodes)}'
+                lines += ['    try:', f'        {node} = {reference(field.payload, field.path[:i])}',
+                          '    except EXTRACT_ERRORS:', f'        {node} = None']
+                nodes[prefix] = node
+
+        namespace[f'transform{k}'], namespace[f'default{k}'] = field.transform, field.default
+        lines += ['    try:', f'        value = {reference(field.payload, field.path)}']
+        if field.transform is not None:
+            lines += ['        if value is not None:', f'            value = transform{k}(value)']
+        lines += ['    except EXTRACT_ERRORS:', '        value = None']
+
+        if isinstance(field.name, tuple):
+            values = [f'value{k}_{j}' for j in range(len(field.name))]
+            lines += ['    if value is None:', f'        value = default{k}', f'    {", ".join(values)} = value']
+            for name, value in zip(field.name, values):
+                lines += [f'    if {value} is None:', f'        missing[{positions[name]}] += 1']
+            outputs += zip(field.name, values)
+        else:
+            # Entries without an identifier (their first field) are dropped right away
+            lines += ['    if value is None:', f'        missing[{positions[field.name]}] += 1',
+                      '        return None' if k == 0 else f'        value = default{k}', f'    value{k} = value']
+            outputs.append((field.name, f'value{k}'))
+
+    lines.append('    return {' + ', '.join(f'{name!r}: {value}' for name, value in outputs) + '}')
+
+    return '\n'.join(lines), namespace, fields
+
+
+class Extractor:
+    """Extracts wine entries out of the explore and tastes payloads, following a spec.
+
+    The spec is compiled once into a straight-line function (as `namedtuple` does for its
+    methods), so that extraction does not walk the spec for every match.
+
+    """
+
+    def __init__(self, spec=WINE_SPEC):
+        """Initializition method.
+
+        Args:
+            spec (tuple): Fields of the entries, whose first one is their identifier.
+
+        """
+
+        self.spec = spec
+        self.source, namespace, self.fields = _compile(spec)
+
+        exec(self.source, namespace)
+        self._extract = namespace['extract']
+
+        # Number of missing values per field position, since the last `take_missing`
+        self._missing = [0] * len(self.fields)
+
+    def __call__(self, match, tastes=None):
+        """Extracts a wine entry.
+
+        Paths that cannot be resolved and null values fall back to the field default, and
+        are counted as missing.
+
+        Args:
+            match (dict): Explore match.
+            tastes (dict): Tastes payload, if any.
+
+        Returns:
+            The entry, or None if the match does not hold a wine identifier.
+
+        """
+
+        return self._extract(match, tastes if tastes is not None else {}, self._missing)
+
+    def take_missing(self):
+        """Gets and resets the missing counts.
+
+        Returns:
+            A counter of the missing values per field.
+
+        """
+
+        missing = Counter({name: count for name, count in zip(self.fields, self._missing) if count})
+        self._missing = [0] * len(self.fields)
+
+        return missing
@@ -2,125 +2,321 @@
 
 import json
 import csv
-from itertools import chain, starmap
+import glob
+import os
+import re
+from itertools import chain, islice
 
+from . import constants as c
+from .keys import KeyIndex
+from .segment import SegmentLog
+from .store import WineStore
 
-def merge_json_files(file_name, n_files=1):
-    """Merges a set of indexed JSON files (1, 2, ..., n) into a new one.
+
+def discover_json_files(file_name):
+    """Discovers the indexed JSON files (1, 2, ..., n) of a given file.
 
     Args:
-        file_name (str): Name of the file to be merged without their indexes and extension.
-        n_files (int): Amount of files to be merged.
+        file_name (str): Name of the file without their indexes.
 
     Returns:
-        The merged file.
+        The paths of the indexed files, sorted by index.
 
     """
 
-    # Creates the data object and its `wines` array
-    data = {}
-    data['wines'] = []
+    dirname = os.path.dirname(file_name) or '.'
+    basename = os.path.basename(file_name)
+
+    # Keeps the files whose prefix is an index
+    indexed_files = []
+    for path in glob.glob(os.path.join(dirname, f'*_{basename}')):
+        prefix = os.path.basename(path)[:-len(basename) - 1]
+        if prefix.isdigit():
+            indexed_files.append((int(prefix), path))
+
+    return [path for _, path in sorted(indexed_files)]
+
+
+def iter_json_records(file_name, n_files=None):
+    """Streams the wines of a set of indexed JSON files and of their segment log.
+
+    Args:
+        file_name (str): Name of the file to be merged without their indexes.
+        n_files (int): Amount of indexed files to be read, every discovered one if None.
 
-    # Iterates through every possible file
-    for i in range(n_files):
+    Returns:
+        A generator over the wines, one page being loaded at a time.
+
+    """
+
+    # Iterates through every discovered file
+    for path in discover_json_files(file_name)[:n_files]:
         try:
-            # Opens the input file
-            with open(f'{i+1}_{file_name}', 'r', encoding='utf-8') as f:
-                # Loads the temporary data
-                tmp_data = json.load(f)
-
-                # Merges the data
-                data['wines'] += tmp_data.get('wines', [])
-                
-                print(f"Merged {i+1}_{file_name}: {len(tmp_data.get('wines', []))} wines")
-
-            # Closes the file
-            f.close()
-        except FileNotFoundError:
-            print(f"Warning: File {i+1}_{file_name} not found, skipping...")
+            with open(path, 'r', encoding='utf-8') as f:
+                wines = json.load(f).get('wines', [])
+
+            print(f"Merged {path}: {len(wines)} wines")
+
+            yield from wines
+
         except Exception as e:
-            print(f"Error processing {i+1}_{file_name}: {e}")
+            print(f"Error processing {path}: {e}")
 
-    print(f"\nTotal wines merged: {len(data['wines'])}")
-    
-    # Remove duplicates based on id and vintage combination
-    unique_wines = {}
-    for wine in data['wines']:
-        # Create a unique key combining id and vintage
-        key = (wine.get('id'), wine.get('vintage'))
-        if key not in unique_wines:
-            unique_wines[key] = wine
-    
-    data['wines'] = list(unique_wines.values())
-    print(f"Unique wines after deduplication: {len(data['wines'])}")
+    # Sequentially streams the segment logs, if any (one per worker when scraped from a queue)
+    for segments_dir in sorted(glob.glob(f'{glob.escape(file_name)}.segments*')):
+        if not os.path.isdir(segments_dir):
+            continue
 
-    # Opens the output file
-    with open(f'{file_name}', 'w', encoding='utf-8') as f:
-        # Dumps the merged data (FIXED: was tmp_data, now data)
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    
+        # Opened as read-only, as a scrape may still be appending to it
+        log = SegmentLog(segments_dir, read_only=True)
+
+        yield from log.iter_wines()
+
+        print(f"Merged {log.manifest['pages']} pages from {segments_dir}")
+
+
+def iter_unique_records(records, index=None):
+    """Filters out the duplicated wines of a stream, based on their id and vintage combination.
+
+    Args:
+        records (iterable): Stream of wines.
+        index (KeyIndex): Index of the already seen wines, a new one if None.
+
+    Returns:
+        A generator over the unique wines.
+
+    """
+
+    index = KeyIndex() if index is None else index
+
+    for record in records:
+        if index.add(record):
+            yield record
+
+
+def iter_json_array(json_file, key=None, chunk_size=c.READ_CHUNK_SIZE):
+    """Incrementally decodes the items of a JSON array stored on disk.
+
+    Args:
+        json_file (str): Path to the JSON file.
+        key (str): Key of the top-level object holding the array, None if the array is top-level.
+        chunk_size (int): Number of characters read at once.
+
+    Returns:
+        A generator over the decoded items, only one chunk being held in memory at a time.
+
+    """
+
+    decoder = json.JSONDecoder()
+    opening = re.compile(r'\[' if key is None else r'"%s"\s*:\s*\[' % re.escape(key))
+
+    with open(json_file, 'r', encoding='utf-8') as f:
+        buffer, pos = '', 0
+
+        def _fill():
+            # Appends a further chunk to the unconsumed part of the buffer
+            nonlocal buffer, pos
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return False
+
+            buffer, pos = buffer[pos:] + chunk, 0
+
+            return True
+
+        # Locates the opening bracket of the array
+        while not (match := opening.search(buffer)):
+            if not _fill():
+                return
+
+        pos = match.end()
+
+        while True:
+            # Skips the separators between items
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+
+            if pos == len(buffer):
+                if not _fill():
+                    raise ValueError(f'Unterminated JSON array in {json_file}')
+                continue
+
+            if buffer[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Reads a further chunk, as the item may have been cut
+                if not _fill():
+                    raise
+                continue
+
+            # Only accepts an item once its delimiter has been read, as numbers may have been cut
+            if (end == len(buffer) or buffer[end] not in ' \t\r\n,]') and _fill():
+                continue
+
+            yield item
+            pos = end
+
+
+def merge_json_files(file_name, n_files=None):
+    """Merges a set of indexed JSON files (1, 2, ..., n) into a new one.
+
+    Files are discovered and streamed one at a time, duplicates are dropped through a
+    packed key index and the output is written incrementally, one wine per line. If a
+    segment log (`file_name`.segments, or one per worker) exists, its pages are streamed as well.
+
+    Args:
+        file_name (str): Name of the file to be merged without their indexes and extension.
+        n_files (int): Amount of files to be merged, every discovered one if None.
+
+    Returns:
+        The number of unique wines within the merged file.
+
+    """
+
+    total = 0
+    index = KeyIndex()
+
+    def _count(records):
+        nonlocal total
+        for record in records:
+            total += 1
+            yield record
+
+    # Writes the merged data incrementally, into a temporary file as inputs may be overwritten
+    tmp_file = f'{file_name}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write('{"wines": [')
+
+        for i, wine in enumerate(iter_unique_records(_count(iter_json_records(file_name, n_files)), index)):
+            f.write(',\n' if i else '\n')
+            f.write(json.dumps(wine, ensure_ascii=False))
+
+        f.write('\n]}\n')
+
+    os.replace(tmp_file, file_name)
+
+    print(f"\nTotal wines merged: {total}")
+    print(f"Unique wines after deduplication: {len(index)}")
     print(f"Successfully created {file_name}")
-    
-    return data
 
+    return len(index)
 
-def flatten_json_file(json_file):
-    """Flattens a multi-level nested JSON file.
+
+def flatten_record(record, separator='_'):
+    """Flattens a multi-level nested record in a single pass.
+
+    Nested keys are joined with their parents' (`parent_child`), list items with their
+    index (`parent_0`), and empty dictionaries or lists are dropped.
 
     Args:
-        json_file (str): Name of the file to be loaded and flattened.
+        record (dict): Record to be flattened.
+        separator (str): String joining the nested keys.
 
     Returns:
-        List containing every flattened record from JSON file.
+        The flattened record, whose keys keep their original order.
 
     """
 
-    def _depack(key, value):
+    flat = {}
+
+    # Explicit stack of (key, value) pairs, reversed so that pops keep the original order
+    stack = list(reversed(record.items()))
+
+    while stack:
+        key, value = stack.pop()
+
         # Checks whether value is a dictionary
         if isinstance(value, dict):
-            # Iterates for every key and value
-            for k, v in value.items():
-                # Creates a new key string
-                new_k = f'{key}_{k}'
-
-                yield new_k, v
+            stack.extend((f'{key}{separator}{k}', v) for k, v in reversed(value.items()))
 
         # Checks whether value is a list
         elif isinstance(value, list):
-            # Iterates through every value
-            for i, v in enumerate(value):
-                # Creates a new key string
-                new_k = f'{key}_{i}'
-
-                yield new_k, v
+            stack.extend((f'{key}{separator}{i}', v) for i, v in reversed(list(enumerate(value))))
 
         # If the key is not nested
         else:
-            yield key, value
+            flat[key] = value
 
-    # Opens the JSON file
-    with open(json_file, 'r') as f:
-        # Loads the JSON file
-        json_data = json.load(f)
+    return flat
 
-    # Instantiates a list that will hold every unpacked data
-    json_data_list = []
 
-    # Iterates through every sample in the data
-    for json_datum in json_data:
-        # Performs an all-time true loop
-        while True:
-            # Unpacks the file
-            json_datum = dict(chain.from_iterable(starmap(_depack, json_datum.items())))
+def infer_schema(records):
+    """Infers the columns of a set of flattened records.
 
-            # Creates a loop-break condition
-            if not any(isinstance(value, (dict, list)) for value in json_datum.values()):
-                break
+    Args:
+        records (iterable): Flattened records.
 
-        # Appends to the list
-        json_data_list.append(json_datum)
+    Returns:
+        The list of columns, in their first-seen order.
+
+    """
+
+    # Uses a dictionary as an insertion-ordered set
+    columns = {}
+    for record in records:
+        columns.update(dict.fromkeys(record))
+
+    return list(columns)
 
-    return json_data_list
+
+def iter_flat_records(json_file, key=None, schema=None, n_samples=c.SCHEMA_SAMPLES):
+    """Streams the flattened records of a JSON or JSON lines file.
+
+    Args:
+        json_file (str): Name of the file to be streamed, either holding a JSON array or
+            one record per line (.jsonl).
+        key (str): Key of the top-level object holding the records, None if the array is top-level.
+        schema (list, bool): Columns every record is fixed to (missing ones are filled with
+            None and extra ones dropped), True to infer them from the first `n_samples`
+            records, or None to keep the records as they are.
+        n_samples (int): Number of records used to infer the schema.
+
+    Returns:
+        A generator over the flattened records.
+
+    """
+
+    # Streams the raw records from disk
+    if json_file.endswith('.jsonl'):
+        def _records():
+            with open(json_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+        records = map(flatten_record, _records())
+    else:
+        records = map(flatten_record, iter_json_array(json_file, key))
+
+    if schema is True:
+        # Buffers the samples, which are then yielded as any other record
+        samples = list(islice(records, n_samples))
+        schema = infer_schema(samples)
+        records = chain(samples, records)
+
+    if not schema:
+        yield from records
+        return
+
+    for record in records:
+        yield {column: record.get(column) for column in schema}
+
+
+def flatten_json_file(json_file):
+    """Flattens a multi-level nested JSON file.
+
+    Args:
+        json_file (str): Name of the file to be loaded and flattened.
+
+    Returns:
+        List containing every flattened record from JSON file.
+
+    """
+
+    return list(iter_flat_records(json_file))
 
 
 def json_to_csv(json_file, csv_file=None):
@@ -163,11 +359,7 @@ def json_to_csv(json_file, csv_file=None):
     print(f"Unique wines after deduplication: {len(wines)}")
 
     # Define the CSV headers based on the wine data structure
-    headers = [
-        'id', 'name', 'vintage', 'country', 'winery', 'grapes',
-        'rating', 'price', 'acidity', 'intensity', 'sweetness', 'tannin',
-        'flavor_rank1', 'flavor_rank2', 'flavor_rank3'
-    ]
+    headers = c.WINE_FIELDS
 
     # Write to CSV file
     with open(csv_file, 'w', newline='', encoding='utf-8') as f:
@@ -186,6 +378,39 @@ def json_to_csv(json_file, csv_file=None):
     print(f"Total rows in CSV: {len(wines)} (excluding header)")
 
 
-# Example usage - uncomment to run
-merge_json_files("25-11-2025.json", 228)
-json_to_csv("25-11-2025.json", "25-11-2025.csv")
+def json_to_sqlite(json_file, db_file, snapshot=None):
+    """Streams a JSON file with wine data into an indexed SQLite wine store.
+
+    Args:
+        json_file (str): Path to the input JSON file.
+        db_file (str): Path to the wine store database.
+        snapshot (str): Label of the snapshot. If None, uses json_file name without extension.
+
+    Returns:
+        The number of stored wines.
+
+    """
+
+    # If no snapshot label provided, generate one from the JSON filename
+    if snapshot is None:
+        snapshot = os.path.splitext(os.path.basename(json_file))[0]
+
+    store = WineStore(db_file)
+    try:
+        total = store.add_wines(snapshot, iter_unique_records(iter_json_array(json_file, 'wines')))
+    finally:
+        store.close()
+
+    print(f"Successfully stored {total} wines from {json_file} into {db_file} (snapshot {snapshot})")
+
+    return total
+
+
+if __name__ == '__main__':
+    # Example usage, ran as `python -m utils.file`
+    merge_json_files("25-11-2025.json")
+    json_to_csv("25-11-2025.json", "25-11-2025.csv")
+    json_to_sqlite("25-11-2025.json", "wines.sqlite")
+
+    from .columnar import json_to_columnar
+    json_to_columnar("25-11-2025.json")
@@ -0,0 +1,86 @@
+"""Module used to pack wine keys into compact integers."""
+
+# Number of bits reserved to the vintage within a packed key
+VINTAGE_BITS = 16
+
+# Codes of the vintages that are not a year
+NO_VINTAGE = 0
+NON_VINTAGE = (1 << VINTAGE_BITS) - 1
+
+
+def pack_key(wine_id, vintage):
+    """Packs an `(id, vintage)` pair into a single integer.
+
+    Args:
+        wine_id (int): Identifier of the wine.
+        vintage (int, str): Vintage year, 'N.V.' or None.
+
+    Returns:
+        The packed key.
+
+    """
+
+    if vintage is None or vintage == '':
+        code = NO_VINTAGE
+    else:
+        try:
+            code = int(vintage)
+        except (TypeError, ValueError):
+            code = NON_VINTAGE
+
+        if not 0 < code < NON_VINTAGE:
+            code = NON_VINTAGE
+
+    return (int(wine_id or 0) << VINTAGE_BITS) | code
+
+
+def unpack_key(key):
+    """Unpacks an integer key into its `(id, vintage)` pair.
+
+    Args:
+        key (int): Packed key.
+
+    Returns:
+        A tuple holding the wine identifier and its vintage (a year, 'N.V.' or None).
+
+    """
+
+    code = key & NON_VINTAGE
+    vintage = None if code == NO_VINTAGE else 'N.V.' if code == NON_VINTAGE else code
+
+    return key >> VINTAGE_BITS, vintage
+
+
+class KeyIndex:
+    """Keeps track of the already seen `(id, vintage)` pairs through packed integer keys."""
+
+    def __init__(self):
+        """Initializition method."""
+
+        self.keys = set()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, wine):
+        return pack_key(wine.get('id'), wine.get('vintage')) in self.keys
+
+    def add(self, wine):
+        """Adds a wine to the index.
+
+        Args:
+            wine (dict): Wine record holding its `id` and `vintage`.
+
+        Returns:
+            Whether the wine had not been seen before.
+
+        """
+
+        key = pack_key(wine.get('id'), wine.get('vintage'))
+
+        if key in self.keys:
+            return False
+
+        self.keys.add(key)
+
+        return True
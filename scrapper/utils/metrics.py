@@ -0,0 +1,375 @@
+"""Module used to instrument the scraping pipeline and export its metrics."""
+
+import json
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import constants as c
+
+# Name of the Prometheus label of the counters not labelled by endpoint
+COUNTER_LABELS = {'missing_fields_total': 'field'}
+
+
+def normalize_endpoint(endpoint, params=None):
+    """Normalizes an endpoint into a low-cardinality label.
+
+    Args:
+        endpoint (str): Endpoint that has been consumed.
+        params (dict): Query parameters of the request.
+
+    Returns:
+        The endpoint label, e.g. `wines/{id}/tastes` or `explore/explore:count`.
+
+    """
+
+    label = re.sub(r'/\d+(?=/|$)', '/{id}', endpoint.rstrip('?'))
+
+    # Explore requests without a page only probe the number of matches
+    if label == 'explore/explore' and 'page' not in (params or {}):
+        label += ':count'
+
+    return label
+
+
+class Histogram:
+    """Cumulative histogram over fixed buckets."""
+
+    def __init__(self, buckets=c.LATENCY_BUCKETS):
+        """Initializition method.
+
+        Args:
+            buckets (tuple): Sorted upper bounds of the buckets.
+
+        """
+
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """Records an observation.
+
+        Args:
+            value (float): Observed value.
+
+        """
+
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimates a quantile as the upper bound of the bucket holding it.
+
+        Args:
+            q (float): Quantile within [0, 1].
+
+        Returns:
+            The estimated quantile, or None if nothing has been observed.
+
+        """
+
+        if not self.count:
+            return None
+
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([str(bound) for bound in self.buckets] + ['+Inf'], self.counts))
+        }
+
+
+class Metrics:
+    """Thread-safe registry of counters, latency histograms and throughput of a run."""
+
+    def __init__(self, total_pages=None):
+        """Initializition method.
+
+        Args:
+            total_pages (int): Number of pages to be scraped, used to estimate the ETA.
+
+        """
+
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.total_pages = total_pages
+
+        # Counters and histograms, keyed by name and label
+        self.counters = Counter()
+        self.histograms = {}
+
+        self.server = None
+
+    def inc(self, name, label='', value=1):
+        """Increments a counter.
+
+        Args:
+            name (str): Name of the counter.
+            label (str): Label of the counter (e.g. an endpoint).
+            value (int): Increment.
+
+        """
+
+        with self.lock:
+            self.counters[(name, label)] += value
+
+    def observe(self, name, label, value):
+        """Records an observation into a histogram.
+
+        Args:
+            name (str): Name of the histogram.
+            label (str): Label of the histogram (e.g. an endpoint or phase).
+            value (float): Observed value.
+
+        """
+
+        with self.lock:
+            if (name, label) not in self.histograms:
+                self.histograms[(name, label)] = Histogram()
+            self.histograms[(name, label)].observe(value)
+
+    @contextmanager
+    def timer(self, phase):
+        """Times a phase of the pipeline.
+
+        Args:
+            phase (str): Name of the phase (e.g. `explore_page`, `enrich`, `write`).
+
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('phase_seconds', phase, time.perf_counter() - start)
+
+    def record_request(self, endpoint, status, seconds, n_bytes=0):
+        """Records a single HTTP attempt.
+
+        Args:
+            endpoint (str): Endpoint label.
+            status (int, str): Response status, or `error` if the request raised.
+            seconds (float): Latency of the attempt.
+            n_bytes (int): Size of the response body.
+
+        """
+
+        self.inc('requests_total', endpoint)
+        self.inc('responses_total', f'{endpoint}|{status}')
+        self.inc('bytes_total', endpoint, n_bytes)
+        self.observe('request_seconds', endpoint, seconds)
+
+        if status == 429:
+            self.inc('throttled_total', endpoint)
+        elif status == 'error' or (isinstance(status, int) and status >= 400):
+            self.inc('errors_total', endpoint)
+
+    def progress(self, pages=0, wines=0):
+        """Records scraped pages and wines.
+
+        Args:
+            pages (int): Number of newly scraped pages.
+            wines (int): Number of newly scraped wines.
+
+        """
+
+        self.inc('pages_total', value=pages)
+        self.inc('wines_total', value=wines)
+
+    def throughput(self):
+        """Computes the current throughput.
+
+        Returns:
+            A dictionary holding the elapsed time, pages/sec, wines/sec and ETA (in seconds).
+
+        """
+
+        elapsed = time.time() - self.started
+        with self.lock:
+            pages = self.counters[('pages_total', '')]
+            wines = self.counters[('wines_total', '')]
+        pages_per_sec = pages / elapsed if elapsed else 0.0
+
+        eta = None
+        if self.total_pages is not None and pages_per_sec:
+            eta = max(self.total_pages - pages, 0) / pages_per_sec
+
+        return {
+            'elapsed_seconds': elapsed,
+            'pages': pages,
+            'wines': wines,
+            'total_pages': self.total_pages,
+            'pages_per_sec': pages_per_sec,
+            'wines_per_sec': wines / elapsed if elapsed else 0.0,
+            'eta_seconds': eta
+        }
+
+    def snapshot(self):
+        """Builds a machine-readable snapshot of every metric.
+
+        Returns:
+            A JSON-serializable dictionary.
+
+        """
+
+        with self.lock:
+            counters = {}
+            for (name, label), value in sorted(self.counters.items()):
+                counters.setdefault(name, {})[label or 'total'] = value
+
+            histograms = {}
+            for (name, label), histogram in sorted(self.histograms.items()):
+                histograms.setdefault(name, {})[label] = histogram.to_dict()
+
+        requests = sum(counters.get('requests_total', {}).values())
+        throttled = sum(counters.get('throttled_total', {}).values())
+
+        return {
+            'throughput': self.throughput(),
+            'rate_429': throttled / requests if requests else 0.0,
+            'counters': counters,
+            'histograms': histograms
+        }
+
+    def to_prometheus(self):
+        """Renders every metric in the Prometheus text exposition format.
+
+        Returns:
+            The rendered metrics.
+
+        """
+
+        lines = []
+
+        with self.lock:
+            for (name, label), value in sorted(self.counters.items()):
+                labels = ''
+                if '|' in label:
+                    endpoint, status = label.split('|')
+                    labels = f'{{endpoint="{endpoint}",status="{status}"}}'
+                elif label:
+                    labels = f'{{{COUNTER_LABELS.get(name, "endpoint")}="{label}"}}'
+                lines.append(f'vivino_{name}{labels} {value}')
+
+            for (name, label), histogram in sorted(self.histograms.items()):
+                key = 'phase' if name == 'phase_seconds' else 'endpoint'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                    cumulative += count
+                    lines.append(f'vivino_{name}_bucket{{{key}="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'vivino_{name}_sum{{{key}="{label}"}} {histogram.sum}')
+                lines.append(f'vivino_{name}_count{{{key}="{label}"}} {histogram.count}')
+
+        for name, value in self.throughput().items():
+            if value is not None:
+                lines.append(f'vivino_{name} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Atomically writes the metrics, in the Prometheus format if `path` ends with .prom.
+
+        Args:
+            path (str): Output file.
+
+        """
+
+        tmp_file = f'{path}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            if path.endswith('.prom'):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+
+        os.replace(tmp_file, path)
+
+    def serve(self, port, host='127.0.0.1'):
+        """Serves the metrics at `/metrics` in a background thread.
+
+        Args:
+            port (int): Port to bind.
+            host (str): Host to bind, only the local interface by default.
+
+        """
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                payload = metrics.to_prometheus().encode('utf-8')
+
+                self.send_response(200 if self.path.startswith('/metrics') else 404)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        """Stops serving the metrics, if needed."""
+
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+@contextmanager
+def profiling(prefix):
+    """Captures a cProfile and a tracemalloc snapshot of the enclosed code.
+
+    Args:
+        prefix (str): Prefix of the output files (`prefix`.prof and `prefix`.tracemalloc.txt).
+
+    """
+
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    profiler = cProfile.Profile()
+    tracemalloc.start(c.TRACEMALLOC_FRAMES)
+    profiler.enable()
+
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        profiler.dump_stats(f'{prefix}.prof')
+        with open(f'{prefix}.prof.txt', 'w', encoding='utf-8') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(c.PROFILE_TOP)
+
+        with open(f'{prefix}.tracemalloc.txt', 'w', encoding='utf-8') as f:
+            f.write(f'Peak traced memory: {peak / 1024 ** 2:.1f} MiB\n\n')
+            for stat in snapshot.statistics('lineno')[:c.PROFILE_TOP]:
+                f.write(f'{stat}\n')
+
+        print(f"Saved profiles to {prefix}.prof, {prefix}.prof.txt and {prefix}.tracemalloc.txt")
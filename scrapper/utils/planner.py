@@ -0,0 +1,230 @@
+"""Module used to plan the price ranges that are walked by the scraper."""
+
+import json
+import math
+import os
+
+from . import constants as c
+
+
+class PricePlanner:
+    """Partitions a price range into leaves small enough to be fully paginated.
+
+    Ranges holding too many matches are split at estimated price quantiles, which are
+    interpolated from a few cumulative count probes taken on a logarithmic grid. Every
+    probed count is memoized and the resulting plan is persisted, so that resumes and
+    later runs do not need to probe the API again.
+
+    """
+
+    def __init__(self, requester, payload, plan_file, max_matches=c.MAX_MATCHES,
+                 min_width=c.MIN_PRICE_WIDTH, n_probes=c.QUANTILE_PROBES):
+        """Initializition method.
+
+        Args:
+            requester (Requester): Wrapper used to perform the count probes.
+            payload (dict): Base payload (filters) of the explore requests.
+            plan_file (str): Path to the persisted plan.
+            max_matches (int): Maximum number of matches held by a leaf.
+            min_width (float): Minimum width of a price range.
+            n_probes (int): Number of cumulative probes used to estimate the quantiles.
+
+        """
+
+        self.requester = requester
+        self.payload = payload
+        self.plan_file = plan_file
+        self.max_matches = max_matches
+        self.min_width = min_width
+        self.n_probes = n_probes
+
+        # Memoized counts, keyed by their `min:max` price range
+        self.counts = {}
+
+        # Planned leaves, sorted by price
+        self.leaves = []
+
+    @staticmethod
+    def _key(min_price, max_price):
+        return f'{min_price:.2f}:{max_price:.2f}'
+
+    def count(self, min_price, max_price):
+        """Gets the number of matches within a price range.
+
+        Args:
+            min_price (float): Lower bound of the range.
+            max_price (float): Upper bound of the range.
+
+        Returns:
+            The number of matches, which is only requested once per range.
+
+        """
+
+        key = self._key(min_price, max_price)
+
+        if key not in self.counts:
+            payload = self.payload.copy()
+            payload['price_range_min'] = min_price
+            payload['price_range_max'] = max_price
+
+            res = self.requester.get('explore/explore?', params=payload)
+            if res is None or res.status_code != 200:
+                raise RuntimeError(f'Error fetching count for range {min_price}-{max_price}')
+
+            self.counts[key] = res.json()['explore_vintage']['records_matched']
+            print(f"Found {self.counts[key]} matches for price range {min_price}-{max_price}")
+
+        return self.counts[key]
+
+    def _quantile_cuts(self, min_price, max_price, n_matches):
+        """Estimates the prices splitting a range into evenly filled parts.
+
+        Args:
+            min_price (float): Lower bound of the range.
+            max_price (float): Upper bound of the range.
+            n_matches (int): Number of matches within the range.
+
+        Returns:
+            A sorted list of inner cut prices.
+
+        """
+
+        # Number of parts needed so that each of them is comfortably below the limit
+        n_parts = max(2, math.ceil(n_matches / (self.max_matches * c.PLAN_FILL_RATIO)))
+
+        # Probes the cumulative counts on a logarithmic grid, as prices are heavily skewed
+        low, high = math.log1p(min_price), math.log1p(max_price)
+        grid = [low + (high - low) * j / self.n_probes for j in range(self.n_probes + 1)]
+        cdf = [0]
+        for point in grid[1:-1]:
+            cdf.append(max(cdf[-1], self.count(min_price, round(math.expm1(point), 2))))
+        cdf.append(max(cdf[-1], n_matches))
+
+        # Interpolates every quantile within its probed segment
+        cuts = []
+        for i in range(1, n_parts):
+            target = cdf[-1] * i / n_parts
+            j = next(j for j in range(1, len(cdf)) if cdf[j] >= target)
+            span = cdf[j] - cdf[j - 1]
+            ratio = (target - cdf[j - 1]) / span if span else 0.5
+            cut = round(math.expm1(grid[j - 1] + (grid[j] - grid[j - 1]) * ratio), 2)
+
+            if min_price < cut < max_price and (not cuts or cut > cuts[-1]):
+                cuts.append(cut)
+
+        # Falls back to the arithmetic midpoint if every estimated cut collapsed
+        return cuts or [round((min_price + max_price) / 2, 2)]
+
+    def _plan(self, min_price, max_price):
+        """Recursively appends the leaves of a price range.
+
+        Args:
+            min_price (float): Lower bound of the range.
+            max_price (float): Upper bound of the range.
+
+        """
+
+        n_matches = self.count(min_price, max_price)
+
+        if n_matches < self.max_matches or (max_price - min_price) <= self.min_width:
+            self.leaves.append({
+                'min': min_price,
+                'max': max_price,
+                'matches': n_matches,
+                'pages': max(1, int(n_matches / c.RECORDS_PER_PAGE)) + 1,
+                'done': False
+            })
+            return
+
+        bounds = [min_price] + self._quantile_cuts(min_price, max_price, n_matches) + [max_price]
+        for lower, upper in zip(bounds[:-1], bounds[1:]):
+            self._plan(lower, upper)
+
+    def build(self, min_price, max_price, seed=None):
+        """Builds the full leaf plan of a price range.
+
+        Args:
+            min_price (float): Lower bound of the range.
+            max_price (float): Upper bound of the range.
+            seed (list): Leaves of a previous plan, whose boundaries are reused and only
+                split again if they now hold too many matches.
+
+        Returns:
+            The list of planned leaves.
+
+        """
+
+        self.leaves = []
+
+        if seed:
+            for leaf in seed:
+                self._plan(leaf['min'], leaf['max'])
+        else:
+            self._plan(min_price, max_price)
+
+        # Assigns the global page identifiers of every leaf
+        first_page = 1
+        for leaf in self.leaves:
+            leaf['first_page'] = first_page
+            first_page += leaf['pages']
+
+        self.save()
+
+        return self.leaves
+
+    def load(self):
+        """Loads the persisted plan.
+
+        Returns:
+            Whether a plan matching the current payload has been loaded.
+
+        """
+
+        if not os.path.exists(self.plan_file):
+            return False
+
+        with open(self.plan_file, 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+
+        if plan.get('payload') != self.payload:
+            return False
+
+        self.counts = plan.get('counts', {})
+        self.leaves = plan.get('leaves', [])
+
+        return True
+
+    def save(self):
+        """Atomically persists the plan."""
+
+        tmp_file = f'{self.plan_file}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'payload': self.payload, 'counts': self.counts, 'leaves': self.leaves}, f)
+
+        os.replace(tmp_file, self.plan_file)
+
+    def mark_done(self, leaf):
+        """Marks a leaf as scraped and persists the plan.
+
+        Args:
+            leaf (dict): Leaf that has been fully scraped.
+
+        """
+
+        leaf['done'] = True
+        self.save()
+
+    def pending(self, start_page=1):
+        """Iterates over the leaves that still need to be scraped.
+
+        Args:
+            start_page (int): Global page from which the scraping should start.
+
+        Returns:
+            A generator over the pending leaves.
+
+        """
+
+        for leaf in self.leaves:
+            if not leaf['done'] and leaf['first_page'] + leaf['pages'] > start_page:
+                yield leaf
@@ -1,18 +1,41 @@
 """Module used to provide the wrapped requesting class."""
 
+import math
+import random
+import time
+from email.utils import parsedate_to_datetime
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from . import constants as c
+from .metrics import normalize_endpoint
 
 
 class Requester:
     """Wraps basic `requests` package functions into a class.
 
+    Requests are issued through a pooled, keep-alive `requests.Session` and transient
+    failures (connection errors, 429 and 5xx responses) are retried with an
+    exponential backoff and full jitter, honoring the `Retry-After` header when present.
+    Successful responses may optionally be served from and stored into a `ResponseCache`.
+
     """
 
-    def __init__(self, base_url):
+    def __init__(self, base_url, pool_size=c.POOL_SIZE, timeout=c.TIMEOUT,
+                 max_retries=c.MAX_RETRIES, backoff_factor=c.BACKOFF_FACTOR,
+                 max_backoff=c.MAX_BACKOFF, cache=None, metrics=None):
         """Initializition method.
 
         Args:
             base_url (str): String that defines the base URL.
+            pool_size (int): Maximum number of kept-alive connections per host.
+            timeout (float, tuple): Connect and read timeouts (in seconds).
+            max_retries (int): Maximum number of retries of a single request.
+            backoff_factor (float): Base delay (in seconds) of the exponential backoff.
+            max_backoff (float): Upper bound (in seconds) of a single backoff delay.
+            cache (ResponseCache): Optional on-disk cache of successful responses.
+            metrics (Metrics): Optional registry receiving latencies, statuses, retries and bytes.
 
         """
 
@@ -24,6 +47,74 @@ class Requester:
             "User-Agent": ""
         }
 
+        # Defines the timeout and retrying policy
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+
+        # Creates the pooled session, which keeps the connections alive between requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # Defines the optional response cache and metrics registry
+        self.cache = cache
+        self.metrics = metrics
+
+    def _backoff(self, attempt, response=None):
+        """Computes the delay to wait before retrying a request.
+
+        Args:
+            attempt (int): Index of the failed attempt (starting at 0).
+            response (requests.Response): Failed response, if any.
+
+        Returns:
+            The delay (in seconds).
+
+        """
+
+        # Honors the `Retry-After` header, either given in seconds or as a HTTP date
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+                if math.isnan(delay):
+                    raise ValueError('NaN Retry-After')
+                return min(max(delay, 0.0), self.max_backoff)
+            except ValueError:
+                try:
+                    delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                    return min(max(delay, 0), self.max_backoff)
+                except (TypeError, ValueError):
+                    pass
+
+        # Exponential backoff with full jitter
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+    @staticmethod
+    def _cached_response(url, body):
+        """Builds a response out of a cached body.
+
+        Args:
+            url (str): Full-path URL of the request.
+            body (bytes): Cached body.
+
+        Returns:
+            A `requests.Response` that behaves as the original successful one.
+
+        """
+
+        res = requests.Response()
+        res.status_code = 200
+        res.url = url
+        res.encoding = 'utf-8'
+        res.headers['Content-Type'] = 'application/json'
+        res._content = body
+
+        return res
+
     def get(self, endpoint, **kwargs):
         """Wraps the `get` method of `requests`.
 
@@ -31,11 +122,55 @@ class Requester:
             endpoint (str): Endpoint to be consumed.
 
         Returns:
-            The `get` function with pre-populated headers over the endpoint.
+            The response of the `get` function with pre-populated headers over the endpoint,
+            which is the last failed response if every retry was exhausted.
 
         """
 
         # Defines the full-path URL
         url = self.base_url + endpoint
+        label = normalize_endpoint(endpoint, kwargs.get('params')) if self.metrics is not None else None
+
+        # Serves the response from the cache whenever possible
+        if self.cache is not None:
+            body = self.cache.get(endpoint, kwargs.get('params'))
+            if body is not None:
+                if self.metrics is not None:
+                    self.metrics.inc('cache_hits_total', label)
+                return self._cached_response(url, body)
+
+        # Uses the default timeout unless one has been given
+        kwargs.setdefault('timeout', self.timeout)
+
+        for attempt in range(self.max_retries + 1):
+            if attempt and self.metrics is not None:
+                self.metrics.inc('retries_total', label)
+
+            start = time.perf_counter()
+            try:
+                res = self.session.get(url, headers=self.headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if self.metrics is not None:
+                    self.metrics.record_request(label, 'error', time.perf_counter() - start)
+
+                # Re-raises the error once every retry was exhausted
+                if attempt == self.max_retries:
+                    raise
+
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if self.metrics is not None:
+                self.metrics.record_request(label, res.status_code, time.perf_counter() - start, len(res.content))
+
+            # Stores successful responses into the cache
+            if self.cache is not None and res.status_code == 200:
+                self.cache.set(endpoint, kwargs.get('params'), res.content)
+
+            # Returns whenever the request does not need to be retried
+            if res.status_code not in c.RETRY_STATUSES or attempt == self.max_retries:
+                return res
+
+            time.sleep(self._backoff(attempt, res))
 
-        return requests.get(url, headers=self.headers, **kwargs)
+        return res
@@ -0,0 +1,337 @@
+"""Module used to harvest wine reviews into compressed, size-rotated JSON lines shards."""
+
+import glob
+import gzip
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import constants as c
+from .extract import loads
+
+
+class ReviewShards:
+    """Appends the reviews of every wine as its own gzip member to rotating shard files.
+
+    Concatenated gzip members form a valid gzip file, so shards can be streamed as a whole
+    with `gzip.open`, while an index maps every wine identifier to the shard, byte offset
+    and length of its member, so that its reviews are read back with a single seek.
+
+    The index is a JSON lines file, appended once a member is written, which acts as the
+    commit record: on reopen, bytes past the last indexed member are discarded.
+
+    """
+
+    def __init__(self, directory, max_bytes=c.REVIEW_SHARD_BYTES):
+        """Initializition method.
+
+        Args:
+            directory (str): Directory holding the shards and their index.
+            max_bytes (int): Size (in bytes) past which a new shard is started.
+
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(directory, 'index.jsonl')
+
+        os.makedirs(directory, exist_ok=True)
+
+        # Loads the index (a torn last line being dropped) and the committed size of every shard
+        self.index = {}
+        self.shards = []
+        self.n_reviews = 0
+        committed = 0
+
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+
+                    while len(self.shards) <= entry['shard']:
+                        self.shards.append(0)
+                    self.shards[entry['shard']] = max(self.shards[entry['shard']], entry['offset'] + entry['length'])
+
+                    self.index[entry['id']] = (entry['shard'], entry['offset'], entry['length'])
+                    self.n_reviews += entry['reviews']
+                    committed += len(line)
+
+            with open(self.index_file, 'r+b') as f:
+                f.truncate(committed)
+
+        # Discards the uncommitted bytes of every shard, and the shards started after the last
+        # committed member (e.g. by a rotation right before a crash)
+        for path in glob.glob(os.path.join(directory, 'reviews-*.jsonl.gz')):
+            shard = int(os.path.basename(path)[len('reviews-'):-len('.jsonl.gz')]) - 1
+            size = self.shards[shard] if shard < len(self.shards) else 0
+
+            if size == 0:
+                os.remove(path)
+            elif os.path.getsize(path) > size:
+                with open(path, 'r+b') as f:
+                    f.truncate(size)
+
+        self.file = None
+        self.index_writer = open(self.index_file, 'ab')
+
+    def __contains__(self, wine_id):
+        return wine_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def _shard_path(self, shard):
+        return os.path.join(self.directory, f'reviews-{shard + 1:05d}.jsonl.gz')
+
+    def _active_shard(self, size):
+        """Gets the shard that should receive the next member, rotating it if needed.
+
+        Args:
+            size (int): Size (in bytes) of the next member.
+
+        Returns:
+            The index of the active shard.
+
+        """
+
+        if not self.shards or (self.shards[-1] and self.shards[-1] + size > self.max_bytes):
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+            self.shards.append(0)
+
+        if self.file is None:
+            self.file = open(self._shard_path(len(self.shards) - 1), 'ab')
+
+        return len(self.shards) - 1
+
+    def append(self, wine_id, reviews):
+        """Appends and commits the reviews of a wine.
+
+        Args:
+            wine_id (int): Identifier of the wine.
+            reviews (list): Reviews of the wine.
+
+        Returns:
+            The shard index, byte offset and length of the committed member.
+
+        """
+
+        lines = ''.join(json.dumps({'wine_id': wine_id, **review}, ensure_ascii=False, separators=(',', ':')) + '\n'
+                        for review in reviews)
+        member = gzip.compress(lines.encode('utf-8'), compresslevel=c.REVIEW_COMPRESSION, mtime=0)
+
+        shard = self._active_shard(len(member))
+        offset = self.shards[shard]
+
+        # Writes the member before committing it into the index
+        self.file.write(member)
+        self.file.flush()
+        self.shards[shard] += len(member)
+
+        self.index_writer.write(json.dumps({'id': wine_id, 'shard': shard, 'offset': offset, 'length': len(member),
+                                            'reviews': len(reviews)}).encode('utf-8') + b'\n')
+        self.index_writer.flush()
+
+        self.index[wine_id] = (shard, offset, len(member))
+        self.n_reviews += len(reviews)
+
+        return shard, offset, len(member)
+
+    def read(self, wine_id):
+        """Reads the reviews of a single wine back, without scanning the shards.
+
+        Args:
+            wine_id (int): Identifier of the wine.
+
+        Returns:
+            The reviews of the wine, or None if it has not been harvested.
+
+        """
+
+        if wine_id not in self.index:
+            return None
+
+        shard, offset, length = self.index[wine_id]
+
+        # Flushes pending writes of the active shard, which may hold the member
+        if self.file is not None:
+            self.file.flush()
+
+        with open(self._shard_path(shard), 'rb') as f:
+            f.seek(offset)
+            member = f.read(length)
+
+        return [loads(line) for line in gzip.decompress(member).splitlines()]
+
+    def iter_reviews(self):
+        """Sequentially streams every committed review.
+
+        Returns:
+            A generator over the reviews, each holding its `wine_id`.
+
+        """
+
+        for shard, size in enumerate(self.shards):
+            with open(self._shard_path(shard), 'rb') as f:
+                with gzip.GzipFile(fileobj=_BoundedReader(f, size)) as g:
+                    for line in g:
+                        yield loads(line)
+
+    def stats(self):
+        """Gets the size of the store.
+
+        Returns:
+            A dictionary holding the number of wines, reviews and shards, and the
+            compressed size (in bytes).
+
+        """
+
+        return {'wines': len(self.index), 'reviews': self.n_reviews, 'shards': len(self.shards),
+                'bytes': sum(self.shards)}
+
+    def close(self):
+        """Durably closes the active shard and the index."""
+
+        for f in (self.file, self.index_writer):
+            if f is not None and not f.closed:
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+
+        self.file = None
+
+
+class _BoundedReader:
+    """Exposes the first `size` bytes of a file, hiding uncommitted ones from gzip."""
+
+    def __init__(self, f, size):
+        self.f = f
+        self.remaining = size
+
+    def read(self, n=-1):
+        if n < 0 or n > self.remaining:
+            n = self.remaining
+
+        data = self.f.read(n)
+        self.remaining -= len(data)
+
+        return data
+
+
+def fetch_reviews(r, wine_id, per_page=c.REVIEWS_PER_PAGE, max_pages=c.REVIEWS_MAX_PAGES):
+    """Pages through the reviews of a wine.
+
+    Args:
+        r (Requester): Wrapper used to perform the requests.
+        wine_id (int): Identifier of the wine.
+        per_page (int): Number of reviews per page.
+        max_pages (int): Maximum number of fetched pages.
+
+    Returns:
+        The reviews of the wine, or None if a page could not be fetched.
+
+    """
+
+    reviews = []
+
+    for page in range(1, max_pages + 1):
+        res = r.get(f'wines/{wine_id}/reviews', params={'page': page, 'per_page': per_page})
+        if res is None or res.status_code != 200:
+            return None
+
+        batch = loads(res.content).get('reviews') or []
+        reviews.extend(batch)
+
+        # A short page is the last one
+        if len(batch) < per_page:
+            break
+
+    return reviews
+
+
+class ReviewHarvester:
+    """Fetches the reviews of wines with bounded concurrency and streams them into shards."""
+
+    def __init__(self, r, shards, workers=c.ENRICH_WORKERS, per_page=c.REVIEWS_PER_PAGE,
+                 max_pages=c.REVIEWS_MAX_PAGES):
+        """Initializition method.
+
+        Args:
+            r (Requester): Wrapper used to perform the requests.
+            shards (ReviewShards): Store receiving the reviews.
+            workers (int): Number of wines whose reviews are fetched concurrently.
+            per_page (int): Number of reviews per page.
+            max_pages (int): Maximum number of fetched pages per wine.
+
+        """
+
+        self.r = r
+        self.shards = shards
+        self.workers = max(1, workers)
+        self.per_page = per_page
+        self.max_pages = max_pages
+
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+    def harvest(self, wine_ids):
+        """Harvests the reviews of wines not stored yet.
+
+        At most two wines per worker are in flight, and only the calling thread writes into
+        the shards, so that memory stays flat whatever the number of wines.
+
+        Args:
+            wine_ids (iterable): Identifiers of the wines.
+
+        Returns:
+            A dictionary holding the number of harvested, skipped and failed wines, and of
+            harvested reviews.
+
+        """
+
+        summary = {'wines': 0, 'skipped': 0, 'failed': 0, 'reviews': 0}
+        pending = deque()
+        queued = set()
+
+        def _commit():
+            wine_id, future = pending.popleft()
+            queued.discard(wine_id)
+
+            try:
+                reviews = future.result()
+            except Exception as e:
+                print(f"Error fetching reviews of wine {wine_id}: {e}")
+                reviews = None
+
+            if reviews is None:
+                summary['failed'] += 1
+                return
+
+            self.shards.append(wine_id, reviews)
+            summary['wines'] += 1
+            summary['reviews'] += len(reviews)
+
+        for wine_id in wine_ids:
+            if wine_id in self.shards or wine_id in queued:
+                summary['skipped'] += 1
+                continue
+
+            queued.add(wine_id)
+            pending.append((wine_id, self.executor.submit(fetch_reviews, self.r, wine_id, self.per_page, self.max_pages)))
+            if len(pending) >= 2 * self.workers:
+                _commit()
+
+        while pending:
+            _commit()
+
+        return summary
+
+    def close(self):
+        """Shuts the pool down."""
+
+        self.executor.shutdown()
@@ -0,0 +1,166 @@
+"""Module used to store scraped pages into an append-only segment log."""
+
+import json
+import os
+
+from . import constants as c
+
+
+class SegmentLog:
+    """Appends pages as compact JSON lines to rotating segment files.
+
+    A small manifest records the committed size of every segment and the last committed
+    page, so that resuming is O(1) and partially written pages are discarded on reopen.
+    Read-only logs stop at the committed sizes instead, leaving a log that is still being
+    written untouched.
+
+    """
+
+    def __init__(self, directory, max_bytes=c.SEGMENT_MAX_BYTES, read_only=False):
+        """Initializition method.
+
+        Args:
+            directory (str): Directory holding the segments and their manifest.
+            max_bytes (int): Size (in bytes) past which a new segment is started.
+            read_only (bool): Whether the log is only read, e.g. while a scrape appends to it.
+
+        """
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.read_only = read_only
+        self.manifest_file = os.path.join(directory, 'manifest.json')
+
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+
+        # Loads the manifest, if any
+        if os.path.exists(self.manifest_file):
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'last_page': 0, 'pages': 0, 'segments': []}
+
+        # Discards any uncommitted bytes of the active segment
+        if self.manifest['segments'] and not read_only:
+            segment = self.manifest['segments'][-1]
+            path = os.path.join(directory, segment['name'])
+            if os.path.exists(path) and os.path.getsize(path) > segment['bytes']:
+                with open(path, 'r+b') as f:
+                    f.truncate(segment['bytes'])
+
+        self.file = None
+
+    @property
+    def last_page(self):
+        """Last committed page identifier."""
+
+        return self.manifest['last_page']
+
+    def _save_manifest(self):
+        """Atomically persists the manifest."""
+
+        tmp_file = f'{self.manifest_file}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f)
+
+        os.replace(tmp_file, self.manifest_file)
+
+    def _active_segment(self, size):
+        """Gets the segment that should receive the next page, rotating it if needed.
+
+        Args:
+            size (int): Size (in bytes) of the next page.
+
+        Returns:
+            The manifest entry of the active segment.
+
+        """
+
+        segments = self.manifest['segments']
+
+        if not segments or (segments[-1]['bytes'] and segments[-1]['bytes'] + size > self.max_bytes):
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+            segments.append({'name': f'segment-{len(segments) + 1:05d}.jsonl', 'bytes': 0,
+                             'first_page': None, 'last_page': None})
+
+        if self.file is None:
+            self.file = open(os.path.join(self.directory, segments[-1]['name']), 'ab')
+
+        return segments[-1]
+
+    def append(self, page, data):
+        """Appends and commits a page.
+
+        Args:
+            page (int): Global page identifier.
+            data (dict): Page data holding its `wines`.
+
+        Returns:
+            The segment name, byte offset and length of the committed page.
+
+        """
+
+        if self.read_only:
+            raise ValueError(f'{self.directory} was opened as read-only')
+
+        line = json.dumps({'page': page, 'wines': data.get('wines', [])},
+                          ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+        segment = self._active_segment(len(line))
+        offset = segment['bytes']
+
+        # Makes the page durable before committing it into the manifest
+        self.file.write(line)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+        segment['bytes'] += len(line)
+        if segment['first_page'] is None:
+            segment['first_page'] = page
+        segment['last_page'] = page
+        self.manifest['last_page'] = max(self.manifest['last_page'], page)
+        self.manifest['pages'] += 1
+        self._save_manifest()
+
+        return segment['name'], offset, len(line)
+
+    def iter_pages(self):
+        """Sequentially streams every committed page.
+
+        Returns:
+            A generator over the committed pages.
+
+        """
+
+        for segment in self.manifest['segments']:
+            with open(os.path.join(self.directory, segment['name']), 'rb') as f:
+                remaining = segment['bytes']
+
+                for line in f:
+                    if remaining <= 0:
+                        break
+                    remaining -= len(line)
+
+                    yield json.loads(line)
+
+    def iter_wines(self):
+        """Sequentially streams the wines of every committed page.
+
+        Returns:
+            A generator over the committed wines.
+
+        """
+
+        for page in self.iter_pages():
+            yield from page['wines']
+
+    def close(self):
+        """Closes the active segment."""
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
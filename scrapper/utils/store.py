@@ -0,0 +1,264 @@
+"""Module used to store wine snapshots into an indexed SQLite database."""
+
+import sqlite3
+from datetime import date, datetime
+from itertools import islice
+
+from . import constants as c
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS wines (
+    id INTEGER PRIMARY KEY,
+    winery TEXT,
+    country TEXT,
+    grapes TEXT
+);
+CREATE INDEX IF NOT EXISTS wines_winery ON wines (winery);
+CREATE INDEX IF NOT EXISTS wines_country ON wines (country);
+
+CREATE TABLE IF NOT EXISTS wine_grapes (
+    wine_id INTEGER NOT NULL,
+    grape TEXT NOT NULL,
+    PRIMARY KEY (wine_id, grape)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS wine_grapes_grape ON wine_grapes (grape, wine_id);
+
+CREATE TABLE IF NOT EXISTS vintages (
+    wine_id INTEGER NOT NULL,
+    vintage INTEGER NOT NULL,
+    name TEXT,
+    PRIMARY KEY (wine_id, vintage)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS tastes (
+    wine_id INTEGER PRIMARY KEY,
+    acidity REAL,
+    intensity REAL,
+    sweetness REAL,
+    tannin REAL,
+    flavor_rank1 TEXT,
+    flavor_rank2 TEXT,
+    flavor_rank3 TEXT
+);
+
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    label TEXT UNIQUE NOT NULL,
+    taken_at TEXT
+);
+
+CREATE TABLE IF NOT EXISTS prices (
+    snapshot_id INTEGER NOT NULL,
+    wine_id INTEGER NOT NULL,
+    vintage INTEGER NOT NULL,
+    price REAL,
+    rating REAL,
+    reviews_count INTEGER,
+    PRIMARY KEY (snapshot_id, wine_id, vintage)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS prices_wine ON prices (wine_id, vintage, snapshot_id);
+CREATE INDEX IF NOT EXISTS prices_snapshot_rating ON prices (snapshot_id, rating);
+CREATE INDEX IF NOT EXISTS prices_snapshot_price ON prices (snapshot_id, price);
+'''
+
+# Taste columns, also exported as wine fields
+TASTE_FIELDS = ['acidity', 'intensity', 'sweetness', 'tannin', 'flavor_rank1', 'flavor_rank2', 'flavor_rank3']
+
+
+def vintage_year(vintage):
+    """Converts a vintage into its stored year.
+
+    Args:
+        vintage (int, str): Vintage year, 'N.V.' or None.
+
+    Returns:
+        The year, or 0 for non-vintage and unknown vintages.
+
+    """
+
+    try:
+        return int(vintage)
+    except (TypeError, ValueError):
+        return 0
+
+
+class WineStore:
+    """Indexed SQLite store of wines, vintages, tastes and per-snapshot prices and ratings."""
+
+    def __init__(self, path):
+        """Initializition method.
+
+        Args:
+            path (str): Path to the database.
+
+        """
+
+        # Workers spawned by a coordinator may write into the same store concurrently
+        self.db = sqlite3.connect(path, timeout=c.STORE_TIMEOUT)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(SCHEMA)
+
+    def snapshot_id(self, label, taken_at=None):
+        """Gets the identifier of a snapshot, creating it if needed.
+
+        Args:
+            label (str): Label of the snapshot (e.g. `25-11-2025`).
+            taken_at (str): ISO date of the snapshot. If None, it is parsed from the label
+                or defaults to today.
+
+        Returns:
+            The snapshot identifier.
+
+        """
+
+        if taken_at is None:
+            try:
+                taken_at = datetime.strptime(label, c.SNAPSHOT_DATE_FORMAT).date().isoformat()
+            except ValueError:
+                taken_at = date.today().isoformat()
+
+        self.db.execute('INSERT OR IGNORE INTO snapshots (label, taken_at) VALUES (?, ?)', (label, taken_at))
+
+        return self.db.execute('SELECT id FROM snapshots WHERE label = ?', (label,)).fetchone()[0]
+
+    def add_wines(self, label, wines, batch_size=c.STORE_BATCH_SIZE):
+        """Bulk inserts wines into a snapshot, one transaction per batch.
+
+        Wines, vintages and tastes are upserted, while the prices and ratings are recorded
+        for the given snapshot.
+
+        Args:
+            label (str): Label of the snapshot.
+            wines (iterable): Stream of wines.
+            batch_size (int): Number of wines inserted per transaction.
+
+        Returns:
+            The number of inserted wines.
+
+        """
+
+        wines = iter(wines)
+        total = 0
+
+        with self.db:
+            snapshot_id = self.snapshot_id(label)
+
+        while batch := list(islice(wines, batch_size)):
+            with self.db:
+                self.db.executemany('INSERT OR REPLACE INTO wines (id, winery, country, grapes) VALUES (?, ?, ?, ?)',
+                                    [(wine['id'], wine.get('winery'), wine.get('country'), wine.get('grapes')) for wine in batch])
+
+                # Replaces the blend of every wine, so that grapes removed from it do not linger
+                self.db.executemany('DELETE FROM wine_grapes WHERE wine_id = ?', [(wine['id'],) for wine in batch])
+                self.db.executemany('INSERT OR IGNORE INTO wine_grapes (wine_id, grape) VALUES (?, ?)',
+                                    [(wine['id'], grape.strip()) for wine in batch
+                                     for grape in (wine.get('grapes') or '').split(';') if grape.strip()])
+
+                self.db.executemany('INSERT OR REPLACE INTO vintages (wine_id, vintage, name) VALUES (?, ?, ?)',
+                                    [(wine['id'], vintage_year(wine.get('vintage')), wine.get('name')) for wine in batch])
+
+                self.db.executemany(f'INSERT OR REPLACE INTO tastes (wine_id, {", ".join(TASTE_FIELDS)}) VALUES (?{", ?" * len(TASTE_FIELDS)})',
+                                    [(wine['id'], *(wine.get(field) for field in TASTE_FIELDS)) for wine in batch])
+
+                self.db.executemany('INSERT OR REPLACE INTO prices (snapshot_id, wine_id, vintage, price, rating, reviews_count) VALUES (?, ?, ?, ?, ?, ?)',
+                                    [(snapshot_id, wine['id'], vintage_year(wine.get('vintage')), wine.get('price'),
+                                      wine.get('rating'), wine.get('reviews_count')) for wine in batch])
+
+            total += len(batch)
+
+        return total
+
+    def snapshots(self):
+        """Lists the snapshots.
+
+        Returns:
+            The snapshot labels, from the oldest to the newest.
+
+        """
+
+        return [row['label'] for row in self.db.execute('SELECT label FROM snapshots ORDER BY taken_at, id')]
+
+    def query(self, country=None, winery=None, grape=None, min_rating=None, max_price=None,
+              min_price=None, vintage=None, last_snapshots=1, limit=None):
+        """Queries the wines matching a set of filters across the latest snapshots.
+
+        Args:
+            country (str): Country of origin.
+            winery (str): Winery name.
+            grape (str): Grape variety, part of the blend.
+            min_rating (float): Minimum rating.
+            max_price (float): Maximum price.
+            min_price (float): Minimum price.
+            vintage (int): Vintage year (0 for non-vintage wines).
+            last_snapshots (int): Number of latest snapshots to be searched, every one if None.
+            limit (int): Maximum number of returned rows.
+
+        Returns:
+            A list of dictionaries, one per matching wine, vintage and snapshot.
+
+        """
+
+        sql = ['SELECT s.label AS snapshot, w.id, v.vintage, v.name, w.country, w.winery, w.grapes,',
+               'p.rating, p.price, p.reviews_count, ' + ', '.join(f't.{field}' for field in TASTE_FIELDS),
+               'FROM prices p',
+               'JOIN snapshots s ON s.id = p.snapshot_id',
+               'JOIN wines w ON w.id = p.wine_id',
+               'JOIN vintages v ON v.wine_id = p.wine_id AND v.vintage = p.vintage',
+               'LEFT JOIN tastes t ON t.wine_id = p.wine_id']
+        where, params = [], []
+
+        if grape is not None:
+            sql.append('JOIN wine_grapes g ON g.wine_id = p.wine_id AND g.grape = ?')
+            params.append(grape)
+
+        if last_snapshots is not None:
+            where.append('p.snapshot_id IN (SELECT id FROM snapshots ORDER BY taken_at DESC, id DESC LIMIT ?)')
+            params.append(last_snapshots)
+
+        for column, operator, value in (('w.country', '=', country), ('w.winery', '=', winery),
+                                        ('p.rating', '>=', min_rating), ('p.price', '<=', max_price),
+                                        ('p.price', '>=', min_price), ('p.vintage', '=', vintage)):
+            if value is not None:
+                where.append(f'{column} {operator} ?')
+                params.append(value)
+
+        if where:
+            sql.append('WHERE ' + ' AND '.join(where))
+
+        sql.append('ORDER BY s.taken_at, s.id, p.wine_id, p.vintage')
+
+        if limit is not None:
+            sql.append('LIMIT ?')
+            params.append(limit)
+
+        return [dict(row) for row in self.db.execute('\n'.join(sql), params)]
+
+    def history(self, wine_id, vintage=None):
+        """Gets the price and rating history of a wine.
+
+        Args:
+            wine_id (int): Identifier of the wine.
+            vintage (int): Vintage year, every vintage if None.
+
+        Returns:
+            A list of dictionaries, one per vintage and snapshot.
+
+        """
+
+        sql = '''SELECT s.label AS snapshot, p.vintage, p.price, p.rating, p.reviews_count
+                 FROM prices p JOIN snapshots s ON s.id = p.snapshot_id
+                 WHERE p.wine_id = ?'''
+        params = [wine_id]
+
+        if vintage is not None:
+            sql += ' AND p.vintage = ?'
+            params.append(vintage_year(vintage))
+
+        return [dict(row) for row in self.db.execute(sql + ' ORDER BY p.vintage, s.taken_at, s.id', params)]
+
+    def close(self):
+        """Closes the underlying database."""
+
+        self.db.close()
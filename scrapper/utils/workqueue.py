@@ -0,0 +1,256 @@
+"""Module used to share the planned price ranges between scraping workers."""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from . import constants as c
+
+
+def default_worker_id():
+    """Builds an identifier unique to the current process.
+
+    Returns:
+        The worker identifier, made of the host name, process identifier and a random suffix.
+
+    """
+
+    return f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}'
+
+
+class WorkQueue:
+    """Lease-based work queue of price-range leaves, stored in a SQLite database.
+
+    Workers claim a leaf for a limited time and keep renewing their lease while scraping it.
+    Leases that are not renewed (e.g. a killed worker) expire and their leaves are claimed
+    again, so that no range is lost. The database only relies on SQLite file locking (no
+    WAL), hence it may live on a filesystem shared by several hosts, whose clocks are
+    expected to be roughly synchronized. Released leaves are claimed again after the fresh
+    ones, until they reach a maximum number of attempts and are marked as failed.
+
+    """
+
+    def __init__(self, path, lease_seconds=c.LEASE_SECONDS, max_attempts=c.QUEUE_MAX_ATTEMPTS):
+        """Initializition method.
+
+        Args:
+            path (str): Path to the queue database.
+            lease_seconds (float): Duration of a lease.
+            max_attempts (int): Number of claims after which a released leaf is marked as failed.
+
+        """
+
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        # Opens the database in autocommit mode, transactions being explicitly handled
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=c.QUEUE_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS leaves (
+                               id INTEGER PRIMARY KEY,
+                               min REAL,
+                               max REAL,
+                               matches INTEGER,
+                               first_page INTEGER,
+                               pages INTEGER,
+                               status TEXT DEFAULT 'pending',
+                               owner TEXT,
+                               lease_expires REAL,
+                               attempts INTEGER DEFAULT 0)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS leaves_status ON leaves (status, lease_expires)')
+
+    def _transaction(self, statements):
+        """Runs statements within an immediate (write-locked) transaction.
+
+        Args:
+            statements (callable): Function receiving the cursor, whose result is returned.
+
+        Returns:
+            The result of `statements`.
+
+        """
+
+        with self.lock:
+            cursor = self.db.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                result = statements(cursor)
+            except BaseException:
+                cursor.execute('ROLLBACK')
+                raise
+            cursor.execute('COMMIT')
+
+        return result
+
+    def enqueue(self, leaves):
+        """Enqueues the leaves of a plan, unless the queue has already been filled.
+
+        Args:
+            leaves (list): Planned leaves.
+
+        Returns:
+            Whether the leaves have been enqueued.
+
+        """
+
+        def _enqueue(cursor):
+            if cursor.execute('SELECT COUNT(*) FROM leaves').fetchone()[0]:
+                return False
+
+            cursor.executemany('INSERT INTO leaves (min, max, matches, first_page, pages, status) VALUES (?, ?, ?, ?, ?, ?)',
+                               [(leaf['min'], leaf['max'], leaf['matches'], leaf['first_page'], leaf['pages'],
+                                 'done' if leaf.get('done') else 'pending') for leaf in leaves])
+
+            return True
+
+        return self._transaction(_enqueue)
+
+    def claim(self, worker_id):
+        """Claims the next pending leaf, re-queuing the expired leases beforehand.
+
+        Args:
+            worker_id (str): Identifier of the claiming worker.
+
+        Returns:
+            The claimed leaf or None if no leaf is currently claimable.
+
+        """
+
+        def _claim(cursor):
+            now = time.time()
+
+            cursor.execute("UPDATE leaves SET status = 'pending', owner = NULL WHERE status = 'leased' AND lease_expires < ?", (now,))
+
+            row = cursor.execute("SELECT id, min, max, matches, first_page, pages FROM leaves WHERE status = 'pending' ORDER BY attempts, id LIMIT 1").fetchone()
+            if row is None:
+                return None
+
+            cursor.execute("UPDATE leaves SET status = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1 WHERE id = ?",
+                           (worker_id, now + self.lease_seconds, row[0]))
+
+            return dict(zip(('id', 'min', 'max', 'matches', 'first_page', 'pages'), row))
+
+        return self._transaction(_claim)
+
+    def heartbeat(self, leaf_id, worker_id):
+        """Renews a lease.
+
+        Args:
+            leaf_id (int): Identifier of the leased leaf.
+            worker_id (str): Identifier of the owning worker.
+
+        Returns:
+            Whether the lease is still held by the worker.
+
+        """
+
+        return self._transaction(lambda cursor: cursor.execute(
+            "UPDATE leaves SET lease_expires = ? WHERE id = ? AND owner = ? AND status = 'leased'",
+            (time.time() + self.lease_seconds, leaf_id, worker_id)).rowcount == 1)
+
+    def complete(self, leaf_id, worker_id):
+        """Commits a scraped leaf.
+
+        Args:
+            leaf_id (int): Identifier of the leased leaf.
+            worker_id (str): Identifier of the owning worker.
+
+        Returns:
+            Whether the leaf was still leased by the worker.
+
+        """
+
+        return self._transaction(lambda cursor: cursor.execute(
+            "UPDATE leaves SET status = 'done', lease_expires = NULL WHERE id = ? AND owner = ? AND status = 'leased'",
+            (leaf_id, worker_id)).rowcount == 1)
+
+    def release(self, leaf_id, worker_id):
+        """Gives a leased leaf back to the queue, e.g. after a failure.
+
+        Leaves that have already been claimed `max_attempts` times are marked as failed
+        instead, so that a persistently failing range does not keep the workers busy.
+
+        Args:
+            leaf_id (int): Identifier of the leased leaf.
+            worker_id (str): Identifier of the owning worker.
+
+        """
+
+        self._transaction(lambda cursor: cursor.execute(
+            "UPDATE leaves SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, owner = NULL, "
+            "lease_expires = NULL WHERE id = ? AND owner = ? AND status = 'leased'",
+            (self.max_attempts, leaf_id, worker_id)))
+
+    def counts(self):
+        """Counts the leaves by status.
+
+        Returns:
+            A dictionary mapping `pending`, `leased`, `done` and `failed` to their number of leaves.
+
+        """
+
+        with self.lock:
+            rows = self.db.execute('SELECT status, COUNT(*) FROM leaves GROUP BY status').fetchall()
+
+        return {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0, **dict(rows)}
+
+    def lease(self, leaf, worker_id):
+        """Keeps a lease alive in a background thread while the leaf is being scraped.
+
+        Args:
+            leaf (dict): Claimed leaf.
+            worker_id (str): Identifier of the owning worker.
+
+        Returns:
+            A `Lease` context manager.
+
+        """
+
+        return Lease(self, leaf['id'], worker_id)
+
+    def close(self):
+        """Closes the underlying database."""
+
+        with self.lock:
+            self.db.close()
+
+
+class Lease:
+    """Context manager renewing a lease at a third of its duration."""
+
+    def __init__(self, queue, leaf_id, worker_id):
+        """Initializition method.
+
+        Args:
+            queue (WorkQueue): Queue holding the lease.
+            leaf_id (int): Identifier of the leased leaf.
+            worker_id (str): Identifier of the owning worker.
+
+        """
+
+        self.queue = queue
+        self.leaf_id = leaf_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+        self.lost = False
+        self.thread = threading.Thread(target=self._renew, daemon=True)
+
+    def _renew(self):
+        while not self.stopped.wait(self.queue.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.leaf_id, self.worker_id):
+                    self.lost = True
+                    return
+            except sqlite3.OperationalError as e:
+                print(f"Error renewing lease of leaf {self.leaf_id}: {e}")
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from scrapper.utils.columnar import json_to_columnar, load_columnar, pq
+
+COUNTRIES = ['France', 'Italy', None, 'Spain', None]
+
+
+@pytest.fixture
+def json_file(tmp_path):
+    wines = [{'id': i, 'name': f'Wine {i}', 'vintage': 2000 + i if i % 2 else 'N.V.', 'country': country,
+              'rating': 4.0, 'price': 10.0 + i} for i, country in enumerate(COUNTRIES)]
+
+    path = tmp_path / 'wines.json'
+    path.write_text(json.dumps({'wines': wines}), encoding='utf-8')
+
+    return str(path)
+
+
+@pytest.mark.skipif(pq is None, reason='requires pyarrow')
+def test_parquet_round_trip_keeps_missing_categories(json_file, tmp_path):
+    path = json_to_columnar(json_file, str(tmp_path / 'wines.parquet'), format='parquet')
+
+    assert list(load_columnar(path, ['country'])['country']) == COUNTRIES
+
+    frame = load_columnar(path, as_frame=True)
+    assert frame['country'].isna().tolist() == [country is None for country in COUNTRIES]
+    assert frame['country'].dropna().tolist() == [country for country in COUNTRIES if country is not None]
+    assert frame['vintage'].isna().tolist() == [True, False, True, False, True]
+
+
+def test_npy_round_trip_keeps_missing_categories(json_file, tmp_path):
+    path = json_to_columnar(json_file, str(tmp_path / 'wines.columns'), format='npy')
+
+    codes, categories = load_columnar(path, ['country'])['country']
+    assert [categories[code] if code >= 0 else None for code in codes] == COUNTRIES
+
+    frame = load_columnar(path, as_frame=True)
+    assert frame['country'].isna().tolist() == [country is None for country in COUNTRIES]
@@ -0,0 +1,36 @@
+import json
+
+from scrapper.utils.diff import diff_series
+
+
+def write_snapshot(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('id,vintage,price,rating\n')
+        for row in rows:
+            f.write(','.join(str(value) for value in row) + '\n')
+
+
+def read_log(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def test_interrupted_pair_is_not_duplicated(tmp_path):
+    old, new, changelog = tmp_path / '01-01-2025.csv', tmp_path / '02-01-2025.csv', tmp_path / 'changes.jsonl'
+    write_snapshot(old, [(1, 2015, 10.0, 4.0), (2, 2016, 20.0, 3.5)])
+    write_snapshot(new, [(1, 2015, 12.0, 4.0), (3, 2018, 30.0, 3.8)])
+
+    diff_series([str(old), str(new)], str(changelog))
+    expected = read_log(changelog)
+
+    # Simulates a crash after the first events of the pair (the last one being torn)
+    lines = changelog.read_text(encoding='utf-8').splitlines(keepends=True)
+    changelog.write_text(''.join(lines[:2]) + lines[2][:10], encoding='utf-8')
+
+    summaries = diff_series([str(old), str(new)], str(changelog))
+    assert read_log(changelog) == expected
+    assert summaries[0]['new'] == 1 and summaries[0]['removed'] == 1 and summaries[0]['repriced'] == 1
+
+    # Recorded pairs are skipped, leaving the log untouched
+    diff_series([str(old), str(new)], str(changelog))
+    assert read_log(changelog) == expected
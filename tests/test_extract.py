@@ -0,0 +1,36 @@
+from benchmarks.extractor import legacy_extract
+from benchmarks.mock_vivino import MockVivino, generate_catalog
+from scrapper.utils.extract import Extractor
+
+
+def test_matches_the_legacy_parsing():
+    extractor = Extractor()
+
+    for wine in generate_catalog(500):
+        match, tastes = MockVivino.match(wine), MockVivino.tastes(wine)
+        assert extractor(match, tastes) == legacy_extract(match, tastes)
+
+
+def test_counts_missing_fields_and_drops_matches_without_id():
+    extractor = Extractor()
+
+    assert extractor({'vintage': {'wine': {}}}) is None
+
+    entry = extractor({'vintage': {'wine': {'id': 1, 'style': None}}}, {'tastes': {'flavor': [{'group': 'oak'}]}})
+    assert entry['grapes'] == '' and entry['flavor_rank1'] == 'oak' and entry['flavor_rank2'] is None
+
+    missing = extractor.take_missing()
+    assert missing['id'] == 1 and missing['grapes'] == 1 and missing['flavor_rank2'] == 1 and 'flavor_rank1' not in missing
+    assert extractor.take_missing() == {}
+
+
+def test_null_prefixes_fall_back_to_defaults():
+    extractor = Extractor()
+
+    entry = extractor({'vintage': {'wine': {'id': 1, 'region': None}, 'statistics': None}, 'price': None},
+                      {'tastes': None})
+    assert entry['country'] is None and entry['rating'] is None and entry['price'] is None
+    assert entry['acidity'] is None and entry['flavor_rank3'] is None
+
+    missing = extractor.take_missing()
+    assert all(missing[field] == 1 for field in extractor.fields[1:])
@@ -0,0 +1,21 @@
+import pandas as pd
+
+from analysis.grapes import GrapeEncoder
+from benchmarks.grape_encoder import count_vectorizer_path
+
+BLENDS = pd.DataFrame({'grapes': ['Syrah;Merlot', 'Merlot', 'Grenache', 'Syrah', None, 'Cinsault ; Grenache']})
+
+
+def test_ties_at_the_cutoff_are_broken_alphabetically():
+    encoder = GrapeEncoder(top_k=2, missing_value=None).fit(BLENDS)
+
+    # Grenache, Merlot and Syrah are all held by two wines
+    assert list(encoder.get_feature_names_out()) == ['grenache', 'merlot']
+
+
+def test_matches_count_vectorizer_without_cutoff():
+    vectorizer = count_vectorizer_path(max_grapes=None).fit(BLENDS)
+    encoder = GrapeEncoder(top_k=None).fit(BLENDS)
+
+    assert list(vectorizer.get_feature_names_out()) == list(encoder.get_feature_names_out())
+    assert (vectorizer.transform(BLENDS) != encoder.transform(BLENDS)).nnz == 0
@@ -0,0 +1,22 @@
+from scrapper.utils.metrics import Metrics
+
+
+def test_counters_are_rendered_with_their_label_name():
+    metrics = Metrics()
+    metrics.inc('missing_fields_total', 'grapes', 3)
+    metrics.record_request('explore/explore', 200, 0.1, 10)
+
+    rendered = metrics.to_prometheus()
+
+    assert 'vivino_missing_fields_total{field="grapes"} 3' in rendered
+    assert 'vivino_requests_total{endpoint="explore/explore"} 1' in rendered
+
+
+def test_serves_on_the_local_interface_by_default():
+    metrics = Metrics()
+    metrics.serve(0)
+
+    try:
+        assert metrics.server.server_address[0] == '127.0.0.1'
+    finally:
+        metrics.close()
@@ -0,0 +1,26 @@
+import pytest
+
+from analysis.models import cross_validate, expand_grid
+
+
+def test_expands_grids_into_configurations():
+    configurations = expand_grid(['linear_regression', 'random_forest'],
+                                 {'random_forest': [{'max_depth': 5}, {'max_depth': 10, 'n_estimators': 50}]})
+
+    assert [label for label, _, _ in configurations] == [
+        'linear_regression', 'random_forest(max_depth=5)', 'random_forest(max_depth=10, n_estimators=50)']
+    assert configurations[2][2] == {'max_depth': 10, 'n_estimators': 50}
+
+    # Grids of candidate values are expanded as their cartesian product, and select their models
+    assert len(expand_grid(grid={'gradient_boosting': {'max_depth': [3, 5], 'learning_rate': [0.05, 0.1]}})) == 4
+
+    with pytest.raises(ValueError):
+        expand_grid(grid={'svm': [{}]})
+
+
+def test_sweeps_a_grid():
+    results, table = cross_validate('data/26-11-2025.csv', n_folds=2, n_jobs=1, cache_dir=None,
+                                    grid={'linear_regression': {'fit_intercept': [True, False]}})
+
+    assert len(results) == 4
+    assert set(table.index) == {'linear_regression(fit_intercept=True)', 'linear_regression(fit_intercept=False)'}
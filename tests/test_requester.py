@@ -0,0 +1,29 @@
+import pytest
+import requests
+
+from scrapper.utils.requester import Requester
+
+
+def _response(retry_after):
+    res = requests.Response()
+    res.status_code = 429
+    res.headers['Retry-After'] = retry_after
+
+    return res
+
+
+@pytest.mark.parametrize('retry_after', ['-5', 'nan', 'NaN', 'garbage'])
+def test_invalid_retry_after_yields_a_valid_delay(retry_after):
+    r = Requester('http://127.0.0.1/', backoff_factor=0.5, max_backoff=10)
+
+    delay = r._backoff(0, _response(retry_after))
+
+    assert 0 <= delay <= 10
+
+
+def test_retry_after_is_clamped():
+    r = Requester('http://127.0.0.1/', max_backoff=10)
+
+    assert r._backoff(0, _response('3')) == 3
+    assert r._backoff(0, _response('-1')) == 0
+    assert r._backoff(0, _response('60')) == 10
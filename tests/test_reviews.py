@@ -0,0 +1,54 @@
+import json
+import os
+
+from scrapper.utils.reviews import ReviewShards
+
+
+def _reviews(wine_id, n=3):
+    return [{'id': wine_id * 10 + i, 'note': f'Review {i} of wine {wine_id}'} for i in range(n)]
+
+
+def test_recovers_from_a_crash_right_after_a_rotation(tmp_path):
+    directory = str(tmp_path)
+
+    shards = ReviewShards(directory, max_bytes=150)
+    for wine_id in range(3):
+        shards.append(wine_id, _reviews(wine_id))
+    shards.close()
+    assert shards.stats()['shards'] > 1
+
+    # Drops the last index line, as if the process died before committing its member
+    index_file = os.path.join(directory, 'index.jsonl')
+    with open(index_file, 'rb') as f:
+        lines = f.readlines()
+    with open(index_file, 'wb') as f:
+        f.writelines(lines[:-1])
+
+    shards = ReviewShards(directory, max_bytes=150)
+    assert 2 not in shards
+
+    for wine_id in (3, 4):
+        shards.append(wine_id, _reviews(wine_id))
+
+    for wine_id in (0, 1, 3, 4):
+        assert shards.read(wine_id) == [{'wine_id': wine_id, **review} for review in _reviews(wine_id)]
+    assert sorted({review['wine_id'] for review in shards.iter_reviews()}) == [0, 1, 3, 4]
+    shards.close()
+
+
+def test_discards_torn_members_and_index_lines(tmp_path):
+    directory = str(tmp_path)
+
+    shards = ReviewShards(directory)
+    shards.append(1, _reviews(1))
+    shards.file.write(b'torn member')
+    shards.index_writer.write(json.dumps({'id': 2}).encode('utf-8')[:5])
+    shards.close()
+
+    shards = ReviewShards(directory)
+    shards.append(2, _reviews(2, 1))
+
+    assert shards.read(1) == [{'wine_id': 1, **review} for review in _reviews(1)]
+    assert shards.read(2) == [{'wine_id': 2, **review} for review in _reviews(2, 1)]
+    assert shards.stats()['reviews'] == 4
+    shards.close()
@@ -0,0 +1,21 @@
+import os
+
+from scrapper.utils.file import iter_json_records
+from scrapper.utils.segment import SegmentLog
+
+
+def test_readers_leave_in_flight_bytes_untouched(tmp_path):
+    output_file = str(tmp_path / 'out.json')
+    log = SegmentLog(f'{output_file}.segments')
+    segment, _, _ = log.append(1, {'wines': [{'id': 1}, {'id': 2}]})
+
+    # Simulates a page being written, but not committed yet
+    path = os.path.join(log.directory, segment)
+    log.file.write(b'{"page":2,"wines":[{"id":3}')
+    log.file.flush()
+    size = os.path.getsize(path)
+
+    assert [wine['id'] for wine in iter_json_records(output_file)] == [1, 2]
+    assert os.path.getsize(path) == size
+
+    log.close()
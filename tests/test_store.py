@@ -0,0 +1,18 @@
+from scrapper.utils.store import WineStore
+
+
+def _wine(grapes):
+    return {'id': 1, 'name': 'Cuvée 2020', 'vintage': 2020, 'country': 'France', 'winery': 'Domaine',
+            'grapes': grapes, 'rating': 4.1, 'price': 12.0}
+
+
+def test_removed_grapes_leave_the_blend(tmp_path):
+    store = WineStore(str(tmp_path / 'wines.db'))
+
+    store.add_wines('25-11-2025', [_wine('Merlot;Syrah')])
+    store.add_wines('26-11-2025', [_wine('Merlot')])
+
+    assert store.query(grape='Syrah') == []
+    assert [wine['id'] for wine in store.query(grape='Merlot')] == [1]
+
+    store.close()
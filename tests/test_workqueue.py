@@ -0,0 +1,32 @@
+from scrapper.utils.workqueue import WorkQueue
+
+
+def _leaves(n):
+    return [{'min': i, 'max': i + 1, 'matches': 10, 'first_page': i + 1, 'pages': 1} for i in range(n)]
+
+
+def test_released_leaf_is_retried_after_fresh_ones(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'))
+    queue.enqueue(_leaves(2))
+
+    leaf = queue.claim('worker')
+    queue.release(leaf['id'], 'worker')
+
+    assert queue.claim('worker')['id'] != leaf['id']
+    assert queue.claim('worker')['id'] == leaf['id']
+
+    queue.close()
+
+
+def test_failing_leaf_is_given_up(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'), max_attempts=3)
+    queue.enqueue(_leaves(1))
+
+    for _ in range(3):
+        leaf = queue.claim('worker')
+        queue.release(leaf['id'], 'worker')
+
+    assert queue.claim('worker') is None
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 0, 'failed': 1}
+
+    queue.close()